@@ -0,0 +1,238 @@
+"""
+Mergeable analytics aggregates for conversation records.
+
+`BucketStats` holds everything the analytics summary needs (score histogram,
+sentiment counts, follow-up/completion counters, turn histogram and a
+feedback point sketch) in a form that can be added to, subtracted from and
+merged. The conversation store keeps one `BucketStats` per hour of
+`saved_at`, so a date-ranged summary merges a handful of buckets instead of
+every record.
+
+Feedback points are free text, so they are counted in a bounded
+`SpaceSaving` sketch (heavy_hitters.py) of `feedback_capacity` entries rather
+than an exact Counter: top feedback themes come with an error bound, and a
+bucket never holds more than `feedback_capacity` strings.
+"""
+
+import json
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, List
+
+from heavy_hitters import DEFAULT_CAPACITY, SpaceSaving
+
+BUCKET_SECONDS = 3600
+
+# Bucket key for records without a parseable saved_at (only counted in unfiltered summaries)
+UNDATED_BUCKET = -1
+
+
+def bucket_start(saved_ts: Optional[float]) -> int:
+    """
+    Start (epoch seconds) of the hourly bucket containing `saved_ts`.
+    """
+    if saved_ts is None:
+        return UNDATED_BUCKET
+    return int(saved_ts // BUCKET_SECONDS) * BUCKET_SECONDS
+
+
+def _number_key(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def feedback_points(record: Dict[str, Any]) -> List[str]:
+    """
+    The record's feedback points, stripped, as they are counted for top feedback.
+    """
+    points = record.get("initial_feedback_points") or []
+    if not isinstance(points, list):
+        return []
+    return [p.strip() for p in points if p]
+
+
+class BucketStats:
+    """
+    Additive summary of a set of conversation records.
+    """
+
+    def __init__(self, feedback_capacity: int = DEFAULT_CAPACITY):
+        self.count = 0
+        self.scores: Counter = Counter()
+        self.sentiments: Counter = Counter()
+        self.followup_true = 0
+        self.followup_known = 0
+        self.complete_true = 0
+        self.complete_known = 0
+        self.turns: Counter = Counter()
+        self.feedback = SpaceSaving(feedback_capacity)
+
+    def add_record(self, record: Dict[str, Any], sign: int = 1):
+        """
+        Add a record to the aggregate (or remove it again with sign=-1).
+        Removals can leave zero/negative entries; call `prune()` once merged.
+        """
+        self.count += sign
+
+        score = record.get("score")
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            self.scores[score] += sign
+
+        self.sentiments[record.get("sentiment") or "Unknown"] += sign
+
+        requires_followup = record.get("requires_followup")
+        if requires_followup is not None:
+            self.followup_known += sign
+            self.followup_true += sign * bool(requires_followup)
+
+        conversation_complete = record.get("conversation_complete")
+        if conversation_complete is not None:
+            self.complete_known += sign
+            self.complete_true += sign * bool(conversation_complete)
+
+        self.turns[record.get("total_turns", 0)] += sign
+
+        for point in feedback_points(record):
+            self.feedback.add(point, sign)
+
+    def merge(self, other: "BucketStats"):
+        self.count += other.count
+        self.scores.update(other.scores)
+        self.sentiments.update(other.sentiments)
+        self.followup_true += other.followup_true
+        self.followup_known += other.followup_known
+        self.complete_true += other.complete_true
+        self.complete_known += other.complete_known
+        self.turns.update(other.turns)
+        self.feedback.merge(other.feedback)
+
+    def prune(self):
+        """
+        Drop histogram entries whose count fell to zero after removals.
+        """
+        for counter in (self.scores, self.sentiments, self.turns):
+            for key in [k for k, v in counter.items() if v <= 0]:
+                del counter[key]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]],
+                     feedback_capacity: int = DEFAULT_CAPACITY) -> "BucketStats":
+        stats = cls(feedback_capacity)
+        for record in records:
+            stats.add_record(record)
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The additive fields as plain JSON types (also the delta pushed to live dashboards).
+        """
+        return {
+            "count": self.count,
+            "scores": {str(k): v for k, v in self.scores.items()},
+            "sentiments": dict(self.sentiments),
+            "followup_true": self.followup_true,
+            "followup_known": self.followup_known,
+            "complete_true": self.complete_true,
+            "complete_known": self.complete_known,
+            "turns": {str(k): v for k, v in self.turns.items()},
+            "feedback": self.feedback.to_dict(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text: str, feedback_capacity: int = DEFAULT_CAPACITY) -> "BucketStats":
+        stats = cls(feedback_capacity)
+        stats.merge_dict(json.loads(text))
+        return stats
+
+    def merge_dict(self, data: Dict[str, Any], include_feedback: bool = True):
+        """
+        Merge a stored aggregate (`to_dict()` shape) without building an intermediate BucketStats.
+        Readers that do not need feedback counts can skip them, usually the largest part.
+        A plain {text: count} feedback mapping (buckets stored before sketches) is accepted too.
+        """
+        self.count += data.get("count", 0)
+        for key, n in data.get("scores", {}).items():
+            self.scores[_number_key(key)] += n
+        for key, n in data.get("sentiments", {}).items():
+            self.sentiments[key] += n
+        self.followup_true += data.get("followup_true", 0)
+        self.followup_known += data.get("followup_known", 0)
+        self.complete_true += data.get("complete_true", 0)
+        self.complete_known += data.get("complete_known", 0)
+        for key, n in data.get("turns", {}).items():
+            self.turns[int(key)] += n
+        if include_feedback:
+            self.feedback.merge(SpaceSaving.from_dict(data.get("feedback"), self.feedback.capacity))
+
+    def median_score(self) -> Optional[float]:
+        """
+        Exact median from the score histogram (same result as sorting the scores).
+        """
+        total = sum(self.scores.values())
+        if not total:
+            return None
+
+        mid = total // 2
+        wanted = [mid - 1, mid] if total % 2 == 0 else [mid]
+        values = []
+        seen = 0
+        for value in sorted(self.scores):
+            seen += self.scores[value]
+            while wanted and wanted[0] < seen:
+                values.append(value)
+                wanted.pop(0)
+            if not wanted:
+                break
+        return round(sum(values) / len(values), 2)
+
+    def nps(self) -> Optional[float]:
+        """
+        Net Promoter Score: % of scores 9-10 minus % of scores 0-6 (None without scores).
+        """
+        total = sum(self.scores.values())
+        if not total:
+            return None
+        promoters = sum(n for value, n in self.scores.items() if value >= 9)
+        detractors = sum(n for value, n in self.scores.items() if value <= 6)
+        return round(100 * (promoters - detractors) / total, 2)
+
+    def summary(self, top_n: int = 5) -> Dict[str, Any]:
+        """
+        Summary stats + top feedback themes, the /analytics/summary body.
+        Feedback counts are upper bounds, each over by at most its `error`.
+        """
+        if self.count <= 0:
+            return {}
+
+        score_total = sum(self.scores.values())
+        avg_score = (
+            round(sum(value * n for value, n in self.scores.items()) / score_total, 2)
+            if score_total else None
+        )
+
+        followup_pct = round(100 * self.followup_true / self.followup_known, 2) if self.followup_known else 0.0
+        completed_pct = round(100 * self.complete_true / self.complete_known, 2) if self.complete_known else 0.0
+
+        avg_turns = round(sum(t * n for t, n in self.turns.items()) / self.count, 2)
+        max_turns = max(self.turns) if self.turns else 0
+
+        top_feedback = [
+            {"text": text, "count": count, "error": error} for text, count, error in self.feedback.top(top_n)
+        ]
+
+        return {
+            "total_conversations": self.count,
+            "avg_score": avg_score,
+            "median_score": self.median_score(),
+            "sentiment_breakdown": Counter(self.sentiments),
+            "followup_required_pct": followup_pct,
+            "completed_pct": completed_pct,
+            "avg_turns": avg_turns,
+            "max_turns": max_turns,
+            # Histograms for the dashboard charts, keyed by score / turn count
+            "score_distribution": {str(k): self.scores[k] for k in sorted(self.scores)},
+            "turns_distribution": {str(k): self.turns[k] for k in sorted(self.turns)},
+            "top_feedback": top_feedback,
+        }
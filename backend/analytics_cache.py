@@ -0,0 +1,110 @@
+"""
+Conditional requests and memoized responses for the analytics endpoints.
+
+The conversation store keeps a data version that every write bumps (see
+`ConversationStore.data_version`). A response is identified by
+(endpoint, normalized query, data version), hashed into its ETag, so:
+
+ - a client that sends `If-None-Match` with the current ETag (or
+   `If-Modified-Since` no older than the last write) gets `304 Not Modified`
+   without anything being computed
+ - otherwise the serialized body is looked up under its ETag in an LRU of at
+   most ANALYTICS_CACHE_MAX_ENTRIES and only computed on a miss
+
+Entries for older versions are never served again (their ETag can no longer
+be produced) and age out of the LRU.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+def make_etag(generation: str, version: int, endpoint: str, params: Dict[str, Any]) -> str:
+    key = json.dumps([generation, version, endpoint, params], sort_keys=True, default=str)
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def conditional_headers(etag: str, modified_at: float) -> Dict[str, str]:
+    # no-cache: browsers may keep the body but must revalidate (a cheap 304) before reusing it
+    return {"ETag": etag, "Last-Modified": http_date(modified_at), "Cache-Control": "no-cache"}
+
+
+def not_modified(headers, etag: str, modified_at: float) -> bool:
+    """
+    RFC 9110 precedence: If-None-Match decides when present, else If-Modified-Since.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second resolution
+        return int(modified_at) <= since
+    return False
+
+
+def encode_body(content: Any) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class AnalyticsCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return body
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, etag: str, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,195 @@
+"""
+Server-Sent Events fan-out for live dashboards (GET /analytics/stream).
+
+When a conversation is saved the server publishes one event to the
+`AnalyticsHub`. The event is encoded to an SSE frame once and the same bytes
+are queued for every subscriber, so a save costs one encode plus a queue
+append per connected dashboard, whatever the number of subscribers.
+
+Every subscriber has a bounded queue (ANALYTICS_STREAM_QUEUE frames). A
+dashboard that stops reading (stalled tab, slow network) fills it and is
+evicted: its queue is replaced by a final `evicted` event and the stream
+closes. The client reconnects and refetches, so one slow consumer never holds
+back the others or grows memory without bound.
+
+Reconnecting clients send `Last-Event-ID` (EventSource does this itself).
+Events still in the replay buffer are resent; if the client has missed more
+than that (or the server restarted), it gets a `resync` event telling it to
+refetch the summary. Idle streams get a comment line every
+ANALYTICS_STREAM_HEARTBEAT_SECONDS so proxies do not time them out.
+
+The hub lives in the process: with several server processes, a dashboard only
+sees saves handled by the process it is connected to.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reconnect delay EventSource clients use after the stream closes
+RETRY_MS = 3000
+
+
+class HubFull(Exception):
+    pass
+
+
+def sse_frame(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscriber:
+    def __init__(self, max_queue: int):
+        # Two slots beyond the limit are kept for the eviction notice and the end marker
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(max_queue + 2)
+        self.max_queue = max_queue
+        self.closed = False
+
+    def offer(self, frame: bytes) -> bool:
+        if self.queue.qsize() >= self.max_queue:
+            return False
+        self.queue.put_nowait(frame)
+        return True
+
+    def close(self, final: Optional[bytes] = None):
+        """
+        Drop whatever is still queued and end the stream (after `final`, if given).
+        """
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if final:
+            self.queue.put_nowait(final)
+        self.queue.put_nowait(None)
+
+
+class AnalyticsHub:
+    def __init__(self, max_subscribers: int = 500, max_queue: int = 64, heartbeat_seconds: float = 15,
+                 replay_size: int = 256):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max(1, max_queue)
+        self.heartbeat_seconds = heartbeat_seconds
+        # Event ids are "<epoch>-<n>"; the epoch changes on restart so stale ids trigger a resync
+        self._epoch = uuid.uuid4().hex[:8]
+        self._next_id = 1
+        self._recent: Deque[Tuple[int, bytes]] = deque(maxlen=replay_size)
+        self._subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """
+        Register a subscriber, queueing the events it missed since `last_event_id`.
+        Raises HubFull at max_subscribers. `stream()` unsubscribes once it runs; a caller whose
+        stream may never start (client gone before the body) must unsubscribe itself.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            raise HubFull()
+        subscriber = Subscriber(self.max_queue)
+        if last_event_id:
+            missed = self._missed_since(last_event_id)
+            if missed is None or len(missed) > self.max_queue:
+                subscriber.offer(sse_frame("resync", {"reason": "missed events"}))
+            else:
+                for frame in missed:
+                    subscriber.offer(frame)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def _missed_since(self, last_event_id: str) -> Optional[List[bytes]]:
+        """
+        Frames published after `last_event_id`, or None when they are no longer all buffered.
+        """
+        epoch, _, number = last_event_id.partition("-")
+        if epoch != self._epoch or not number.isdigit() or int(number) >= self._next_id:
+            return None
+        last = int(number)
+        if last == self._next_id - 1:
+            return []
+        if not self._recent or self._recent[0][0] > last + 1:
+            return None
+        return [frame for event_id, frame in self._recent if event_id > last]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """
+        Encode `data` once and queue it for every subscriber, evicting those whose queue is full.
+        Must be called on the event loop.
+        """
+        event_number = self._next_id
+        self._next_id += 1
+        frame = sse_frame(event, data, f"{self._epoch}-{event_number}")
+        self._recent.append((event_number, frame))
+        self.published += 1
+
+        slow = [subscriber for subscriber in self._subscribers if not subscriber.offer(frame)]
+        for subscriber in slow:
+            self._subscribers.discard(subscriber)
+            subscriber.close(sse_frame("evicted", {"reason": "slow consumer"}))
+        if slow:
+            self.evicted += len(slow)
+            logger.warning("evicted slow analytics stream subscribers", extra={"count": len(slow)})
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """
+        Body of one SSE response; unsubscribes when the client goes away or is evicted.
+        Frames that queued up while the previous chunk was being sent go out as one chunk.
+        """
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                if subscriber.queue.empty():
+                    try:
+                        first = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_seconds)
+                    except asyncio.TimeoutError:
+                        yield b": ping\n\n"
+                        continue
+                    frames = [first]
+                else:
+                    frames = []
+                while not subscriber.queue.empty():
+                    frames.append(subscriber.queue.get_nowait())
+                end = None in frames
+                if end:
+                    frames = frames[:frames.index(None)]
+                if frames:
+                    yield b"".join(frames)
+                if end:
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close(self):
+        """
+        End every open stream (server shutdown).
+        """
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+        self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
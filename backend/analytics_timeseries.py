@@ -0,0 +1,111 @@
+"""
+Time-bucketed analytics for trend charts (GET /analytics/timeseries).
+
+Buckets are hours, days or ISO weeks (starting Monday) in a given IANA
+timezone, so "a day" is a local calendar day, DST transitions included. The
+series is built from the store's hourly `BucketStats`: an hour that falls
+entirely inside one local bucket is merged whole, and only hours that
+straddle a bucket edge (zones with half-hour offsets) or the edges of the
+requested range are read record by record (`ConversationStore.timeseries`).
+
+Each point carries the record count, average score, NPS (% promoters scoring
+9-10 minus % detractors scoring 0-6), sentiment mix and follow-up rate, so a
+year of daily points is a few hundred small objects instead of every record.
+"""
+
+from datetime import datetime, time, timedelta, tzinfo
+from typing import Any, Dict, List
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from analytics_buckets import BucketStats
+
+INTERVALS = ("hour", "day", "week")
+
+# interval=auto picks the finest interval with at most this many buckets
+AUTO_TARGET_BUCKETS = 200
+
+APPROX_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def resolve_timezone(name: str) -> tzinfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def bucket_floor(ts: float, interval: str, tz: tzinfo) -> float:
+    """
+    Epoch start of the local hour/day/week containing `ts`.
+    """
+    local = datetime.fromtimestamp(ts, tz)
+    if interval == "hour":
+        return local.replace(minute=0, second=0, microsecond=0).timestamp()
+    day = local.date()
+    if interval == "week":
+        day -= timedelta(days=day.weekday())
+    return datetime.combine(day, time(), tzinfo=tz).timestamp()
+
+
+def next_bucket(start: float, interval: str, tz: tzinfo) -> float:
+    if interval == "hour":
+        # Floored again so a half-hour DST shift (Australia/Lord_Howe) does not leave
+        # every later bucket starting at :30
+        following = bucket_floor(start + 3600, "hour", tz)
+        if following <= start:
+            # A local hour stretched to 90 minutes by falling back half an hour
+            following = (datetime.fromtimestamp(start, tz) + timedelta(hours=1)).timestamp()
+        return following
+    day = datetime.fromtimestamp(start, tz).date() + timedelta(days=7 if interval == "week" else 1)
+    return datetime.combine(day, time(), tzinfo=tz).timestamp()
+
+
+def choose_interval(start_ts: float, end_ts: float) -> str:
+    for interval in INTERVALS:
+        if (end_ts - start_ts) / APPROX_SECONDS[interval] < AUTO_TARGET_BUCKETS:
+            return interval
+    return INTERVALS[-1]
+
+
+def bucket_starts(start_ts: float, end_ts: float, interval: str, tz: tzinfo, max_buckets: int) -> List[float]:
+    """
+    Starts of every bucket overlapping [start_ts, end_ts]; raises ValueError past max_buckets.
+    """
+    if (end_ts - start_ts) / APPROX_SECONDS[interval] > max_buckets + 2:
+        raise ValueError(f"Range has more than {max_buckets} {interval} buckets, use a coarser interval")
+    starts = []
+    current = bucket_floor(start_ts, interval, tz)
+    while current <= end_ts:
+        starts.append(current)
+        current = next_bucket(current, interval, tz)
+    if len(starts) > max_buckets:
+        raise ValueError(f"Range has more than {max_buckets} {interval} buckets, use a coarser interval")
+    return starts
+
+
+def series_point(stats: BucketStats) -> Dict[str, Any]:
+    scored = sum(stats.scores.values())
+    return {
+        "count": stats.count,
+        "scored": scored,
+        "avg_score": round(sum(value * n for value, n in stats.scores.items()) / scored, 2) if scored else None,
+        "nps": stats.nps(),
+        "sentiments": dict(stats.sentiments),
+        "followup_rate": round(100 * stats.followup_true / stats.followup_known, 2) if stats.followup_known else None,
+    }
+
+
+def build_series(stats_by_bucket: Dict[float, BucketStats], starts: List[float], interval: str,
+                 tz: tzinfo) -> List[Dict[str, Any]]:
+    """
+    One point per bucket start (empty buckets included, with count 0), start/end as local ISO times.
+    """
+    series = []
+    for start in starts:
+        end = next_bucket(start, interval, tz)
+        series.append({
+            "start": datetime.fromtimestamp(start, tz).isoformat(),
+            "end": datetime.fromtimestamp(end, tz).isoformat(),
+            **series_point(stats_by_bucket.get(start) or BucketStats()),
+        })
+    return series
@@ -0,0 +1,193 @@
+"""
+Micro-benchmark for model-output parsing (model_output.py).
+
+Times the previous regex-based extractor against `extract_json_object`
+(with the standard json module, and with orjson when it is installed) over a
+corpus of well-formed and malformed model outputs, and reports whether the
+extractors agree on each case. A final row times `validate_analysis` on a
+typical response.
+
+Usage:
+       python bench_json_extraction.py
+       python bench_json_extraction.py --iterations 20000 --output json_bench.json
+"""
+
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import model_output
+from llm_providers import MALFORMED_KINDS, StubProvider
+from model_output import FeedbackAnalysis, extract_json_object, validate_analysis
+
+
+def legacy_extract(text: str) -> Dict[str, Any]:
+    """
+    The extractor server.py used before model_output.py, kept here as the baseline.
+    """
+    if not text:
+        raise ValueError("Empty model response")
+
+    m = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
+    if m:
+        try:
+            return json.loads(m.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    m = re.search(r'\{.*\}', text, re.DOTALL)
+    if m:
+        candidate = m.group(0)
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            try:
+                return json.loads(candidate.replace("'", '"'))
+            except json.JSONDecodeError:
+                pass
+
+    raise ValueError("No valid JSON found in model output")
+
+
+def build_corpus() -> List[Tuple[str, str]]:
+    negative = StubProvider.initial_response(3, "The checkout process was slow and confusing")
+    positive = StubProvider.initial_response(10, "great service")
+    followup = {
+        "transcription": "It took three tries to pay, the card form kept resetting",
+        "conversationalResponse": "Thank you, that's really helpful. We've passed this on to the team.",
+        "requiresFollowUp": False,
+        "conversationComplete": True,
+    }
+    long_text = " ".join(["The delivery arrived late and the box was damaged."] * 60)
+    long_response = StubProvider.initial_response(2, long_text)
+    nested = dict(negative, details={"topics": [{"name": "checkout", "mentions": [1, 2, {"x": "y"}]}] * 20})
+
+    corpus = [
+        ("stub_initial", json.dumps(negative)),
+        ("stub_positive", json.dumps(positive)),
+        ("stub_followup", json.dumps(followup)),
+        ("pretty_printed", json.dumps(negative, indent=2)),
+        ("fenced", f"```json\n{json.dumps(negative, indent=2)}\n```"),
+        ("prose_wrapped", f"Here is the analysis:\n{json.dumps(negative)}\nHope this helps!"),
+        ("brace_in_prose", f"Format {{as requested}}: {json.dumps(negative)} Done."),
+        ("braces_in_strings", json.dumps(dict(negative, conversationalResponse="Sorry {again} } about that {"))),
+        ("unicode", json.dumps(dict(negative, transcription="Très lent 😞 — \"vraiment\""), ensure_ascii=False)),
+        ("long", json.dumps(long_response)),
+        ("nested", json.dumps(nested)),
+        ("two_objects", f"{json.dumps(negative)}\n\nAlternative:\n{json.dumps(positive)}"),
+    ]
+    for kind in MALFORMED_KINDS:
+        corpus.append((f"malformed_{kind}", StubProvider.malformed(negative, kind)))
+    corpus += [
+        ("no_json", "I'm sorry, I can't help with that request."),
+        ("pathological_open", "{" * 10000),
+        ("pathological_quotes", '{"a": "' + '\\"' * 10000),
+    ]
+    return corpus
+
+
+def outcome(extract: Callable[[str], Dict[str, Any]], text: str) -> Optional[str]:
+    try:
+        return json.dumps(extract(text), sort_keys=True)
+    except ValueError:
+        return None
+
+
+def time_per_op(fn: Callable[[], Any], iterations: int) -> float:
+    """
+    Best of three runs, in microseconds per call.
+    """
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+
+def timed_extract(extract: Callable[[str], Dict[str, Any]], text: str, iterations: int) -> float:
+    def call():
+        try:
+            extract(text)
+        except ValueError:
+            pass
+    return time_per_op(call, iterations)
+
+
+def with_loads(loads: Callable[[str], Any]) -> Callable[[str], Dict[str, Any]]:
+    """
+    `extract_json_object` using a specific JSON decoder.
+    """
+    def extract(text: str) -> Dict[str, Any]:
+        saved, model_output.json_loads = model_output.json_loads, loads
+        try:
+            return extract_json_object(text)
+        finally:
+            model_output.json_loads = saved
+    return extract
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+    extractors: List[Tuple[str, Callable[[str], Dict[str, Any]]]] = [
+        ("legacy", legacy_extract),
+        ("new_json", with_loads(json.loads)),
+    ]
+    if model_output.orjson is not None:
+        extractors.append(("new_orjson", with_loads(model_output.orjson.loads)))
+
+    rows = []
+    for name, text in build_corpus():
+        # Pathological inputs are slow for the regex version; fewer iterations keep the run short
+        n = max(1, iterations // 100) if text.startswith("{" * 100) else iterations
+        outcomes = {label: outcome(fn, text) for label, fn in extractors}
+        row: Dict[str, Any] = {"case": name, "bytes": len(text), "iterations": n}
+        for label, fn in extractors:
+            row[f"{label}_us"] = round(timed_extract(fn, text, n), 2)
+            row[f"{label}_ok"] = outcomes[label] is not None
+        row["agree"] = len(set(outcomes.values())) == 1
+        rows.append(row)
+
+    sample = json.loads(build_corpus()[0][1])
+    rows.append({
+        "case": "validate_analysis",
+        "bytes": len(json.dumps(sample)),
+        "iterations": iterations,
+        "validate_us": round(time_per_op(lambda: validate_analysis(dict(sample), FeedbackAnalysis), iterations), 2),
+    })
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    timing_keys = [k for k in rows[0] if k.endswith("_us")]
+    header = f"{'case':<22}{'bytes':>9}" + "".join(f"{k:>16}" for k in timing_keys) + "   parsed / agree"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if "validate_us" in row:
+            print(f"{row['case']:<22}{row['bytes']:>9}{row['validate_us']:>16}")
+            continue
+        parsed = " ".join("y" if row[k.replace('_us', '_ok')] else "n" for k in timing_keys)
+        print(f"{row['case']:<22}{row['bytes']:>9}" + "".join(f"{row[k]:>16}" for k in timing_keys)
+              + f"   {parsed} / {'yes' if row['agree'] else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model-output JSON extraction")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"orjson: {'installed' if model_output.orjson is not None else 'not installed'}")
+    rows = run(args.iterations)
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
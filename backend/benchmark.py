@@ -0,0 +1,404 @@
+"""
+End-to-end benchmark for the feedback, follow-up and analytics endpoints.
+
+By default the server runs in-process against the stub LLM provider
+(LLM_PROVIDER=stub) with a throwaway conversation store seeded from
+generate_mock_data.py, so the numbers measure server overhead only.
+
+Usage:
+------
+1. Install dependencies (once):
+       pip install httpx
+2. Run all scenarios:
+       python benchmark.py --conversations 100000 --concurrency 32 --requests 2000
+3. Or a subset, saving results and failing on regressions vs. a baseline:
+       python benchmark.py --scenarios analytics --output bench.json
+       python benchmark.py --scenarios analytics --baseline bench.json --max-regression 0.2
+
+Against an already running server (no seeding, RSS via --server-pid):
+       python benchmark.py --url http://127.0.0.1:8000 --server-pid 12345
+
+Scenarios:
+ - feedback_text   POST /submit_feedback with a transcription
+ - feedback_audio  POST /submit_feedback with an audio clip
+ - followup        full conversations: /submit_feedback then /submit_followup until closed
+ - analytics       GET /analytics/summary, /analytics/timeseries (auto interval) and a first or
+                   follow-up /analytics/conversations page over all-time / 30-day / 7-day / 1-day ranges
+ - persist         (in-process only) save conversations concurrently through the server's
+                   writer and verify every one reached disk and the store; losses count as errors
+
+Reports per scenario: requests, errors, throughput (req/s), p50/p95/p99 latency (ms)
+and process RSS (MB), followed by the server's GET /stats counters (response cache,
+feedback batching, writer). Use --bypass-cache to measure uncached model calls.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+import httpx
+
+SCENARIOS = ("feedback_text", "feedback_audio", "followup", "analytics", "persist")
+
+SEED_BATCH_SIZE = 5000
+
+TEXT_FEEDBACK = [
+    "great service",
+    "fast shipping",
+    "The checkout process was slow and confusing",
+    "Customer support response time was too long",
+    "Product quality exceeded expectations",
+    "Mobile app crashes frequently",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    Current resident set size of `pid` (default: this process) from /proc, in MB.
+    """
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def seed_store(store, count: int, seed: int):
+    """
+    Insert `count` mock conversations (generate_mock_data.py shapes) directly into the store.
+    """
+    import generate_mock_data
+    from conversation_store import record_from_conversation
+
+    random.seed(seed)
+    started = time.perf_counter()
+    batch = []
+    for i in range(count):
+        conversation = generate_mock_data.generate_mock_conversation(i)
+        batch.append(record_from_conversation(f"bench_{i:08d}.json", conversation))
+        if len(batch) >= SEED_BATCH_SIZE:
+            store.add_records(batch)
+            batch = []
+    store.add_records(batch)
+    print(f"Seeded {count} conversations in {time.perf_counter() - started:.1f}s")
+
+
+class Recorder:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started = 0.0
+        self.finished = 0.0
+
+    def record(self, seconds: float, ok: bool):
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def result(self, pid: Optional[int]) -> Dict[str, Any]:
+        values = sorted(self.latencies)
+        elapsed = max(self.finished - self.started, 1e-9)
+        return {
+            "scenario": self.name,
+            "requests": len(values),
+            "errors": self.errors,
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "rss_mb": rss_mb(pid),
+        }
+
+
+async def timed(recorder: Recorder, request) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        recorder.record(time.perf_counter() - started, False)
+        return None
+    recorder.record(time.perf_counter() - started, response.status_code == 200)
+    return response
+
+
+async def feedback_text(client: httpx.AsyncClient, rng: random.Random, recorders: Dict[str, Recorder],
+                        bypass_cache: bool):
+    await timed(recorders["feedback_text"], client.post("/submit_feedback", data={
+        "score": str(rng.randint(0, 10)),
+        "transcription": rng.choice(TEXT_FEEDBACK),
+        "bypass_cache": str(bypass_cache).lower(),
+    }))
+
+
+async def feedback_audio(client: httpx.AsyncClient, rng: random.Random, recorders: Dict[str, Recorder], audio: bytes):
+    await timed(recorders["feedback_audio"], client.post(
+        "/submit_feedback",
+        data={"score": str(rng.randint(0, 10))},
+        files={"audio_data": ("feedback.webm", audio, "audio/webm")},
+    ))
+
+
+async def followup(client: httpx.AsyncClient, rng: random.Random, recorders: Dict[str, Recorder], max_turns: int,
+                   bypass_cache: bool):
+    """
+    One whole conversation; only the follow-up calls are recorded.
+    """
+    score = rng.randint(0, 6)
+    response = await client.post("/submit_feedback", data={
+        "score": str(score),
+        "transcription": rng.choice(TEXT_FEEDBACK),
+        "bypass_cache": str(bypass_cache).lower(),
+    })
+    if response.status_code != 200:
+        recorders["followup"].record(0.0, False)
+        return
+    body = response.json()
+    conversation_id = body["conversation_id"]
+    for _ in range(max_turns):
+        if not body.get("requiresFollowUp", False):
+            return
+        response = await timed(recorders["followup"], client.post("/submit_followup", data={
+            "conversation_id": conversation_id,
+            "transcription": "It kept freezing on the payment page",
+            "bypass_cache": str(bypass_cache).lower(),
+        }))
+        if response is None or response.status_code != 200:
+            return
+        body = response.json()
+
+
+async def analytics(client: httpx.AsyncClient, rng: random.Random, recorders: Dict[str, Recorder]):
+    now = datetime.now(timezone.utc)
+    days = rng.choice([None, 30, 7, 1])
+    params = {"start_date": (now - timedelta(days=days)).date().isoformat()} if days else {}
+    kind = rng.choice(["summary", "summary", "timeseries", "list"])
+    if kind == "summary":
+        await timed(recorders["analytics"], client.get("/analytics/summary", params=params))
+        return
+    if kind == "timeseries":
+        await timed(recorders["analytics"], client.get("/analytics/timeseries", params={**params, "interval": "auto"}))
+        return
+    params.update(fields="saved_at,score", limit=200)
+    response = await timed(recorders["analytics"], client.get("/analytics/conversations", params=params))
+    if response is not None and response.status_code == 200 and response.json()["next_cursor"]:
+        params["cursor"] = response.json()["next_cursor"]
+        await timed(recorders["analytics"], client.get("/analytics/conversations", params=params))
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, args, pid: Optional[int]) -> Dict[str, Any]:
+    recorder = Recorder(name)
+    recorders = {name: recorder}
+    rng = random.Random(args.seed)
+    audio = os.urandom(args.audio_bytes)
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if name == "feedback_text":
+                await feedback_text(client, rng, recorders, args.bypass_cache)
+            elif name == "feedback_audio":
+                await feedback_audio(client, rng, recorders, audio)
+            elif name == "followup":
+                await followup(client, rng, recorders, args.max_turns, args.bypass_cache)
+            else:
+                await analytics(client, rng, recorders)
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    recorder.finished = time.perf_counter()
+    return recorder.result(pid)
+
+
+async def run_persist(server, args) -> Dict[str, Any]:
+    """
+    Stress the conversation writer: save --requests conversations with --concurrency
+    in flight, then check none were lost or overwritten.
+    """
+    import generate_mock_data
+
+    recorder = Recorder("persist")
+    rng = random.Random(args.seed)
+    files_before = sum(1 for f in os.listdir(server.CONVERSATIONS_DIR) if f.endswith(".json"))
+    rows_before = server.conversation_store.count()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    filenames: List[str] = []
+
+    async def save_one(i: int):
+        async with semaphore:
+            payload = generate_mock_data.generate_mock_conversation(i, rng)
+            started = time.perf_counter()
+            try:
+                filenames.append(await server.save_conversation_file(payload))
+                recorder.record(time.perf_counter() - started, True)
+            except Exception as e:
+                print("Save failed:", e)
+                recorder.record(time.perf_counter() - started, False)
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*[save_one(i) for i in range(args.requests)])
+    recorder.finished = time.perf_counter()
+
+    files_after = sum(1 for f in os.listdir(server.CONVERSATIONS_DIR) if f.endswith(".json"))
+    rows_after = server.conversation_store.count()
+    lost = max(
+        args.requests - len(set(filenames)),
+        args.requests - (files_after - files_before),
+        args.requests - (rows_after - rows_before),
+    )
+    recorder.errors += lost
+    print(f"persist: {len(set(filenames))} unique filenames, +{files_after - files_before} files, "
+          f"+{rows_after - rows_before} store rows, {lost} lost")
+    return recorder.result(None)
+
+
+def print_results(results: List[Dict[str, Any]]):
+    header = f"{'scenario':<16}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}"
+    print("\n=== Benchmark Results ===")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<16}{r['requests']:>9}{r['errors']:>8}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{str(r['rss_mb']):>9}")
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """
+    Return False (and print why) if any scenario's p95 or throughput regressed beyond max_regression.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    ok = True
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if not base:
+            continue
+        if base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            print(f"❌ {r['scenario']}: p95 {r['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+            ok = False
+        if base["throughput_rps"] and r["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            print(f"❌ {r['scenario']}: throughput {r['throughput_rps']} req/s vs baseline {base['throughput_rps']} req/s")
+            ok = False
+    if ok:
+        print(f"✅ No regressions beyond {max_regression:.0%} vs {baseline_path}")
+    return ok
+
+
+async def fetch_server_stats(client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+    """
+    Cache/batching/writer counters from GET /stats, for tuning alongside the latencies.
+    """
+    try:
+        response = await client.get("/stats")
+        return response.json() if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+async def run(args) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}. Choose from: {', '.join(SCENARIOS)}")
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = []
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            for name in scenarios:
+                if name == "persist":
+                    print("Skipping persist scenario: it only runs in-process")
+                    continue
+                results.append(await run_scenario(name, client, args, args.server_pid))
+            return results, await fetch_server_stats(client)
+
+    # In-process server: stub model + throwaway store/conversations dir
+    workdir = tempfile.mkdtemp(prefix="feedback-bench-")
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    os.environ.setdefault("LLM_STUB_LATENCY_MS", str(args.stub_latency_ms))
+    os.environ.setdefault("LLM_STUB_SEED", str(args.seed))
+    os.environ["CONVERSATIONS_DB"] = os.path.join(workdir, "conversations.db")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import server
+
+    if args.conversations:
+        seed_store(server.conversation_store, args.conversations, args.seed)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            for name in scenarios:
+                if name == "persist":
+                    results.append(await run_persist(server, args))
+                else:
+                    results.append(await run_scenario(name, client, args, None))
+            server_stats = await fetch_server_stats(client)
+    print(f"(in-process run, data in {workdir})")
+    return results, server_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feedback API endpoints.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=500, help="Requests (conversations for followup) per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument("--conversations", type=int, default=10000, help="Mock conversations to seed (in-process only)")
+    parser.add_argument("--max-turns", type=int, default=5, help="Follow-up turns per conversation at most")
+    parser.add_argument("--audio-bytes", type=int, default=64 * 1024, help="Size of the synthetic audio clip")
+    parser.add_argument("--bypass-cache", action="store_true", help="Send bypass_cache=true so every text request reaches the model")
+    parser.add_argument("--stub-latency-ms", type=float, default=50, help="Stub model latency (in-process only)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--url", help="Benchmark a running server instead of an in-process one")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for RSS reporting")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95/throughput regression vs baseline")
+    args = parser.parse_args()
+    # The in-process run changes directory; resolve paths first
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    results, server_stats = asyncio.run(run(args))
+    print_results(results)
+    if server_stats:
+        print("\nServer stats:")
+        print(json.dumps(server_stats, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results,
+                       "server_stats": server_stats}, f, indent=2)
+        print(f"\n📄 Saved results to {args.output}")
+
+    if args.baseline and not compare_to_baseline(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
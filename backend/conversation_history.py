@@ -0,0 +1,104 @@
+"""
+Prompt-size control for follow-up conversations.
+
+FOLLOWUP_PROMPT used to carry every prior turn verbatim, so each follow-up
+re-sent the whole conversation and prompt size grew with every turn. Here
+only the last HISTORY_VERBATIM_TURNS turns are sent word for word; older
+turns are folded once into a short rolling summary kept in the session
+(`history["summary"]`, with `history["summarized_turns"]` saying how many
+turns it covers), and that summary is capped at HISTORY_SUMMARY_MAX_CHARS by
+dropping the points between the first turn and the newest ones.
+
+`history["turns"]` itself is left complete, since it is what gets saved
+when the conversation closes.
+
+Token counts are estimates (about four characters per token for the text
+part of the prompt); audio parts are not counted.
+"""
+
+import math
+from collections import defaultdict
+from typing import Any, Dict, List
+
+SUMMARY_OMITTED = "(earlier turns omitted)"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class HistoryCompactor:
+    def __init__(self, verbatim_turns: int = 2, summary_turn_chars: int = 160, summary_max_chars: int = 1000):
+        self.verbatim_turns = max(0, verbatim_turns)
+        self.summary_turn_chars = summary_turn_chars
+        self.summary_max_chars = summary_max_chars
+
+    def compact(self, history: Dict[str, Any]):
+        """
+        Fold turns older than the last `verbatim_turns` into the rolling summary (in place).
+        Each turn is folded once; past the size cap the summary keeps its first point and
+        drops the oldest of the rest.
+        """
+        turns = history.get("turns", [])
+        summary: List[str] = list(history.get("summary", []))
+        folded = history.get("summarized_turns", 0)
+        keep_from = max(0, len(turns) - self.verbatim_turns)
+        if keep_from <= folded:
+            return
+
+        for number in range(folded + 1, keep_from + 1):
+            turn = turns[number - 1]
+            summary.append(
+                f"Turn {number}: AI asked \"{clip(turn.get('ai', ''), self.summary_turn_chars)}\"; "
+                f"user said \"{clip(turn.get('user', ''), self.summary_turn_chars)}\""
+            )
+        while sum(len(point) for point in summary) > self.summary_max_chars:
+            # The first turn usually says what the complaint is really about, so it stays
+            if len(summary) > 2 and summary[1] != SUMMARY_OMITTED:
+                summary[1] = SUMMARY_OMITTED
+            elif len(summary) > 3:
+                del summary[2]
+            else:
+                break
+
+        history["summary"] = summary
+        history["summarized_turns"] = keep_from
+
+    def render(self, history: Dict[str, Any]) -> str:
+        """
+        Conversation history text for FOLLOWUP_PROMPT: the summary, then the recent turns verbatim.
+        """
+        turns = history.get("turns", [])
+        folded = history.get("summarized_turns", 0)
+        parts = []
+        if history.get("summary"):
+            parts.append(f"\nSummary of turns 1-{folded}:\n" + "\n".join(f" - {point}" for point in history["summary"]))
+        for number, turn in enumerate(turns[folded:], folded + 1):
+            parts.append(f"\nTurn {number}:\n AI: {turn.get('ai', '')}\n User: {turn.get('user', '')}\n")
+        return "\n".join(parts)
+
+
+class PromptTokenStats:
+    """
+    Estimated prompt tokens of follow-up calls, by turn number.
+    """
+
+    def __init__(self):
+        self._by_turn: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0])
+
+    def record(self, turn_number: int, tokens: int):
+        entry = self._by_turn[turn_number]
+        entry[0] += 1
+        entry[1] += tokens
+        entry[2] = max(entry[2], tokens)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            str(turn): {"prompts": count, "avg_tokens": round(total / count, 1), "max_tokens": peak}
+            for turn, (count, total, peak) in sorted(self._by_turn.items())
+        }
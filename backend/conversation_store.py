@@ -0,0 +1,717 @@
+"""
+SQLite-backed conversation store used by server.py for analytics.
+
+Every saved conversation is indexed as one row (its JSON file projected by
+`record_from_conversation`) with an
+indexed `saved_ts` column, so date-ranged analytics are an index range scan
+instead of a full directory rescan + json.load of every file.
+
+Alongside the rows the store maintains hourly `BucketStats` aggregates in the
+same transaction, so `summarize()` merges whole buckets and only reads the
+individual records in the partial hours at the edges of the range.
+
+`list_records()` pages through the rows for /analytics/conversations: only the
+requested columns are read, filters and sort keys are covered by indexes, and
+pages are keyset-paginated by (sort value, filename) through an opaque cursor,
+so deep pages cost the same as the first one.
+
+Feedback points are counted in bounded sketches inside the hourly aggregates
+(see heavy_hitters.py); `feedback_counts()` reads the exact counts for a
+range instead, which is affordable when the range holds few records.
+
+Every write also bumps a persisted data version (`data_version()`), which
+the analytics endpoints use for ETags and memoized responses. It lives in the
+database rather than in the process, so it stays correct across restarts and
+for several server processes sharing one database.
+
+The JSON files in conversations/ stay the source of truth; the store can be
+rebuilt from them at any time.
+
+Usage (one-shot import of existing JSON files):
+    python conversation_store.py --dir conversations --db conversations.db
+"""
+
+import argparse
+import base64
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone, tzinfo
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Callable
+
+from analytics_buckets import BucketStats, BUCKET_SECONDS, UNDATED_BUCKET, bucket_start, feedback_points
+from heavy_hitters import DEFAULT_CAPACITY
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+
+# Keep IN (...) lookups under SQLite's host-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+RECORD_COLUMNS = (
+    "filename",
+    "saved_at",
+    "score",
+    "sentiment",
+    "requires_followup",
+    "conversation_complete",
+    "total_turns",
+    "initial_transcription",
+    "final_transcription",
+    "final_response",
+    "initial_feedback_points",
+)
+
+# Columns listed when no field projection is requested (everything but the transcript text)
+DEFAULT_LIST_FIELDS = (
+    "filename",
+    "saved_at",
+    "score",
+    "sentiment",
+    "requires_followup",
+    "conversation_complete",
+    "total_turns",
+)
+
+# Sort keys accepted by `list_records` -> indexed column
+SORT_COLUMNS = {"saved_at": "saved_ts", "score": "score", "total_turns": "total_turns"}
+
+MAX_LIST_LIMIT = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    filename TEXT PRIMARY KEY,
+    saved_at TEXT,
+    saved_ts REAL,
+    score NUMERIC,
+    sentiment TEXT,
+    requires_followup INTEGER,
+    conversation_complete INTEGER,
+    total_turns INTEGER,
+    initial_transcription TEXT,
+    final_transcription TEXT,
+    final_response TEXT,
+    initial_feedback_points TEXT
+);
+DROP INDEX IF EXISTS idx_conversations_saved_ts;
+CREATE INDEX IF NOT EXISTS idx_conversations_saved ON conversations(saved_ts, filename);
+CREATE INDEX IF NOT EXISTS idx_conversations_score ON conversations(score, filename);
+CREATE INDEX IF NOT EXISTS idx_conversations_turns ON conversations(total_turns, filename);
+CREATE INDEX IF NOT EXISTS idx_conversations_sentiment ON conversations(sentiment, saved_ts, filename);
+CREATE INDEX IF NOT EXISTS idx_conversations_followup ON conversations(requires_followup, saved_ts, filename);
+CREATE TABLE IF NOT EXISTS analytics_buckets (
+    bucket_start INTEGER PRIMARY KEY,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    modified_at REAL NOT NULL
+);
+"""
+
+
+def parse_iso_datetime(value: Optional[str], default_tz: tzinfo = timezone.utc) -> Optional[datetime]:
+    """
+    Parse ISO date/datetime strings, returning timezone-aware datetime.
+    Accepts formats like '2025-01-01' or '2025-01-01T12:00:00Z'; values without
+    an offset are taken to be in `default_tz` (UTC unless given).
+    """
+    if not value:
+        return None
+
+    try:
+        # Handle trailing Z
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            dt = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Invalid date format. Use ISO format YYYY-MM-DD or YYYY-MM-DDTHH:MM:SSZ")
+
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=default_tz)
+
+    return dt
+
+
+def saved_at_timestamp(saved_at: Optional[str]) -> Optional[float]:
+    """
+    Epoch seconds for a stored `saved_at` string, or None when missing/unparseable
+    (such records are only returned by unfiltered queries, as before).
+    """
+    try:
+        dt = parse_iso_datetime(saved_at)
+    except ValueError:
+        return None
+    return dt.timestamp() if dt else None
+
+
+def record_from_conversation(filename: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten a saved conversation payload into the analytics record shape.
+    """
+    final_analysis = data.get("final_analysis", {})
+    turns = data.get("turns", [])
+
+    return {
+        "filename": filename,
+        "saved_at": data.get("saved_at"),
+        "score": data.get("score"),
+        "sentiment": data.get("sentiment") or final_analysis.get("sentiment"),
+        "requires_followup": final_analysis.get("requiresFollowUp"),
+        "conversation_complete": final_analysis.get("conversationComplete"),
+        "total_turns": len(turns),
+        "initial_transcription": data.get("initial_transcription"),
+        "final_transcription": final_analysis.get("transcription"),
+        "final_response": final_analysis.get("conversationalResponse"),
+        "initial_feedback_points": data.get("initial_feedback_points")
+        or data.get("initial_feedback")
+        or [],
+    }
+
+
+def _bool_to_db(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    return 1 if value else 0
+
+
+def _db_to_bool(value: Optional[int]) -> Optional[bool]:
+    if value is None:
+        return None
+    return bool(value)
+
+
+def _record_to_row(record: Dict[str, Any]) -> Tuple:
+    return (
+        record["filename"],
+        record["saved_at"],
+        saved_at_timestamp(record["saved_at"]),
+        record["score"],
+        record["sentiment"],
+        _bool_to_db(record["requires_followup"]),
+        _bool_to_db(record["conversation_complete"]),
+        record["total_turns"],
+        record["initial_transcription"],
+        record["final_transcription"],
+        record["final_response"],
+        json.dumps(record["initial_feedback_points"], ensure_ascii=False),
+    )
+
+
+def _row_to_record(row: sqlite3.Row, columns: Iterable[str] = RECORD_COLUMNS) -> Dict[str, Any]:
+    record = {column: row[column] for column in columns}
+    for column in ("requires_followup", "conversation_complete"):
+        if column in record:
+            record[column] = _db_to_bool(record[column])
+    if "initial_feedback_points" in record:
+        try:
+            record["initial_feedback_points"] = json.loads(record["initial_feedback_points"] or "[]")
+        except ValueError:
+            record["initial_feedback_points"] = []
+    return record
+
+
+def encode_cursor(sort: str, order: str, value: Any, filename: str) -> str:
+    raw = json.dumps([sort, order, value, filename], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[Any, str]:
+    """
+    (sort value, filename) of the last row of the previous page.
+    Raises ValueError for malformed cursors or ones issued for a different sort.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, filename = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(filename, str):
+        raise ValueError("Cursor does not match the requested sort order")
+    return value, filename
+
+
+class ConversationStore:
+    """
+    Thread-safe wrapper around a single SQLite connection.
+    """
+
+    def __init__(self, db_path: str, feedback_capacity: int = DEFAULT_CAPACITY):
+        self.db_path = db_path
+        # Entries per feedback sketch in the hourly aggregates
+        self.feedback_capacity = feedback_capacity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # generation tells databases apart, so their version numbers never collide
+        self._conn.execute(
+            "INSERT OR IGNORE INTO data_version (id, generation, version, modified_at) VALUES (1, ?, 0, ?)",
+            (uuid.uuid4().hex, time.time()),
+        )
+        self._conn.commit()
+        if not self._has_buckets() and self.count():
+            # Database created before bucket aggregates existed
+            self.rebuild_buckets()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, filename: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Index a saved conversation payload. Re-adding the same filename replaces it.
+        """
+        record = record_from_conversation(filename, payload)
+        self.add_records([record])
+        return record
+
+    def add_payloads(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Index several (filename, payload) conversations in one transaction.
+        """
+        return self.add_records([record_from_conversation(filename, payload) for filename, payload in items])
+
+    def add_records(self, records: Iterable[Dict[str, Any]], replace: bool = True) -> int:
+        """
+        Insert records and update their hourly aggregates in a single transaction.
+        Existing filenames are replaced (or skipped when replace=False).
+        Returns the number of rows written.
+        """
+        pending: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            pending[record["filename"]] = record
+        if not pending:
+            return 0
+
+        sql = (
+            f"INSERT OR REPLACE INTO conversations ({RECORD_COLUMNS[0]}, {RECORD_COLUMNS[1]}, saved_ts, "
+            f"{', '.join(RECORD_COLUMNS[2:])}) VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 1))})"
+        )
+        with self._lock:
+            with self._conn:
+                deltas: Dict[int, BucketStats] = {}
+                for old in self._fetch_existing(list(pending)):
+                    if not replace:
+                        del pending[old["filename"]]
+                        continue
+                    key = bucket_start(saved_at_timestamp(old["saved_at"]))
+                    deltas.setdefault(key, self._new_stats()).add_record(old, sign=-1)
+
+                rows = [_record_to_row(r) for r in pending.values()]
+                for record, row in zip(pending.values(), rows):
+                    deltas.setdefault(bucket_start(row[2]), self._new_stats()).add_record(record)
+
+                self._conn.executemany(sql, rows)
+                self._apply_bucket_deltas(deltas)
+                if rows:
+                    self._conn.execute(
+                        "UPDATE data_version SET version = version + 1, modified_at = ? WHERE id = 1", (time.time(),)
+                    )
+            return len(rows)
+
+    def _fetch_existing(self, filenames: List[str]) -> List[Dict[str, Any]]:
+        existing = []
+        for i in range(0, len(filenames), LOOKUP_CHUNK_SIZE):
+            chunk = filenames[i:i + LOOKUP_CHUNK_SIZE]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(RECORD_COLUMNS)} FROM conversations "
+                f"WHERE filename IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            existing.extend(_row_to_record(row) for row in rows)
+        return existing
+
+    def _apply_bucket_deltas(self, deltas: Dict[int, BucketStats]):
+        for key, delta in deltas.items():
+            row = self._conn.execute(
+                "SELECT stats FROM analytics_buckets WHERE bucket_start = ?", (key,)
+            ).fetchone()
+            if row:
+                stats = BucketStats.from_json(row["stats"], self.feedback_capacity)
+                stats.merge(delta)
+                stats.prune()
+            else:
+                stats = delta
+            if stats.count > 0:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analytics_buckets (bucket_start, stats) VALUES (?, ?)",
+                    (key, stats.to_json()),
+                )
+            else:
+                self._conn.execute("DELETE FROM analytics_buckets WHERE bucket_start = ?", (key,))
+
+    def _has_buckets(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM analytics_buckets LIMIT 1").fetchone() is not None
+
+    def rebuild_buckets(self):
+        """
+        Recompute every hourly aggregate from the stored records.
+        """
+        buckets: Dict[int, BucketStats] = {}
+        for record in self.query():
+            key = bucket_start(saved_at_timestamp(record["saved_at"]))
+            buckets.setdefault(key, self._new_stats()).add_record(record)
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM analytics_buckets")
+                self._conn.executemany(
+                    "INSERT INTO analytics_buckets (bucket_start, stats) VALUES (?, ?)",
+                    [(key, stats.to_json()) for key, stats in buckets.items()],
+                )
+
+    def data_version(self) -> Tuple[str, int, float]:
+        """
+        (generation, version, modified_at): version goes up with every committed write,
+        modified_at is the epoch time of the last one.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT generation, version, modified_at FROM data_version WHERE id = 1").fetchone()
+        return row["generation"], row["version"], row["modified_at"]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def query(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Return records whose saved_at falls within [start_dt, end_dt] (both inclusive).
+        With no bounds every record is returned, including ones without a valid saved_at.
+        """
+        return self._query_ts(
+            start_dt.timestamp() if start_dt else None,
+            end_dt.timestamp() if end_dt else None,
+            bounded=bool(start_dt or end_dt),
+        )
+
+    def _query_ts(self, start_ts: Optional[float], end_ts: Optional[float],
+                  bounded: bool = True, end_inclusive: bool = True,
+                  columns: Iterable[str] = RECORD_COLUMNS) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(columns)} FROM conversations"
+        clauses = []
+        params: List[float] = []
+        if bounded:
+            clauses.append("saved_ts IS NOT NULL")
+        if start_ts is not None:
+            clauses.append("saved_ts >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            clauses.append("saved_ts <= ?" if end_inclusive else "saved_ts < ?")
+            params.append(end_ts)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY saved_ts, filename"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_record(row, columns) for row in rows]
+
+    def list_records(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None,
+                     fields: Iterable[str] = DEFAULT_LIST_FIELDS, sort: str = "saved_at", order: str = "desc",
+                     limit: int = 50, cursor: Optional[str] = None,
+                     min_score: Optional[float] = None, max_score: Optional[float] = None,
+                     sentiments: Optional[Iterable[str]] = None,
+                     requires_followup: Optional[bool] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of records in [start_dt, end_dt] (same date semantics as `query`) matching
+        the filters, with only `fields` (plus filename) projected. Sentiment "Unknown" matches
+        records without one. Returns (records, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for unknown fields/sort keys or a bad cursor.
+        """
+        fields = list(dict.fromkeys(["filename", *fields]))
+        unknown = [field for field in fields if field not in RECORD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        column = SORT_COLUMNS[sort]
+        limit = max(1, min(limit, MAX_LIST_LIMIT))
+
+        clauses = []
+        params: List[Any] = []
+        if start_dt or end_dt:
+            clauses.append("saved_ts IS NOT NULL")
+        if start_dt:
+            clauses.append("saved_ts >= ?")
+            params.append(start_dt.timestamp())
+        if end_dt:
+            clauses.append("saved_ts <= ?")
+            params.append(end_dt.timestamp())
+        if min_score is not None:
+            clauses.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("score <= ?")
+            params.append(max_score)
+        if sentiments:
+            sentiments = list(sentiments)
+            named = [s for s in sentiments if s != "Unknown"]
+            options = [f"sentiment IN ({', '.join('?' * len(named))})"] if named else []
+            if "Unknown" in sentiments:
+                options.append("sentiment IS NULL")
+            clauses.append("(" + " OR ".join(options) + ")")
+            params.extend(named)
+        if requires_followup is not None:
+            clauses.append("requires_followup = ?")
+            params.append(_bool_to_db(requires_followup))
+
+        # Rows with a NULL sort value come first ascending and last descending. Each
+        # segment is read in index order with a row-value seek past the cursor.
+        segments = [True, False] if order == "asc" else [False, True]
+        after = decode_cursor(cursor, sort, order) if cursor else None
+        if after is not None:
+            segments = segments[segments.index(after[0] is None):]
+        selected = fields if column in fields else [*fields, column]
+        direction = "ASC" if order == "asc" else "DESC"
+        op = ">" if order == "asc" else "<"
+
+        rows: List[sqlite3.Row] = []
+        for null_segment in segments:
+            segment_clauses = [*clauses, f"{column} IS NULL" if null_segment else f"{column} IS NOT NULL"]
+            segment_params = list(params)
+            if after is not None and (after[0] is None) == null_segment:
+                if null_segment:
+                    segment_clauses.append(f"filename {op} ?")
+                    segment_params.append(after[1])
+                else:
+                    segment_clauses.append(f"({column}, filename) {op} (?, ?)")
+                    segment_params.extend(after)
+            sql = (
+                f"SELECT {', '.join(selected)} FROM conversations WHERE {' AND '.join(segment_clauses)} "
+                f"ORDER BY {column} {direction}, filename {direction} LIMIT ?"
+            )
+            with self._lock:
+                rows.extend(self._conn.execute(sql, [*segment_params, limit + 1 - len(rows)]).fetchall())
+            if len(rows) > limit:
+                break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, order, last[column], last["filename"])
+        return [_row_to_record(row, fields) for row in rows], next_cursor
+
+    def summarize(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None) -> BucketStats:
+        """
+        Aggregate stats for [start_dt, end_dt] (both inclusive, same semantics as `query`).
+        Whole hours come from the pre-aggregated buckets; only records in the partial
+        hours at either edge of the range are read individually.
+        """
+        if not (start_dt or end_dt):
+            return self._merge_buckets(None, None, include_undated=True)
+
+        start_ts = start_dt.timestamp() if start_dt else None
+        end_ts = end_dt.timestamp() if end_dt else None
+
+        # First and (exclusive) last whole bucket inside the range
+        first_full = math.ceil(start_ts / BUCKET_SECONDS) * BUCKET_SECONDS if start_ts is not None else None
+        end_full = (
+            math.floor(round(end_ts + 1e-6, 6) / BUCKET_SECONDS) * BUCKET_SECONDS
+            if end_ts is not None else None
+        )
+
+        if first_full is not None and end_full is not None and first_full >= end_full:
+            return BucketStats.from_records(self._query_ts(start_ts, end_ts), self.feedback_capacity)
+
+        stats = self._merge_buckets(first_full, end_full, include_undated=False)
+        if start_ts is not None and start_ts < first_full:
+            stats.merge(BucketStats.from_records(
+                self._query_ts(start_ts, first_full, end_inclusive=False), self.feedback_capacity))
+        if end_ts is not None and end_full <= end_ts:
+            stats.merge(BucketStats.from_records(self._query_ts(end_full, end_ts), self.feedback_capacity))
+        return stats
+
+    def feedback_counts(self, start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None) -> Counter:
+        """
+        Exact feedback point counts for [start_dt, end_dt] (same semantics as `query`).
+        Reads the feedback column of every record in the range.
+        """
+        records = self._query_ts(
+            start_dt.timestamp() if start_dt else None,
+            end_dt.timestamp() if end_dt else None,
+            bounded=bool(start_dt or end_dt),
+            columns=("initial_feedback_points",),
+        )
+        counts: Counter = Counter()
+        for record in records:
+            counts.update(feedback_points(record))
+        return counts
+
+    def saved_range(self) -> Optional[Tuple[float, float]]:
+        """
+        (earliest, latest) saved_ts of the dated records, or None if there are none.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(saved_ts), MAX(saved_ts) FROM conversations WHERE saved_ts IS NOT NULL"
+            ).fetchone()
+        return (row[0], row[1]) if row[0] is not None else None
+
+    def timeseries(self, start_ts: float, end_ts: float, bucket_of: Callable[[float], float]) -> Dict[float, BucketStats]:
+        """
+        Aggregate records with start_ts <= saved_ts <= end_ts by `bucket_of(saved_ts)` (e.g. the
+        start of the local day). An hourly aggregate is merged whole when its hour maps to a single
+        bucket; records are only read for hours straddling a bucket edge and the partial hours at
+        either end of the range. Feedback counts are left out of the whole-hour merges.
+        """
+        series: Dict[float, BucketStats] = defaultdict(self._new_stats)
+
+        def add_records(records: List[Dict[str, Any]]):
+            for record in records:
+                series[bucket_of(saved_at_timestamp(record["saved_at"]))].add_record(record)
+
+        first_full = math.ceil(start_ts / BUCKET_SECONDS) * BUCKET_SECONDS
+        end_full = math.floor(round(end_ts + 1e-6, 6) / BUCKET_SECONDS) * BUCKET_SECONDS
+        if first_full >= end_full:
+            add_records(self._query_ts(start_ts, end_ts))
+            return dict(series)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bucket_start, stats FROM analytics_buckets WHERE bucket_start >= ? AND bucket_start < ? "
+                "ORDER BY bucket_start",
+                (first_full, end_full),
+            ).fetchall()
+
+        straddling = []
+        for row in rows:
+            hour = row["bucket_start"]
+            key = bucket_of(hour)
+            if bucket_of(hour + BUCKET_SECONDS - 1) == key:
+                series[key].merge_dict(json.loads(row["stats"]), include_feedback=False)
+            else:
+                straddling.append(hour)
+        for hour in straddling:
+            add_records(self._query_ts(hour, hour + BUCKET_SECONDS, end_inclusive=False))
+
+        if start_ts < first_full:
+            add_records(self._query_ts(start_ts, first_full, end_inclusive=False))
+        if end_full <= end_ts:
+            add_records(self._query_ts(end_full, end_ts))
+        return dict(series)
+
+    def _merge_buckets(self, first: Optional[int], end: Optional[int], include_undated: bool) -> BucketStats:
+        sql = "SELECT stats FROM analytics_buckets"
+        clauses = []
+        params: List[int] = []
+        if not include_undated:
+            clauses.append("bucket_start != ?")
+            params.append(UNDATED_BUCKET)
+        if first is not None:
+            clauses.append("bucket_start >= ?")
+            params.append(first)
+        if end is not None:
+            clauses.append("bucket_start < ?")
+            params.append(end)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        stats = self._new_stats()
+        for row in rows:
+            stats.merge_dict(json.loads(row["stats"]))
+        return stats
+
+    def _new_stats(self) -> BucketStats:
+        return BucketStats(self.feedback_capacity)
+
+    def import_directory(self, directory: str) -> int:
+        """
+        Index every conversation in `directory` that is not already stored: one
+        conversation per *.json file, plus *.jsonl shards of
+        {"filename": ..., "conversation": {...}} lines (see generate_mock_data.py).
+        Returns the number of newly imported conversations.
+        """
+        if not os.path.isdir(directory):
+            return 0
+
+        imported = 0
+        batch: List[Dict[str, Any]] = []
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if filename.endswith(".json"):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except Exception as exc:
+                    logger.warning("failed reading conversation file", extra={"file": filename, "error": str(exc)})
+                    continue
+                batch.append(record_from_conversation(filename, data))
+            elif filename.endswith(".jsonl"):
+                for entry in self._read_shard(path):
+                    batch.append(record_from_conversation(entry["filename"], entry["conversation"]))
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        imported += self.add_records(batch, replace=False)
+                        batch = []
+            else:
+                continue
+
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += self.add_records(batch, replace=False)
+                batch = []
+
+        imported += self.add_records(batch, replace=False)
+        return imported
+
+    @staticmethod
+    def _read_shard(path: str) -> Iterable[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    if "filename" in entry and "conversation" in entry:
+                        yield entry
+                        continue
+                except ValueError:
+                    pass
+                logger.warning("skipping malformed line", extra={"file": os.path.basename(path), "line": lineno})
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import saved conversation JSON files into the SQLite analytics store."
+    )
+    parser.add_argument(
+        "--dir",
+        default="conversations",
+        help="Directory containing conversation JSON files / JSONL shards (default: conversations)",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.environ.get("CONVERSATIONS_DB", "conversations.db"),
+        help="Path to the SQLite database (default: $CONVERSATIONS_DB or conversations.db)",
+    )
+    args = parser.parse_args()
+
+    store = ConversationStore(args.db)
+    imported = store.import_directory(args.dir)
+    print(f"✅ Imported {imported} conversation(s) from {args.dir}/ into {args.db} ({store.count()} total)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Background writer for completed conversations.
+
+`save_conversation_file` in server.py hands payloads to a single writer thread
+instead of writing on the event loop. The thread group-commits whatever has
+queued up (up to CONVERSATION_WRITE_BATCH items, waiting at most
+CONVERSATION_WRITE_DELAY_MS for more):
+
+ 1. each payload is written to a hidden temp file in conversations/
+ 2. the temp files are fsync'd together (CONVERSATION_FSYNC=batch, the default)
+ 3. each temp file is atomically renamed to conversation_<UTC time>_<id>.json
+ 4. the directory is fsync'd once and the whole batch is indexed in the
+    conversation store in one transaction
+
+Filenames carry a unique conversation id, so conversations finishing in the
+same second no longer overwrite each other.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, InvalidStateError
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+FSYNC_MODES = ("batch", "off")
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def conversation_filename(conversation_id: str, when: Optional[datetime] = None) -> str:
+    ts = (when or datetime.utcnow()).strftime("%Y%m%d_%H%M%S")
+    return f"conversation_{ts}_{conversation_id}.json"
+
+
+class ConversationWriter:
+    def __init__(self, directory: str, store, max_batch: int = 256, max_delay_ms: float = 5,
+                 fsync: str = "batch"):
+        if fsync not in FSYNC_MODES:
+            raise RuntimeError(f"CONVERSATION_FSYNC must be one of: {', '.join(FSYNC_MODES)}")
+        self.directory = directory
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.fsync = fsync
+        self.batches_written = 0
+        self.conversations_written = 0
+        self._queue: "queue.Queue[Optional[Tuple[Dict[str, Any], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        """
+        Queue a conversation for writing. The future resolves to its filename once it
+        is durable on disk and indexed in the store.
+        """
+        future: Future = Future()
+        self._queue.put((payload, future))
+        return future
+
+    async def save(self, payload: Dict[str, Any]) -> str:
+        return await asyncio.wrap_future(self.submit(payload))
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Flush everything queued so far and stop the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            # Collect whatever else arrives within the group-commit window
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Never let the thread die: every later save would wait forever
+                logger.exception("conversation writer error", extra={"size": len(batch)})
+                for _, future in batch:
+                    self._resolve(future, error=e)
+            if stopping:
+                return
+
+    @staticmethod
+    def _resolve(future: Future, result: Optional[str] = None, error: Optional[BaseException] = None):
+        # A caller that gave up (request cancelled or past its deadline) no longer wants the answer;
+        # the conversation is still written
+        if future.done():
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # Cancelled by asyncio.wrap_future between the check and the set
+            pass
+
+    def _write_batch(self, batch: List[Tuple[Dict[str, Any], Future]]):
+        written: List[Tuple[str, Dict[str, Any], Future]] = []
+        pending: List[Tuple[str, str, Dict[str, Any], Future]] = []
+        try:
+            for payload, future in batch:
+                conversation_id = payload.get("conversation_id") or new_conversation_id()
+                filename = conversation_filename(conversation_id)
+                tmp_path = os.path.join(self.directory, f".{filename}.tmp")
+                try:
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(payload, f, ensure_ascii=False)
+                except Exception as e:
+                    self._resolve(future, error=e)
+                    continue
+                pending.append((tmp_path, filename, payload, future))
+
+            # All data is already written, so these fsyncs overlap their I/O
+            for tmp_path, filename, payload, future in pending:
+                try:
+                    if self.fsync == "batch":
+                        fd = os.open(tmp_path, os.O_RDONLY)
+                        try:
+                            os.fsync(fd)
+                        finally:
+                            os.close(fd)
+                    os.replace(tmp_path, os.path.join(self.directory, filename))
+                except Exception as e:
+                    self._resolve(future, error=e)
+                    continue
+                written.append((filename, payload, future))
+
+            if written and self.fsync == "batch" and hasattr(os, "O_DIRECTORY"):
+                dir_fd = os.open(self.directory, os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+            self.store.add_payloads([(filename, payload) for filename, payload, _ in written])
+        except Exception as e:
+            logger.error("failed writing conversation batch", extra={"error": str(e), "size": len(written)})
+            for _, _, future in written:
+                self._resolve(future, error=e)
+            return
+
+        self.batches_written += 1
+        self.conversations_written += len(written)
+        for filename, _, future in written:
+            self._resolve(future, filename)
@@ -0,0 +1,142 @@
+"""
+Micro-batching of text-only initial-feedback model calls.
+
+Under burst load every /submit_feedback costs one model call. With
+FEEDBACK_BATCHING=1 the server hands text-only requests to a `MicroBatcher`
+instead: requests arriving within FEEDBACK_BATCH_MAX_WAIT_MS of the first one
+(up to FEEDBACK_BATCH_MAX_SIZE) are sent as one multi-item prompt, and each
+waiting request gets back the JSON text of its own item.
+
+Items the batch response does not answer cleanly (call error, unparseable
+output, missing or invalid result) fall back to a normal single call, so
+batching never turns a good request into a failed one.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Added-latency samples kept for the p50/p95 in stats()
+WAIT_SAMPLES = 2000
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class MicroBatcher:
+    """
+    `batch_fn(items)` makes one call for several items and returns one result text per
+    item (None where the item must fall back); `single_fn(item)` handles one item alone.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Optional[str]]]],
+                 single_fn: Callable[[Any], Awaitable[str]], max_batch: int = 8, max_wait_ms: float = 20):
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks: hold running batches until they finish
+        self._tasks: Set[asyncio.Future] = set()
+        self._started = time.monotonic()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.items = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.single_calls = 0
+        self.batch_failures = 0
+        self.fallbacks = 0
+
+    async def submit(self, item: Any) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+        self.items += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        now = time.monotonic()
+        for _, _, enqueued in batch:
+            self._waits.append(now - enqueued)
+
+        if len(batch) == 1:
+            # Nothing to share the call with
+            self.single_calls += 1
+            await self._single(*batch[0][:2])
+            return
+
+        self.batches += 1
+        self.batched_items += len(batch)
+        try:
+            results = await self.batch_fn([item for item, _, _ in batch])
+        except Exception as e:
+            logger.warning("batched model call failed, falling back to single calls", extra={"error": str(e)})
+            self.batch_failures += 1
+            results = [None] * len(batch)
+
+        fallbacks = []
+        for (item, future, _), result in zip(batch, results):
+            if result is None:
+                fallbacks.append(self._single(item, future))
+            elif not future.done():
+                future.set_result(result)
+        if fallbacks:
+            self.fallbacks += len(fallbacks)
+            await asyncio.gather(*fallbacks)
+
+    async def _single(self, item: Any, future: asyncio.Future):
+        try:
+            result = await self.single_fn(item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        model_calls = self.batches + self.single_calls + self.fallbacks
+        elapsed = time.monotonic() - self._started
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "items": self.items,
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "single_calls": self.single_calls,
+            "batch_failures": self.batch_failures,
+            "fallbacks": self.fallbacks,
+            "model_calls": model_calls,
+            "items_per_model_call": round(self.items / model_calls, 2) if model_calls else 0.0,
+            "items_per_second": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+            "added_latency_ms": {
+                "p50": round(percentile(waits, 50) * 1000, 2),
+                "p95": round(percentile(waits, 95) * 1000, 2),
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
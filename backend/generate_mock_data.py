@@ -1,14 +1,38 @@
 """
-Generate 50 mock conversation JSON files for dashboard testing.
+Generate mock conversations for dashboard testing and large-corpus benchmarks.
+
+Usage:
+------
+    python generate_mock_data.py                       # 50 JSON files in conversations/
+    python generate_mock_data.py --count 1000000 --days 365 --seed 7 \
+        --format sqlite --out conversations.db         # straight into the analytics store
+    python generate_mock_data.py --count 2000000 --format jsonl --out shards/
+
+Formats:
+ - json    one conversation_<timestamp>_<index>.json file per conversation (what the server saves)
+ - jsonl   shards of {"filename": ..., "conversation": {...}} lines, importable with conversation_store.py
+ - sqlite  rows + hourly aggregates written directly into a ConversationStore database
+
+Generation is split into chunks that run on --workers processes; each chunk has its
+own RNG derived from --seed, so the same arguments always produce the same data.
 """
+import argparse
 import os
 import json
 import random
+import time
 from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from typing import Optional, List, Dict, Any, Tuple
 
-# Ensure conversations directory exists
 CONVERSATIONS_DIR = "conversations"
-os.makedirs(CONVERSATIONS_DIR, exist_ok=True)
+
+CHUNK_SIZE = 10000
+
+# Relative weights for scores 0..10 (weighted towards 7-10 for realism)
+DEFAULT_SCORE_WEIGHTS = [2, 2, 3, 3, 4, 5, 6, 7, 8, 9, 10]
+# Relative weights for 1..5 follow-up turns when a follow-up is needed
+DEFAULT_TURN_WEIGHTS = [30, 35, 20, 10, 5]
 
 # Mock data templates
 SENTIMENTS = ["Positive", "Negative", "Neutral", "Frustrated", "Satisfied", "Confused", "Happy", "Disappointed"]
@@ -165,64 +189,59 @@ AI_RESPONSES = [
     "Thank you for bringing this to our attention. We'll make sure to address this issue."
 ]
 
-def generate_mock_conversation(index):
+def generate_mock_conversation(index, rng=random, end: Optional[datetime] = None, days: float = 30,
+                               score_weights: List[float] = DEFAULT_SCORE_WEIGHTS,
+                               turn_weights: List[float] = DEFAULT_TURN_WEIGHTS,
+                               passive_followup_rate: float = 0.4):
     """Generate a single mock conversation with realistic data."""
-    # Generate timestamp (spread over last 30 days)
-    days_ago = random.randint(0, 30)
-    timestamp = datetime.now(timezone.utc) - timedelta(days=days_ago, hours=random.randint(0, 23), minutes=random.randint(0, 59))
-    
-    # Generate score (weighted towards middle scores for realism)
-    score = random.choices(
-        range(11),
-        weights=[2, 2, 3, 3, 4, 5, 6, 7, 8, 9, 10]  # More 7-10 scores
-    )[0]
-    
+    # Generate timestamp (spread over the `days` before `end`)
+    end = end or datetime.now(timezone.utc)
+    timestamp = end - timedelta(seconds=rng.random() * days * 86400)
+
+    score = rng.choices(range(11), weights=score_weights)[0]
+
     # Determine sentiment based on score
     if score >= 9:
-        sentiment = random.choice(["Positive", "Happy", "Satisfied"])
+        sentiment = rng.choice(["Positive", "Happy", "Satisfied"])
     elif score >= 7:
-        sentiment = random.choice(["Neutral", "Satisfied", "Positive"])
-    elif score >= 4:
-        sentiment = random.choice(["Negative", "Frustrated", "Disappointed"])
+        sentiment = rng.choice(["Neutral", "Satisfied", "Positive"])
     else:
-        sentiment = random.choice(["Negative", "Frustrated", "Disappointed"])
-    
+        sentiment = rng.choice(["Negative", "Frustrated", "Disappointed"])
+
     # Generate initial transcription
-    initial_transcription = random.choice(FEEDBACK_TEMPLATES)
-    
+    initial_transcription = rng.choice(FEEDBACK_TEMPLATES)
+
     # Generate feedback points
-    feedback_points = random.choice(INITIAL_FEEDBACK_POINTS)
-    
+    feedback_points = rng.choice(INITIAL_FEEDBACK_POINTS)
+
     # Determine if follow-up is needed (more likely for low scores)
-    requires_followup = score < 7 or (score < 9 and random.random() < 0.4)
-    
-    # Generate conversation turns (0-5 turns)
+    requires_followup = score < 7 or (score < 9 and rng.random() < passive_followup_rate)
+
+    # Generate conversation turns
     if requires_followup:
-        num_turns = random.choices([1, 2, 3, 4, 5], weights=[30, 35, 20, 10, 5])[0]
+        num_turns = rng.choices(range(1, len(turn_weights) + 1), weights=turn_weights)[0]
     else:
         num_turns = 0
-    
+
     # Build turns
     turns = []
     for i in range(num_turns):
-        user_response = random.choice(FOLLOW_UP_RESPONSES)
-        ai_response = random.choice(AI_RESPONSES)
         turns.append({
-            "user": user_response,
-            "ai": ai_response
+            "user": rng.choice(FOLLOW_UP_RESPONSES),
+            "ai": rng.choice(AI_RESPONSES)
         })
-    
+
     # Final analysis
     final_analysis = {
         "transcription": turns[-1]["user"] if turns else initial_transcription,
-        "conversationalResponse": turns[-1]["ai"] if turns else random.choice(AI_RESPONSES),
+        "conversationalResponse": turns[-1]["ai"] if turns else rng.choice(AI_RESPONSES),
         "requiresFollowUp": False,  # All saved conversations are complete
         "conversationComplete": True,
         "score": score
     }
-    
-    # Build complete conversation
-    conversation = {
+
+    saved_at = timestamp.isoformat().replace("+00:00", "Z")
+    return {
         "score": score,
         "sentiment": sentiment,
         "initial_transcription": initial_transcription,
@@ -231,40 +250,136 @@ def generate_mock_conversation(index):
         "final_analysis": final_analysis,
         "metadata": {
             "total_turns": num_turns,
-            "completed_at": timestamp.isoformat() + "Z"
+            "completed_at": saved_at
         },
-        "saved_at": timestamp.isoformat() + "Z"
+        "saved_at": saved_at
     }
-    
-    return conversation
+
+
+def mock_filename(conversation: Dict[str, Any], index: int) -> str:
+    """Timestamped filename made unique by the conversation index."""
+    timestamp_str = conversation["saved_at"].replace(":", "").replace("-", "").split(".")[0].rstrip("Z")
+    return f"conversation_{timestamp_str}_{index:08d}.json"
+
+
+def generate_chunk(task: Tuple[int, int, int, Dict[str, Any]]) -> Tuple[int, Any]:
+    """
+    Worker: generate conversations [start, stop) and write them out.
+    Returns (chunk number, count written) or, for sqlite, (chunk number, records) so the
+    parent process stays the single database writer.
+    """
+    chunk, start, stop, options = task
+    rng = random.Random(f"{options['seed']}:{chunk}")
+    end = datetime.fromisoformat(options["end"])
+    out = options["out"]
+    fmt = options["format"]
+    indent = None if options["compact"] else 2
+
+    if fmt == "sqlite":
+        from conversation_store import record_from_conversation
+
+    records = []
+    shard = None
+    if fmt == "jsonl":
+        shard = open(os.path.join(out, f"conversations_{chunk:05d}.jsonl"), "w", encoding="utf-8")
+    try:
+        for index in range(start, stop):
+            conversation = generate_mock_conversation(
+                index, rng, end, options["days"], options["score_weights"],
+                options["turn_weights"], options["passive_followup_rate"],
+            )
+            filename = mock_filename(conversation, index)
+            if fmt == "json":
+                with open(os.path.join(out, filename), "w", encoding="utf-8") as f:
+                    json.dump(conversation, f, indent=indent, ensure_ascii=False)
+            elif fmt == "jsonl":
+                shard.write(json.dumps({"filename": filename, "conversation": conversation}, ensure_ascii=False))
+                shard.write("\n")
+            else:
+                records.append(record_from_conversation(filename, conversation))
+    finally:
+        if shard:
+            shard.close()
+
+    return chunk, (records if fmt == "sqlite" else stop - start)
+
+
+def parse_weights(value: str, expected: Optional[int] = None) -> List[float]:
+    weights = [float(w) for w in value.split(",")]
+    if expected is not None and len(weights) != expected:
+        raise argparse.ArgumentTypeError(f"expected {expected} comma-separated weights, got {len(weights)}")
+    return weights
+
 
 def main():
-    """Generate 50 mock conversation files."""
-    print("Generating 50 mock conversation files...")
-    
-    # Clear existing mock files (optional - comment out if you want to keep real data)
-    # for filename in os.listdir(CONVERSATIONS_DIR):
-    #     if filename.startswith("conversation_") and filename.endswith(".json"):
-    #         os.remove(os.path.join(CONVERSATIONS_DIR, filename))
-    
-    # Generate 50 conversations
-    for i in range(50):
-        conversation = generate_mock_conversation(i)
-        
-        # Create filename with timestamp
-        timestamp_str = conversation["saved_at"].replace(":", "").replace("-", "").split(".")[0]
-        filename = f"conversation_{timestamp_str}.json"
-        filepath = os.path.join(CONVERSATIONS_DIR, filename)
-        
-        # Save to file
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(conversation, f, indent=2, ensure_ascii=False)
-        
-        print(f"✓ Generated {filename} (Score: {conversation['score']}, Sentiment: {conversation['sentiment']}, Turns: {len(conversation['turns'])})")
-    
-    print(f"\n✅ Successfully generated 50 mock conversation files in {CONVERSATIONS_DIR}/")
-    print("   Refresh your dashboard to see the new data!")
+    parser = argparse.ArgumentParser(description="Generate mock customer feedback conversations.")
+    parser.add_argument("--count", type=int, default=50, help="Number of conversations (default: 50)")
+    parser.add_argument("--days", type=float, default=30, help="Spread saved_at over this many days (default: 30)")
+    parser.add_argument("--end", help="Latest saved_at, ISO datetime (default: now)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for reproducible output (default: 0)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--format", choices=("json", "jsonl", "sqlite"), default="json", help="Output format")
+    parser.add_argument("--out", help="Output directory (json/jsonl) or database path (sqlite)")
+    parser.add_argument("--compact", action="store_true", help="Write JSON without indentation (faster, smaller)")
+    parser.add_argument("--score-weights", type=lambda v: parse_weights(v, 11),
+                        default=DEFAULT_SCORE_WEIGHTS, help="11 comma-separated weights for scores 0..10")
+    parser.add_argument("--turn-weights", type=parse_weights,
+                        default=DEFAULT_TURN_WEIGHTS, help="Weights for 1..N follow-up turns")
+    parser.add_argument("--passive-followup-rate", type=float, default=0.4,
+                        help="Chance a 7-8 score needs a follow-up (default: 0.4)")
+    args = parser.parse_args()
+
+    end = datetime.fromisoformat(args.end.replace("Z", "+00:00")) if args.end else datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    out = args.out or (os.environ.get("CONVERSATIONS_DB", "conversations.db") if args.format == "sqlite" else CONVERSATIONS_DIR)
+    if args.format != "sqlite":
+        os.makedirs(out, exist_ok=True)
+
+    options = {
+        "seed": args.seed,
+        "end": end.isoformat(),
+        "days": args.days,
+        "out": out,
+        "format": args.format,
+        "compact": args.compact,
+        "score_weights": args.score_weights,
+        "turn_weights": args.turn_weights,
+        "passive_followup_rate": args.passive_followup_rate,
+    }
+    tasks = [
+        (chunk, start, min(start + CHUNK_SIZE, args.count), options)
+        for chunk, start in enumerate(range(0, args.count, CHUNK_SIZE))
+    ]
+
+    print(f"Generating {args.count} mock conversations ({args.format}) with {args.workers} worker(s)...")
+    started = time.perf_counter()
+
+    store = None
+    if args.format == "sqlite":
+        from conversation_store import ConversationStore
+        store = ConversationStore(out)
+
+    written = 0
+    with Pool(processes=max(1, args.workers)) as pool:
+        for chunk, result in pool.imap_unordered(generate_chunk, tasks):
+            if store:
+                written += store.add_records(result)
+            else:
+                written += result
+            print(f"✓ Chunk {chunk + 1}/{len(tasks)} ({written}/{args.count})")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Generated {written} conversations into {out} in {elapsed:.1f}s "
+          f"({written / max(elapsed, 1e-9):.0f}/s)")
+    if store:
+        store.close()
+    elif args.format == "json":
+        print("   Refresh your dashboard to see the new data!")
+    else:
+        print(f"   Import with: python conversation_store.py --dir {out}")
+
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,170 @@
+"""
+Approximate top-N counting of feedback points (Space-Saving).
+
+`SpaceSaving` tracks at most `capacity` distinct items. While it has room it
+counts exactly; once full, a new item replaces the item with the smallest
+count and inherits that count as its possible error. For every item:
+
+    count - error <= true count <= count
+
+and no error exceeds `floor`, the largest count an untracked item can have.
+For a single stream floor <= total / capacity, so any item seen more than
+total / capacity times is tracked.
+
+Sketches merge (the conversation store keeps one per hourly bucket and merges
+them for a date range): an item missing from one side is charged that side's
+floor and the merged sketch keeps the `capacity` largest counts, so the
+inequality above still holds and `floor` stays the reported error bound.
+
+Removals (a conversation re-saved under the same filename) are counted with
+a negative `n`. A sketch holding the item decrements it; otherwise the removal
+is kept in `removed` (the per-save delta sketch starts empty) and applied when
+the sketch is merged into the stored one. A removal that finds the item
+evicted there is dropped: its count stays an upper bound.
+"""
+
+import heapq
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 256
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = max(1, capacity)
+        self.total = 0
+        # Upper bound on the count of any item not in `counts` (0 while nothing was evicted)
+        self.floor = 0
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # Removals not matched by a tracked item yet, applied to the sketch this one is merged into
+        self.removed: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def exact(self) -> bool:
+        return self.floor == 0 and not self.errors
+
+    def add(self, item: str, n: int = 1):
+        """
+        Count `n` occurrences of `item` (n < 0 removes them again).
+        """
+        self.total += n
+        if n < 0:
+            left = self._remove(item, -n)
+            if left:
+                self.removed[item] += left
+            return
+        pending = self.removed.get(item)
+        if pending:
+            cancelled = min(pending, n)
+            self.removed[item] -= cancelled
+            if not self.removed[item]:
+                del self.removed[item]
+            n -= cancelled
+        if not n:
+            return
+        if item in self.counts:
+            self.counts[item] += n
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = n
+            return
+        smallest = min(self.counts, key=self.counts.__getitem__)
+        base = self.counts[smallest]
+        self._drop(smallest)
+        self.floor = max(self.floor, base)
+        self.counts[item] = base + n
+        self.errors[item] = base
+
+    def _remove(self, item: str, n: int) -> int:
+        """
+        Take up to `n` occurrences off a tracked item; returns how many could not be removed.
+        """
+        count = self.counts.get(item)
+        if count is None:
+            return n
+        if count > n:
+            self.counts[item] = count - n
+            return 0
+        self._drop(item)
+        return n - count
+
+    def _drop(self, item: str):
+        del self.counts[item]
+        self.errors.pop(item, None)
+
+    def merge(self, other: "SpaceSaving"):
+        """
+        Add another sketch's counts. Items missing on one side are charged that side's floor.
+        """
+        self.total += other.total
+        if other.floor:
+            for item in self.counts.keys() - other.counts.keys():
+                self.counts[item] += other.floor
+                self.errors[item] = self.errors.get(item, 0) + other.floor
+        for item, n in other.counts.items():
+            error = other.errors.get(item, 0)
+            if item in self.counts:
+                self.counts[item] += n
+            else:
+                self.counts[item] = self.floor + n
+                error += self.floor
+            if error:
+                self.errors[item] = self.errors.get(item, 0) + error
+        self.floor += other.floor
+        # Removals that find nothing here were of evicted items (or of nothing) and are dropped
+        for item, n in other.removed.items():
+            self._remove(item, n)
+        # Trimming back to capacity is deferred: extra entries only make the sketch more precise
+        if len(self.counts) > 2 * self.capacity:
+            self.trim()
+
+    def trim(self):
+        """
+        Keep the `capacity` largest counts; the largest count dropped becomes the floor.
+        """
+        if len(self.counts) <= self.capacity:
+            return
+        kept = heapq.nlargest(self.capacity + 1, self.counts.items(), key=lambda entry: entry[1])
+        self.floor = max(self.floor, kept.pop()[1])
+        self.counts = dict(kept)
+        self.errors = {item: error for item, error in self.errors.items() if item in self.counts}
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """
+        The `n` largest (item, count, error) entries, ties broken by item.
+        """
+        entries = heapq.nsmallest(n, self.counts.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(item, count, self.errors.get(item, 0)) for item, count in entries]
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.trim()
+        data: Dict[str, Any] = {"capacity": self.capacity, "total": self.total, "counts": dict(self.counts)}
+        if self.floor:
+            data["floor"] = self.floor
+        if self.errors:
+            data["errors"] = dict(self.errors)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], capacity: int = DEFAULT_CAPACITY) -> "SpaceSaving":
+        """
+        Load a `to_dict()` sketch, or a plain {item: count} mapping (buckets stored before sketches).
+        """
+        sketch = cls(capacity)
+        if not data:
+            return sketch
+        if not isinstance(data.get("counts"), dict):
+            for item, count in data.items():
+                sketch.add(item, count)
+            return sketch
+        sketch.capacity = max(1, data.get("capacity", capacity))
+        sketch.total = data.get("total", 0)
+        sketch.floor = data.get("floor", 0)
+        sketch.counts = dict(data["counts"])
+        sketch.errors = dict(data.get("errors", {}))
+        return sketch
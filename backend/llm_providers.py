@@ -0,0 +1,338 @@
+"""
+LLM providers used by server.py.
+
+Both endpoints talk to the model only through `LLMProvider`:
+ - GeminiProvider (default): google.generativeai with one shared model client
+ - StubProvider: local, deterministic canned responses for load tests and
+   benchmarks (no network, no API key)
+
+Select with LLM_PROVIDER=gemini|stub.
+
+Stub settings:
+ - LLM_STUB_LATENCY_MS        mean simulated model latency (default 300)
+ - LLM_STUB_LATENCY_JITTER_MS spread around the mean (default 100)
+ - LLM_STUB_LATENCY_DIST      fixed | uniform | normal | lognormal (default uniform)
+ - LLM_STUB_MALFORMED_RATE    fraction of responses that are deliberately broken (default 0)
+ - LLM_STUB_ERROR_RATE        fraction of calls failing like an overloaded upstream (429/503, default 0)
+ - LLM_STUB_SEED              seed for reproducible latency/malformed sequences
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+from typing import Optional, Dict, Any, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+
+class LLMProvider:
+    """
+    Interface the server uses for every model interaction.
+
+    `generate` is async and returns the raw response text; `generate_stream`
+    yields the same text in chunks as it is produced. `upload_file` and
+    `delete_file` are blocking and are run by the server on its I/O executor.
+    """
+
+    name = "base"
+    model_name = ""
+
+    async def warm_up(self):
+        pass
+
+    async def generate(self, contents) -> str:
+        raise NotImplementedError
+
+    async def generate_stream(self, contents) -> AsyncIterator[str]:
+        # Providers without native streaming deliver the whole response as one chunk
+        yield await self.generate(contents)
+
+    def upload_file(self, path: str, mime_type: str):
+        raise NotImplementedError
+
+    def delete_file(self, handle):
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self):
+        # make sure google.generativeai is installed and compatible with your env
+        import google.generativeai as genai
+        from google.generativeai.types import GenerationConfig
+
+        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError(
+                "GEMINI_API_KEY or GOOGLE_API_KEY env variable not set. "
+                "Set with: export GEMINI_API_KEY='your-key' (or use LLM_PROVIDER=stub)"
+            )
+
+        self.model_name = os.environ.get("GEMINI_MODEL_NAME", "gemini-2.5-flash-preview-09-2025")
+        # "grpc" (SDK default, one multiplexed HTTP/2 channel) or "rest"
+        transport = os.environ.get("GEMINI_TRANSPORT") or None
+
+        genai.configure(api_key=api_key, transport=transport)
+        logger.info("gemini API configured")
+
+        options: Dict[str, Any] = {"response_mime_type": "application/json"}
+        if os.environ.get("GEMINI_TEMPERATURE"):
+            options["temperature"] = float(os.environ["GEMINI_TEMPERATURE"])
+        if os.environ.get("GEMINI_MAX_OUTPUT_TOKENS"):
+            options["max_output_tokens"] = int(os.environ["GEMINI_MAX_OUTPUT_TOKENS"])
+
+        self._genai = genai
+        self.generation_config = GenerationConfig(**options)
+        # One model client shared by every request
+        self.model = genai.GenerativeModel(model_name=self.model_name, generation_config=self.generation_config)
+
+    async def warm_up(self):
+        """
+        Open the upstream connection (channel + TLS handshake) before the first real request.
+        """
+        try:
+            await self.model.count_tokens_async("warm-up")
+            logger.info("gemini model warmed up", extra={"model": self.model_name})
+        except Exception as e:
+            logger.warning("gemini warm-up failed", extra={"error": str(e)})
+
+    async def generate(self, contents) -> str:
+        response = await self.model.generate_content_async(contents)
+        return getattr(response, "text", None) or getattr(response, "content", None) or str(response)
+
+    async def generate_stream(self, contents) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(contents, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a trailing finish_reason) carry nothing to forward
+                continue
+            if text:
+                yield text
+
+    def upload_file(self, path: str, mime_type: str):
+        return self._genai.upload_file(path=path, mime_type=mime_type)
+
+    def delete_file(self, handle):
+        if hasattr(handle, "name"):
+            self._genai.delete_file(handle.name)
+        elif isinstance(handle, str):
+            self._genai.delete_file(handle)
+        elif hasattr(handle, "delete"):
+            handle.delete()
+
+
+# Broken outputs the stub can inject to exercise the server's parsing/error paths
+MALFORMED_KINDS = ("truncated", "prose", "single_quotes", "string_bool", "empty")
+
+# Simulated token streaming: characters per chunk and share of latency before the first chunk
+STREAM_CHUNK_CHARS = 12
+STREAM_FIRST_CHUNK_SHARE = 0.3
+
+
+class StubUpstreamError(Exception):
+    """
+    Transient upstream failure injected by the stub; `code` mirrors google.api_core's HTTP status.
+    """
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} stub upstream error")
+        self.code = code
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline provider returning canned JSON that matches AI_PROMPT / FOLLOWUP_PROMPT.
+    """
+
+    name = "stub"
+    model_name = "stub"
+
+    def __init__(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                 distribution: Optional[str] = None, malformed_rate: Optional[float] = None,
+                 seed: Optional[int] = None, error_rate: Optional[float] = None):
+        env = os.environ.get
+        self.latency_ms = float(latency_ms if latency_ms is not None else env("LLM_STUB_LATENCY_MS", "300"))
+        self.jitter_ms = float(jitter_ms if jitter_ms is not None else env("LLM_STUB_LATENCY_JITTER_MS", "100"))
+        self.distribution = (distribution or env("LLM_STUB_LATENCY_DIST", "uniform")).lower()
+        self.malformed_rate = float(malformed_rate if malformed_rate is not None else env("LLM_STUB_MALFORMED_RATE", "0"))
+        self.error_rate = float(error_rate if error_rate is not None else env("LLM_STUB_ERROR_RATE", "0"))
+        if seed is None and env("LLM_STUB_SEED"):
+            seed = int(env("LLM_STUB_SEED"))
+        self._random = random.Random(seed)
+        self._uploads = 0
+        if self.distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise RuntimeError("LLM_STUB_LATENCY_DIST must be one of: fixed, uniform, normal, lognormal")
+        logger.info("stub LLM provider", extra={
+            "distribution": self.distribution, "latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+            "malformed_rate": self.malformed_rate, "error_rate": self.error_rate})
+
+    def sample_latency(self) -> float:
+        """
+        Simulated model latency in seconds.
+        """
+        mean, spread = self.latency_ms, self.jitter_ms
+        if self.distribution == "fixed" or spread <= 0:
+            ms = mean
+        elif self.distribution == "uniform":
+            ms = self._random.uniform(mean - spread, mean + spread)
+        elif self.distribution == "normal":
+            ms = self._random.gauss(mean, spread)
+        else:
+            # lognormal with the requested mean and standard deviation (long right tail)
+            sigma2 = math.log(1 + (spread / mean) ** 2) if mean > 0 else 0.0
+            ms = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2)) if mean > 0 else 0.0
+        return max(ms, 0.0) / 1000
+
+    async def generate(self, contents) -> str:
+        await asyncio.sleep(self.sample_latency())
+        self.maybe_fail()
+        return self.respond(contents)
+
+    async def generate_stream(self, contents) -> AsyncIterator[str]:
+        """
+        Same response as `generate`, delivered in small chunks: the first one after
+        STREAM_FIRST_CHUNK_SHARE of the sampled latency, the rest spread over the remainder.
+        """
+        latency = self.sample_latency()
+        text = self.respond(contents)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        await asyncio.sleep(latency * STREAM_FIRST_CHUNK_SHARE)
+        self.maybe_fail()
+        gap = latency * (1 - STREAM_FIRST_CHUNK_SHARE) / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(gap)
+            yield chunk
+
+    def maybe_fail(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise StubUpstreamError(self._random.choice((429, 503)))
+
+    def respond(self, contents) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = "\n".join(p for p in parts if isinstance(p, str))
+        has_audio = any(not isinstance(p, str) for p in parts)
+
+        payload = self.canned_response(prompt, has_audio)
+        if self.malformed_rate and self._random.random() < self.malformed_rate:
+            return self.malformed(payload, self._random.choice(MALFORMED_KINDS))
+        return json.dumps(payload)
+
+    def canned_response(self, prompt: str, has_audio: bool) -> Dict[str, Any]:
+        score_match = re.search(r"(?:score of|Rating):\s*(\d+)/10", prompt)
+        score = int(score_match.group(1)) if score_match else 5
+        utterance_match = re.search(r"User's (?:feedback|current response): \"(.*)\"\s*$", prompt, re.DOTALL)
+        transcription = utterance_match.group(1) if utterance_match else ""
+        if has_audio and not transcription:
+            transcription = "Stub transcription of the recorded audio."
+
+        # Re-ask for a broken reply (REPAIR_PROMPT): rebuild the object from what is recognisable
+        repair_match = re.search(r"<output>\n(.*)\n</output>", prompt, re.DOTALL)
+        if repair_match:
+            return self.repaired_response(repair_match.group(1), '"sentiment"' in prompt)
+
+        # Batched initial feedback (BATCH_FEEDBACK_PROMPT): one result per listed item
+        items_match = re.search(r"<items>\n(.*?)\n</items>", prompt, re.DOTALL)
+        if items_match:
+            items = [json.loads(line) for line in items_match.group(1).splitlines() if line.strip()]
+            return {"results": [
+                {"id": item["id"], **self.initial_response(item["score"], item["feedback"])} for item in items
+            ]}
+
+        # FOLLOWUP_PROMPT is the only prompt that mentions conversationComplete
+        if "conversationComplete" in prompt:
+            prior_turns = len(re.findall(r"^Turn \d+:", prompt, re.MULTILINE))
+            done = score >= 7 or prior_turns >= 2
+            return {
+                "transcription": transcription,
+                "conversationalResponse": (
+                    "Thank you, that's really helpful. We've passed this on to the team."
+                    if done else "Thanks for explaining. What one change would have made the biggest difference?"
+                ),
+                "requiresFollowUp": not done,
+                "conversationComplete": done,
+            }
+
+        return self.initial_response(score, transcription)
+
+    @staticmethod
+    def initial_response(score: int, transcription: str) -> Dict[str, Any]:
+        if score >= 9:
+            sentiment, response, follow_up = "Positive", "That's wonderful to hear! We really appreciate you sharing.", False
+        elif score >= 7:
+            sentiment, response, follow_up = "Neutral", "Thanks for the feedback. What's one thing we could do to make that a 10 for you?", True
+        else:
+            sentiment, response, follow_up = "Negative", "I'm very sorry to hear that. Could you tell me more about what went wrong?", True
+        words = [w.strip(".,!?") for w in transcription.split() if len(w) > 3]
+        return {
+            "transcription": transcription,
+            "sentiment": sentiment,
+            "feedback": [" ".join(words[:4]).capitalize()] if words else [],
+            "conversationalResponse": response,
+            "requiresFollowUp": follow_up,
+        }
+
+    @staticmethod
+    def repaired_response(broken: str, initial: bool) -> Dict[str, Any]:
+        def field(name: str) -> str:
+            match = re.search(rf"""["']{name}["']\s*:\s*["']?([^"',}}\]]*)""", broken)
+            return match.group(1).strip() if match else ""
+
+        follow_up = field("requiresFollowUp").lower() != "false"
+        payload = {
+            "transcription": field("transcription"),
+            "conversationalResponse": (
+                "Thanks for explaining. Could you tell me a bit more?" if follow_up
+                else "Thank you, that's really helpful. We've passed this on to the team."
+            ),
+            "requiresFollowUp": follow_up,
+        }
+        if initial:
+            payload.update(sentiment=field("sentiment") or "Neutral", feedback=[])
+        else:
+            payload["conversationComplete"] = not follow_up
+        return payload
+
+    @staticmethod
+    def malformed(payload: Dict[str, Any], kind: str) -> str:
+        text = json.dumps(payload)
+        if kind == "truncated":
+            return text[: len(text) // 2]
+        if kind == "prose":
+            return f"Sure! Here is the analysis you asked for:\n```json\n{json.dumps(payload, indent=2)}\n```\nLet me know if you need anything else."
+        if kind == "single_quotes":
+            return text.replace('"', "'")
+        if kind == "string_bool":
+            broken = dict(payload, requiresFollowUp=str(payload.get("requiresFollowUp", True)).lower())
+            return json.dumps(broken)
+        return ""
+
+    def upload_file(self, path: str, mime_type: str):
+        self._uploads += 1
+        return f"files/stub-{self._uploads}"
+
+    def delete_file(self, handle):
+        pass
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """
+    Build the provider named by `name` (default: $LLM_PROVIDER or "gemini").
+    """
+    name = (name or os.environ.get("LLM_PROVIDER", "gemini")).lower()
+    if name not in PROVIDERS:
+        raise RuntimeError(f"Unknown LLM_PROVIDER '{name}'. Choose one of: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
@@ -0,0 +1,71 @@
+"""
+Leveled, structured logging for the server.
+
+Modules log through `logging.getLogger(__name__)` and pass context as
+`extra={...}` fields instead of formatting it into the message:
+
+    logger.warning("upstream overloaded", extra={"reason": e.reason})
+
+LOG_FORMAT=text (default) renders those fields as key=value pairs after the
+message; LOG_FORMAT=json writes one JSON object per line for log shippers.
+LOG_LEVEL sets the threshold (DEBUG shows the raw model responses that used
+to be printed on every request).
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict
+
+# Attributes every LogRecord has; anything else came from `extra`
+STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in STANDARD_ATTRS}
+
+
+def timestamp(record: logging.LogRecord) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{timestamp(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={json.dumps(value, default=str, ensure_ascii=False)}"
+                                   for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": timestamp(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text"):
+    """
+    Install a stderr handler on the root logger, unless the host (e.g. a test
+    harness) already configured one.
+    """
+    if fmt not in ("text", "json"):
+        raise RuntimeError("LOG_FORMAT must be one of: text, json")
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root.addHandler(handler)
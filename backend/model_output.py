@@ -0,0 +1,266 @@
+"""
+Parsing and validation of model responses.
+
+The model is asked for `application/json`, so the common case is a bare JSON
+object (sometimes fenced or wrapped in prose) and `extract_json_object`
+first parses everything from the first "{" to the last "}". If that fails
+a single pass over the text finds top-level `{...}` spans, skipping braces
+inside JSON strings, and parses each in turn. orjson is used when installed (`pip install orjson`).
+
+`FeedbackAnalysis` / `FollowupAnalysis` describe the AI_PROMPT and
+FOLLOWUP_PROMPT responses; `validate_analysis` checks a parsed object against
+one of them and returns a plain dict for the rest of the pipeline.
+
+`parse_analysis` adds a cheap local repair pass for near misses: Python-style
+dicts, "true"/"false" strings for booleans, numbers or nulls in text fields.
+What that cannot fix is left to the server's short re-ask (REPAIR_PROMPT).
+"""
+
+import ast
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, StrictBool, ValidationError, field_validator
+
+try:
+    import orjson
+
+    def json_loads(text: str) -> Any:
+        return orjson.loads(text)
+except ImportError:  # optional speed-up
+    orjson = None
+    json_loads = json.loads
+
+# Characters the scanner has to look at; everything else is skipped in C
+STRUCTURAL = re.compile(r'[{}"\\]')
+
+# Longest candidate handed to ast.literal_eval in the loose pass
+LOOSE_MAX_CHARS = 100000
+
+BOOL_FIELDS = ("requiresFollowUp", "conversationComplete")
+TEXT_FIELDS = ("transcription", "conversationalResponse", "sentiment")
+BOOL_STRINGS = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+# How model replies were turned into a valid analysis: "clean" (as returned),
+# "coerced" (local repair), "reasked" (after the short repair call) or "failed"
+repair_tiers: Counter = Counter()
+
+
+def find_object_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) of each outermost balanced {...} span, found in one pass over the text.
+    Braces inside double-quoted strings do not count, and a stray "{" in surrounding
+    prose does not hide the object after it.
+    """
+    stack: List[int] = []
+    spans: List[Tuple[int, int]] = []
+    in_string = False
+    escaped_until = -1
+    for match in STRUCTURAL.finditer(text):
+        pos = match.start()
+        if pos < escaped_until:
+            continue
+        char = match.group()
+        if char == "\\":
+            # Only meaningful inside strings: skip the escaped character
+            if in_string:
+                escaped_until = pos + 2
+            continue
+        if char == '"':
+            if stack:
+                in_string = not in_string
+            continue
+        if in_string:
+            continue
+        if char == "{":
+            stack.append(pos)
+        elif stack:
+            spans.append((stack.pop(), pos + 1))
+
+    # Spans close inner-first; keep only those not nested in an earlier one
+    spans.sort()
+    outermost = []
+    covered_until = -1
+    for start, end in spans:
+        if end > covered_until:
+            outermost.append((start, end))
+            covered_until = end
+    return outermost
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Extract and parse the JSON object from model text output.
+    Raises ValueError if no object can be parsed.
+    """
+    if not text:
+        raise ValueError("Empty model response")
+
+    first, last = text.find("{"), text.rfind("}")
+    if first < 0 or last < first:
+        raise ValueError("No valid JSON found in model output")
+
+    # Fast path: the response is the object itself, possibly fenced or wrapped in prose
+    try:
+        parsed = json_loads(text[first:last + 1])
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+
+    for start, end in find_object_spans(text):
+        try:
+            parsed = json_loads(text[start:end])
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+
+    raise ValueError("No valid JSON found in model output")
+
+
+def extract_loose_object(text: str) -> Dict[str, Any]:
+    """
+    Second chance for output that is not JSON but close: a Python-style dict
+    (single quotes, True/False/None), or single-quoted JSON without apostrophes.
+    Raises ValueError if nothing usable is found.
+    """
+    for start, end in find_object_spans(text):
+        candidate = text[start:end]
+        if len(candidate) > LOOSE_MAX_CHARS:
+            continue
+        try:
+            parsed = ast.literal_eval(candidate)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            if '"' in candidate:
+                continue
+            # Only safe when there is no double quote an apostrophe swap could corrupt
+            try:
+                parsed = json_loads(candidate.replace("'", '"'))
+            except ValueError:
+                continue
+        if isinstance(parsed, dict):
+            return parsed
+    raise ValueError("No valid JSON found in model output")
+
+
+class InvalidAnalysis(ValueError):
+    """
+    Parsed JSON that does not match the expected schema.
+    """
+
+
+class AnalysisBase(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    transcription: Optional[str] = None
+    conversationalResponse: Optional[str] = None
+    requiresFollowUp: StrictBool = True
+    conversationComplete: Optional[StrictBool] = None
+
+
+class FeedbackAnalysis(AnalysisBase):
+    """
+    AI_PROMPT response.
+    """
+
+    sentiment: Optional[str] = None
+    feedback: Optional[List[str]] = None
+
+    @field_validator("feedback", mode="before")
+    @classmethod
+    def single_point_as_list(cls, value):
+        return [value] if isinstance(value, str) else value
+
+
+class FollowupAnalysis(AnalysisBase):
+    """
+    FOLLOWUP_PROMPT response.
+    """
+
+
+def validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"]) or "response"
+    return f"invalid {field}: {first['msg']}"
+
+
+def validate_analysis(parsed: Dict[str, Any], schema: Type[AnalysisBase]) -> Dict[str, Any]:
+    """
+    Validate a parsed response against `schema`; raises InvalidAnalysis with the offending field.
+    Missing requiresFollowUp defaults to True (the safe choice) and conversationComplete to
+    its opposite. Fields the model left out stay absent so callers can fill them.
+    """
+    try:
+        analysis = schema.model_validate(parsed)
+    except ValidationError as e:
+        raise InvalidAnalysis(validation_message(e)) from None
+    result = analysis.model_dump(exclude_none=True)
+    result.setdefault("conversationComplete", not result["requiresFollowUp"])
+    return result
+
+
+def coerce_fields(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of `parsed` with near-miss values fixed: "true"/"no"/1 for booleans,
+    a number where text is expected, null for an optional field.
+    """
+    coerced = {name: value for name, value in parsed.items() if value is not None}
+    for name in BOOL_FIELDS:
+        value = coerced.get(name)
+        if isinstance(value, str) and value.strip().lower() in BOOL_STRINGS:
+            coerced[name] = BOOL_STRINGS[value.strip().lower()]
+        elif type(value) is int and value in (0, 1):
+            coerced[name] = bool(value)
+    for name in TEXT_FIELDS:
+        if type(coerced.get(name)) in (int, float):
+            coerced[name] = str(coerced[name])
+    return coerced
+
+
+def coerce_analysis(parsed: Dict[str, Any], schema: Type[AnalysisBase]) -> Tuple[Dict[str, Any], bool]:
+    """
+    `validate_analysis`, retried once with `coerce_fields`. Returns (analysis, coerced).
+    """
+    try:
+        return validate_analysis(parsed, schema), False
+    except InvalidAnalysis as e:
+        coerced = coerce_fields(parsed)
+        if coerced == parsed:
+            raise
+        try:
+            return validate_analysis(coerced, schema), True
+        except InvalidAnalysis:
+            raise e from None
+
+
+def parse_analysis(text: str, schema: Type[AnalysisBase]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Extract and validate a model reply, repairing it locally if needed.
+    Returns (analysis, repaired); raises ValueError when local repair is not enough.
+    """
+    repaired = False
+    try:
+        parsed = extract_json_object(text)
+    except ValueError as e:
+        try:
+            parsed = extract_loose_object(text)
+        except ValueError:
+            raise e from None
+        repaired = True
+
+    analysis, coerced = coerce_analysis(parsed, schema)
+    return analysis, repaired or coerced
+
+
+def field_summary(schema: Type[AnalysisBase]) -> str:
+    """
+    The schema's fields and JSON types, for the repair prompt.
+    """
+    fields = []
+    for name, prop in schema.model_json_schema()["properties"].items():
+        types = [p.get("type") for p in prop.get("anyOf", [prop]) if p.get("type") not in (None, "null")]
+        fields.append(f'"{name}" ({types[0] if types else "any"})')
+    return ", ".join(fields)
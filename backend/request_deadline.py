@@ -0,0 +1,117 @@
+"""
+Per-request deadlines for the feedback endpoints.
+
+Each request gets a `Deadline` with its endpoint's budget
+(DEADLINE_<ENDPOINT>_SECONDS). Cancellable stages run through `Deadline.run`,
+which gives them at most what is left of the budget (optionally capped to a
+share of the total, and keeping a reserve for the stages after them). A stage
+that runs out is cancelled and `DeadlineExceeded` records which stage it was;
+the server turns that into a structured 504.
+
+Every stage's duration is kept in `Deadline.stages`, so the 504 (and the
+timeout counters in GET /stats) show where the budget went.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Timeouts so far, by "endpoint:stage"
+timeouts: Counter = Counter()
+
+# A reserve for later stages never takes more than this share of the budget,
+# so a budget at or under DEADLINE_FINISH_RESERVE_SECONDS still leaves time to generate
+MAX_RESERVE_SHARE = 0.25
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline: "Deadline", stage: str):
+        super().__init__(f"{deadline.endpoint} deadline exceeded during {stage}")
+        self.deadline = deadline
+        self.stage = stage
+
+    def detail(self) -> Dict[str, Any]:
+        return {
+            "error": "deadline_exceeded",
+            "endpoint": self.deadline.endpoint,
+            "stage": self.stage,
+            "budget_ms": round(self.deadline.budget * 1000),
+            "elapsed_ms": round(self.deadline.elapsed() * 1000),
+            "stages_ms": self.deadline.timeline(),
+        }
+
+
+class Deadline:
+    def __init__(self, endpoint: str, budget_seconds: float):
+        self.endpoint = endpoint
+        self.budget = budget_seconds
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.budget - self.elapsed()
+
+    def timeline(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Record a stage that is not cancelled on timeout (CPU-bound parsing, state updates).
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, time.monotonic() - started)
+
+    def expired(self, stage: str) -> DeadlineExceeded:
+        self.stages.setdefault(stage, 0.0)
+        timeouts[f"{self.endpoint}:{stage}"] += 1
+        logger.warning("deadline exceeded", extra={
+            "endpoint": self.endpoint, "stage": stage, "budget_seconds": self.budget, "stages_ms": self.timeline()})
+        return DeadlineExceeded(self, stage)
+
+    def stage_timeout(self, share: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Time a stage may take: what is left of the budget minus `reserve` for later
+        stages (at most MAX_RESERVE_SHARE of the budget), capped at `share` of the whole budget.
+        """
+        timeout = self.remaining() - min(reserve, self.budget * MAX_RESERVE_SHARE)
+        if share is not None:
+            timeout = min(timeout, self.budget * share)
+        return timeout
+
+    async def run(self, stage: str, awaitable: Awaitable, share: Optional[float] = None,
+                  reserve: float = 0.0, shield: bool = False) -> Any:
+        """
+        Await `awaitable` within this stage's timeout, cancelling it if the time runs out.
+        With `shield` the work itself keeps running after a timeout (the caller cleans up).
+        """
+        timeout = self.stage_timeout(share, reserve)
+        started = time.monotonic()
+        if timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise self.expired(stage)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(awaitable) if shield else awaitable, timeout)
+        except asyncio.TimeoutError:
+            self.record(stage, time.monotonic() - started)
+            raise self.expired(stage)
+        except BaseException:
+            self.record(stage, time.monotonic() - started)
+            raise
+        self.record(stage, time.monotonic() - started)
+        return result
@@ -0,0 +1,190 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it is sampled (PROFILE_SAMPLE_RATE) or sends the
+`X-Profile` header with the value of PROFILE_TOKEN (header triggering is off
+while no token is set). For each profiled request `ProfilerMiddleware` writes
+to PROFILE_DIR:
+
+ - `<id>.json`: method, route, status, total duration and the per-stage
+   timeline (stages report themselves through `record_stage`)
+ - with PROFILE_MODE=cprofile, `<id>.prof` (load with `python -m pstats`);
+   with PROFILE_MODE=pyinstrument (if installed), `<id>.html`
+
+The response carries `X-Profile-Id: <id>`. Only the newest PROFILE_MAX_COUNT
+profiles are kept.
+
+cProfile hooks the whole thread, so a .prof also contains whatever other
+requests ran on the event loop at the same time, and only one request is
+profiled this way at a time (others still get their timeline).
+pyinstrument's async mode attributes time to the profiled request only.
+"""
+
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # optional
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+MODES = ("timeline", "cprofile", "pyinstrument")
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "_" + uuid.uuid4().hex[:8]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.stages: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Add a stage duration to the timeline of the request being profiled, if any.
+    """
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(stage, seconds)
+
+
+class ProfilerMiddleware:
+    def __init__(self, app, directory: str = "profiles", sample_rate: float = 0.0, token: Optional[str] = None,
+                 mode: str = "timeline", max_profiles: int = 200, header: str = "x-profile"):
+        if mode not in MODES:
+            raise RuntimeError(f"PROFILE_MODE must be one of: {', '.join(MODES)}")
+        if mode == "pyinstrument" and PyinstrumentProfiler is None:
+            logger.warning("pyinstrument not installed, profiling timelines only")
+            mode = "timeline"
+        self.app = app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self.mode = mode
+        self.max_profiles = max_profiles
+        self.header = header.lower().encode()
+        self._cprofile_busy = False
+        os.makedirs(directory, exist_ok=True)
+
+    def _reason(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope.get("headers", []):
+                if name == self.header and value == self.token:
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+        status = [500]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        profiler = self._start_profiler()
+        context_token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - started
+            current_profile.reset(context_token)
+            self._stop_profiler(profiler)
+            route = getattr(scope.get("route"), "path", None)
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, profile, profiler, route, status[0], duration
+            )
+
+    def _start_profiler(self):
+        if self.mode == "pyinstrument":
+            profiler = PyinstrumentProfiler(async_mode="enabled")
+            profiler.start()
+            return profiler
+        if self.mode == "cprofile" and not self._cprofile_busy:
+            self._cprofile_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            self._cprofile_busy = False
+        elif profiler is not None:
+            profiler.stop()
+
+    def _write(self, profile: RequestProfile, profiler, route: Optional[str], status: int, duration: float):
+        base = os.path.join(self.directory, profile.id)
+        summary: Dict[str, Any] = {
+            "id": profile.id,
+            "reason": profile.reason,
+            "method": profile.method,
+            "path": profile.path,
+            "route": route,
+            "status": status,
+            "started_at": profile.started_at,
+            "duration_ms": round(duration * 1000, 2),
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in profile.stages.items()},
+            "profile_file": None,
+        }
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(base + ".prof")
+                summary["profile_file"] = profile.id + ".prof"
+            elif profiler is not None:
+                with open(base + ".html", "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+                summary["profile_file"] = profile.id + ".html"
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            self._enforce_retention()
+        except OSError as e:
+            logger.warning("failed writing request profile", extra={"profile_id": profile.id, "error": str(e)})
+            return
+        logger.info("request profiled", extra={
+            "profile_id": profile.id, "route": route, "duration_ms": summary["duration_ms"]})
+
+    def _enforce_retention(self):
+        # A profile is its .json plus an optional .prof/.html; drop the oldest profiles whole
+        profiles: Dict[str, List[Tuple[float, str]]] = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stem = os.path.splitext(entry.name)[0]
+                profiles.setdefault(stem, []).append((entry.stat().st_mtime, entry.path))
+        oldest_first = sorted(profiles.values(), key=lambda files: max(files)[0])
+        for files in oldest_first[:max(0, len(profiles) - self.max_profiles)]:
+            for _, path in files:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
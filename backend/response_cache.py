@@ -0,0 +1,188 @@
+"""
+Cache of raw model responses for text prompts.
+
+With a `transcription` the rendered prompt fully determines the model call, and
+feedback traffic repeats a lot ("great service", "fast shipping"). Responses
+are cached under a hash of (model name, rendered prompt):
+
+ - in memory: LRU of at most RESPONSE_CACHE_MAX_ENTRIES, each entry valid for
+   RESPONSE_CACHE_TTL_SECONDS
+ - optionally on disk (RESPONSE_CACHE_DB, SQLite) so the cache survives
+   restarts; memory misses fall through to disk and are promoted
+
+Only responses that parsed and validated are stored (the server calls `put`
+after parsing), so a malformed model reply is never replayed.
+
+Disk access holds its own lock, separate from the in-memory LRU's, so memory
+hits never wait behind a SQLite commit; with a disk cache the server calls
+`get`/`put` off the event loop.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+
+# Expired/over-cap rows in RESPONSE_CACHE_DB are purged at most this often
+DB_SWEEP_INTERVAL_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at);
+"""
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 86400, db_path: Optional[str] = None,
+                 db_max_entries: int = 1000000, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_max_entries = db_max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._conn = None
+        self._last_db_sweep = 0.0
+        if enabled and db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    @property
+    def disk(self) -> bool:
+        return self._conn is not None
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response text, or None (counted as a miss).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+                self.expirations += 1
+
+        row = None
+        with self._db_lock:
+            if self._conn:
+                row = self._conn.execute(
+                    "SELECT expires_at, response FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            # Promote the disk entry, keeping its original expiry
+            self._entries[key] = (row[0], row[1])
+            self._evict(now)
+            self.hits += 1
+            self.disk_hits += 1
+        return row[1]
+
+    def put(self, key: str, response: str):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            self.stores += 1
+            now = time.time()
+            self._evict(now)
+        with self._db_lock:
+            if self._conn:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, expires_at, response) VALUES (?, ?, ?)",
+                        (key, expires_at, response),
+                    )
+                self._sweep_db(now)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._conn:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": self._conn is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _evict(self, now: float):
+        # Least recently used first: drop expired entries, then anything over the size cap
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            if expires_at <= now:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def _sweep_db(self, now: float):
+        if now - self._last_db_sweep < DB_SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_db_sweep = now
+        with self._conn:
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.db_max_entries:
+                # Over the disk cap: drop the entries closest to expiry
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires_at LIMIT ?)",
+                    (count - self.db_max_entries,),
+                )
+
+    def close(self):
+        with self._db_lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,130 @@
+"""
+Incremental decoding of model output for the streaming endpoints.
+
+The model returns one JSON object, but the user-facing text lives in a single
+string field (`conversationalResponse`). `JsonStringFieldStreamer` watches the
+raw chunks as they arrive and emits the decoded characters of that field as
+soon as they are available, so the widget can show the reply before the
+whole JSON document (and the structured fields) has been generated.
+
+`ClosingStreamingResponse` runs a cleanup callback once the response is over.
+A body generator's own `finally` is not enough: when the client disconnects
+before the body starts, the generator is never entered and never cleans up.
+"""
+
+import inspect
+import json
+import re
+from typing import Any, Callable, Dict
+
+from starlette.responses import StreamingResponse
+
+ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonStringFieldStreamer:
+    """
+    Decode one string field of a JSON object that is arriving in chunks.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._pos = None  # next undecoded index inside the string value, once the key is seen
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add raw model output; return the newly decoded text of the field (may be "").
+        """
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._key.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf = self._buffer
+        i = self._pos
+        out = []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+
+            # Escape sequence: wait for the rest of it if the chunk ends mid-escape
+            if i + 1 >= len(buf):
+                break
+            e = buf[i + 1]
+            if e != "u":
+                out.append(ESCAPES.get(e, e))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            try:
+                code = int(buf[i + 2:i + 6], 16)
+            except ValueError:
+                out.append(buf[i:i + 6])
+                i += 6
+                continue
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: combine with the following \uDCxx
+                if i + 12 > len(buf):
+                    break
+                try:
+                    low = int(buf[i + 8:i + 12], 16) if buf[i + 6:i + 8] == "\\u" else None
+                except ValueError:
+                    low = None
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            out.append(chr(code))
+            i += 6
+
+        self._pos = i
+        return "".join(out)
+
+
+def ndjson_event(event_type: str, **fields: Any) -> str:
+    """
+    One line of the application/x-ndjson stream sent to the widget.
+    """
+    payload: Dict[str, Any] = {"type": event_type, **fields}
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always calls `on_close` (sync or async) when it ends, however it ends.
+    """
+
+    def __init__(self, content, on_close: Callable[[], Any], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            result = self.on_close()
+            if inspect.isawaitable(result):
+                await result
@@ -5,28 +5,218 @@ Endpoints:
  - GET  /health
  - POST /submit_feedback      (score + audio_data) -> initial analysis + history
  - POST /submit_followup      (score + conversation_history + transcription OR audio_data)
+ - POST /submit_feedback/stream, /submit_followup/stream
+                              same inputs; NDJSON stream of reply text, then the full result
 """
 import os
 import json
-import re
+import logging
+import math
+import asyncio
+import contextvars
+import functools
+import heapq
 import tempfile
-import traceback
-from collections import Counter
-from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable, Type
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 
-# make sure google.generativeai is installed and compatible with your env
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
+from analytics_buckets import BucketStats
+from analytics_cache import AnalyticsCache, make_etag, conditional_headers, not_modified, encode_body
+from analytics_stream import AnalyticsHub, HubFull
+from analytics_timeseries import (
+    INTERVALS, resolve_timezone, bucket_floor, bucket_starts, choose_interval, build_series,
+)
+from conversation_store import (
+    ConversationStore, parse_iso_datetime, record_from_conversation, DEFAULT_LIST_FIELDS, MAX_LIST_LIMIT,
+)
+from conversation_writer import ConversationWriter, new_conversation_id
+from session_store import SessionStore, SessionLocks
+from conversation_history import HistoryCompactor, PromptTokenStats, estimate_tokens
+from response_cache import ResponseCache
+from llm_providers import create_provider
+from feedback_batcher import MicroBatcher
+from upstream_gateway import UpstreamGateway, UpstreamOverloaded
+from request_deadline import Deadline, DeadlineExceeded, timeouts as deadline_timeouts
+from response_stream import ClosingStreamingResponse, JsonStringFieldStreamer, ndjson_event
+from log_config import configure_logging
+from metrics import Registry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from request_profiler import ProfilerMiddleware, record_stage
+from model_output import (
+    FeedbackAnalysis, FollowupAnalysis, AnalysisBase, InvalidAnalysis,
+    extract_json_object, coerce_analysis, parse_analysis, field_summary, repair_tiers,
+)
 
 # --- Config ---
+configure_logging(os.environ.get("LOG_LEVEL", "INFO"), os.environ.get("LOG_FORMAT", "text"))
+logger = logging.getLogger(__name__)
+
 CONVERSATIONS_DIR = "conversations"
 os.makedirs(CONVERSATIONS_DIR, exist_ok=True)
 
-app = FastAPI(title="Audio Feedback API", version="1.0.0")
+# SQLite index over saved conversations (analytics reads from here, not the directory)
+CONVERSATIONS_DB = os.environ.get("CONVERSATIONS_DB", "conversations.db")
+# Top feedback themes are counted in bounded sketches per hourly bucket (see heavy_hitters.py):
+# a larger capacity means more memory per bucket and smaller count errors
+FEEDBACK_SKETCH_CAPACITY = int(os.environ.get("FEEDBACK_SKETCH_CAPACITY", "256"))
+conversation_store = ConversationStore(CONVERSATIONS_DB, feedback_capacity=FEEDBACK_SKETCH_CAPACITY)
+if conversation_store.count() == 0:
+    # One-shot import of conversations saved before the store existed
+    imported = conversation_store.import_directory(CONVERSATIONS_DIR)
+    if imported:
+        logger.info("imported existing conversations", extra={"count": imported, "db": CONVERSATIONS_DB})
+
+# Serialized analytics responses keyed by ETag (endpoint + query + store data version)
+analytics_cache = AnalyticsCache(max_entries=int(os.environ.get("ANALYTICS_CACHE_MAX_ENTRIES", "256")))
+
+# Analytics reads (SQLite queries, aggregation, JSON encoding) run on this pool, never on the event loop
+ANALYTICS_WORKERS = int(os.environ.get("ANALYTICS_WORKERS", "4"))
+analytics_executor = ThreadPoolExecutor(max_workers=ANALYTICS_WORKERS, thread_name_prefix="analytics")
+
+# Ranges with at most this many conversations get exact top feedback counts (feedback_mode=auto)
+FEEDBACK_EXACT_MAX_RECORDS = int(os.environ.get("FEEDBACK_EXACT_MAX_RECORDS", "5000"))
+FEEDBACK_MODES = ("auto", "exact", "approximate")
+MAX_TOP_FEEDBACK = 100
+
+# Upper bound on points per /analytics/timeseries response (a year of days is 366)
+TIMESERIES_MAX_BUCKETS = int(os.environ.get("TIMESERIES_MAX_BUCKETS", "2000"))
+
+# Saved conversations are pushed to live dashboards over SSE (see analytics_stream.py)
+analytics_hub = AnalyticsHub(
+    max_subscribers=int(os.environ.get("ANALYTICS_STREAM_MAX_SUBSCRIBERS", "500")),
+    max_queue=int(os.environ.get("ANALYTICS_STREAM_QUEUE", "64")),
+    heartbeat_seconds=float(os.environ.get("ANALYTICS_STREAM_HEARTBEAT_SECONDS", "15")),
+)
+
+# Completed conversations are persisted by a background group-commit writer thread
+conversation_writer = ConversationWriter(
+    CONVERSATIONS_DIR,
+    conversation_store,
+    max_batch=int(os.environ.get("CONVERSATION_WRITE_BATCH", "256")),
+    max_delay_ms=float(os.environ.get("CONVERSATION_WRITE_DELAY_MS", "5")),
+    fsync=os.environ.get("CONVERSATION_FSYNC", "batch"),
+)
+
+# Server-side follow-up sessions keyed by the conversation_id returned from /submit_feedback
+session_store = SessionStore(
+    ttl_seconds=float(os.environ.get("SESSION_TTL_SECONDS", "1800")),
+    max_entries=int(os.environ.get("SESSION_MAX_ENTRIES", "100000")),
+    db_path=os.environ.get("SESSION_DB") or None,
+)
+# Follow-ups on one conversation run one at a time (read, compact, model call, write back)
+session_locks = SessionLocks()
+
+# Follow-up prompts send the last HISTORY_VERBATIM_TURNS turns verbatim and a rolling summary of
+# the rest (see conversation_history.py); turn FOLLOWUP_MAX_TURNS always closes the conversation
+FOLLOWUP_MAX_TURNS = int(os.environ.get("FOLLOWUP_MAX_TURNS", "4"))
+history_compactor = HistoryCompactor(
+    verbatim_turns=int(os.environ.get("HISTORY_VERBATIM_TURNS", "2")),
+    summary_turn_chars=int(os.environ.get("HISTORY_SUMMARY_TURN_CHARS", "160")),
+    summary_max_chars=int(os.environ.get("HISTORY_SUMMARY_MAX_CHARS", "1000")),
+)
+followup_prompt_tokens = PromptTokenStats()
+
+# Raw model responses for text prompts, keyed on a hash of the rendered prompt
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "86400")),
+    db_path=os.environ.get("RESPONSE_CACHE_DB") or None,
+    db_max_entries=int(os.environ.get("RESPONSE_CACHE_DB_MAX_ENTRIES", "1000000")),
+    enabled=os.environ.get("RESPONSE_CACHE", "1") != "0",
+)
+
+# Optional micro-batching of text-only /submit_feedback model calls (see feedback_batcher.py)
+FEEDBACK_BATCHING = os.environ.get("FEEDBACK_BATCHING", "0") == "1"
+FEEDBACK_BATCH_MAX_SIZE = int(os.environ.get("FEEDBACK_BATCH_MAX_SIZE", "8"))
+FEEDBACK_BATCH_MAX_WAIT_MS = float(os.environ.get("FEEDBACK_BATCH_MAX_WAIT_MS", "20"))
+
+# Model replies that local repair cannot fix get one short re-ask with only the broken output
+MODEL_REPAIR_REASK = os.environ.get("MODEL_REPAIR_REASK", "1") != "0"
+MODEL_REPAIR_MAX_CHARS = int(os.environ.get("MODEL_REPAIR_MAX_CHARS", "4000"))
+
+# Every upstream model call shares one gateway: adaptive concurrency limit, rate limit,
+# retry with jittered backoff and a circuit breaker (see upstream_gateway.py)
+upstream = UpstreamGateway(
+    min_concurrency=int(os.environ.get("UPSTREAM_MIN_CONCURRENCY", "1")),
+    max_concurrency=int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", "64")),
+    initial_concurrency=int(os.environ.get("UPSTREAM_INITIAL_CONCURRENCY", "16")),
+    latency_target_ms=float(os.environ.get("UPSTREAM_LATENCY_TARGET_MS", "10000")),
+    max_queue=int(os.environ.get("UPSTREAM_MAX_QUEUE", "256")),
+    queue_timeout=float(os.environ.get("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "10")),
+    rate_per_second=float(os.environ.get("UPSTREAM_RATE_PER_SECOND", "0")),
+    burst=float(os.environ.get("UPSTREAM_BURST", "20")),
+    max_retries=int(os.environ.get("UPSTREAM_MAX_RETRIES", "2")),
+    retry_base_ms=float(os.environ.get("UPSTREAM_RETRY_BASE_MS", "200")),
+    retry_max_ms=float(os.environ.get("UPSTREAM_RETRY_MAX_MS", "2000")),
+    breaker_failures=int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5")),
+    breaker_reset_seconds=float(os.environ.get("UPSTREAM_BREAKER_RESET_SECONDS", "30")),
+)
+
+# Per-request time budget for each endpoint, split across the pipeline stages (see request_deadline.py)
+DEADLINES = {
+    "submit_feedback": float(os.environ.get("DEADLINE_SUBMIT_FEEDBACK_SECONDS", "30")),
+    "submit_followup": float(os.environ.get("DEADLINE_SUBMIT_FOLLOWUP_SECONDS", "30")),
+    "submit_feedback_stream": float(os.environ.get("DEADLINE_SUBMIT_FEEDBACK_STREAM_SECONDS", "60")),
+    "submit_followup_stream": float(os.environ.get("DEADLINE_SUBMIT_FOLLOWUP_STREAM_SECONDS", "60")),
+}
+# Reading + uploading audio may use at most this share of the budget
+DEADLINE_UPLOAD_SHARE = float(os.environ.get("DEADLINE_UPLOAD_SHARE", "0.5"))
+# Generation must leave this much for parsing the response and saving the result
+DEADLINE_FINISH_RESERVE_SECONDS = float(os.environ.get("DEADLINE_FINISH_RESERVE_SECONDS", "1"))
+# Background deletion of an uploaded file is abandoned after this long
+GENAI_DELETE_TIMEOUT_SECONDS = float(os.environ.get("GENAI_DELETE_TIMEOUT_SECONDS", "30"))
+
+# Blocking model file calls (upload/delete) run on this bounded pool, never on the event loop
+GENAI_IO_WORKERS = int(os.environ.get("GENAI_IO_WORKERS", "8"))
+genai_io_executor = ThreadPoolExecutor(max_workers=GENAI_IO_WORKERS, thread_name_prefix="genai-io")
+
+# Uploaded audio is deleted from Gemini by a background worker after the response is sent
+GENAI_CLEANUP_QUEUE_SIZE = int(os.environ.get("GENAI_CLEANUP_QUEUE_SIZE", "1000"))
+GENAI_CLEANUP_DRAIN_SECONDS = float(os.environ.get("GENAI_CLEANUP_DRAIN_SECONDS", "10"))
+genai_cleanup_queue: Optional[asyncio.Queue] = None
+# Deletions scheduled for uploads that finished after their request gave up
+pending_deletions: Set[asyncio.Future] = set()
+
+# Audio submission: "auto" sends clips up to INLINE_AUDIO_MAX_BYTES inline with the
+# model request and uploads larger ones; "inline"/"upload" force one path.
+AUDIO_SUBMIT_MODE = os.environ.get("AUDIO_SUBMIT_MODE", "auto").lower()
+INLINE_AUDIO_MAX_BYTES = int(os.environ.get("INLINE_AUDIO_MAX_BYTES", str(4 * 1024 * 1024)))
+if AUDIO_SUBMIT_MODE not in ("auto", "inline", "upload"):
+    raise RuntimeError("AUDIO_SUBMIT_MODE must be one of: auto, inline, upload")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global genai_cleanup_queue
+    genai_cleanup_queue = asyncio.Queue(maxsize=GENAI_CLEANUP_QUEUE_SIZE)
+    cleanup_task = asyncio.create_task(genai_cleanup_worker(genai_cleanup_queue))
+    if LLM_WARMUP:
+        await llm_provider.warm_up()
+    try:
+        yield
+    finally:
+        analytics_hub.close()
+        # Give queued deletions a chance to finish before shutting down
+        try:
+            await asyncio.wait_for(genai_cleanup_queue.join(), timeout=GENAI_CLEANUP_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("genai file deletions still pending at shutdown", extra={"pending": genai_cleanup_queue.qsize()})
+        cleanup_task.cancel()
+        genai_cleanup_queue = None
+        genai_io_executor.shutdown(wait=False)
+        analytics_executor.shutdown(wait=False)
+        conversation_writer.close(timeout=GENAI_CLEANUP_DRAIN_SECONDS)
+        response_cache.close()
+        session_store.close()
+
+
+app = FastAPI(title="Audio Feedback API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,17 +226,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-if not api_key:
-    raise RuntimeError(
-        "GEMINI_API_KEY or GOOGLE_API_KEY env variable not set. "
-        "Set with: export GEMINI_API_KEY='your-key'"
+# --- Metrics (GET /metrics) ---
+metrics = Registry()
+http_requests = metrics.counter("http_requests_total", "HTTP requests by method, route and status",
+                                ("method", "path", "status"))
+http_request_duration = metrics.histogram("http_request_duration_seconds",
+                                          "HTTP request duration (streaming responses until the last chunk)",
+                                          ("method", "path"))
+http_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being handled")
+stage_duration = metrics.histogram("request_stage_duration_seconds",
+                                   "Time spent in each pipeline stage of a request", ("endpoint", "stage"))
+persist_duration = metrics.histogram("conversation_persist_duration_seconds",
+                                     "Saving a completed conversation (JSON file + store)")
+# The SSE stream stays open for as long as a dashboard does, so it is not timed as a request
+app.add_middleware(MetricsMiddleware, requests=http_requests, duration=http_request_duration,
+                   in_flight=http_in_flight, skip_paths=("/metrics", "/analytics/stream"))
+
+# Opt-in per-request profiling (see request_profiler.py): sampled, or X-Profile: <PROFILE_TOKEN>
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+if PROFILE_SAMPLE_RATE > 0 or PROFILE_TOKEN:
+    app.add_middleware(
+        ProfilerMiddleware,
+        directory=os.environ.get("PROFILE_DIR", "profiles"),
+        sample_rate=PROFILE_SAMPLE_RATE,
+        token=PROFILE_TOKEN,
+        mode=os.environ.get("PROFILE_MODE", "timeline").lower(),
+        max_profiles=int(os.environ.get("PROFILE_MAX_COUNT", "200")),
     )
 
-genai.configure(api_key=api_key)
-print("✅ Gemini API configured")
-
-generation_config = GenerationConfig(response_mime_type="application/json")
+# Model backend (LLM_PROVIDER=gemini|stub, see llm_providers.py); one shared client for every request
+llm_provider = create_provider()
+LLM_WARMUP = os.environ.get("LLM_WARMUP", os.environ.get("GEMINI_WARMUP", "1")) != "0"
 
 # --- Prompts (kept from your original) ---
 AI_PROMPT = """You are a conversational customer feedback analyst. Your job is to analyze 
@@ -79,6 +290,37 @@ Instructions:
       "requiresFollowUp": true
     }}"""
 
+BATCH_FEEDBACK_PROMPT = """You are a conversational customer feedback analyst. Below are several
+independent pieces of customer feedback. Analyze EACH item on its own and decide the correct response for it.
+
+Each item has an id, the score the user gave (0-10) and their text feedback:
+<items>
+{ITEMS}
+</items>
+
+For every item:
+1.  Use the item's text as-is as the transcription.
+2.  Provide a single-word sentiment (e.g., "Positive", "Negative", "Frustrated", "Confused").
+3.  Extract the key feedback points or action items as a list of strings.
+4.  **Decide the Next Step** from that item's score:
+    -   **0-6 (Detractor):** Empathetic response that *asks a follow-up question* for more detail. `requiresFollowUp` = `true`.
+    -   **7-8 (Passive) AND feedback is vague:** Ask a clarifying question. `requiresFollowUp` = `true`.
+    -   **9-10 (Promoter) OR 7-8 with clear feedback:** Just say thank you. **Do not ask a question.** `requiresFollowUp` = `false`.
+
+5.  **Respond ONLY with a valid JSON object in this exact format, with exactly one result per item id:**
+    {{
+      "results": [
+        {{
+          "id": 0,
+          "transcription": "...",
+          "sentiment": "...",
+          "feedback": ["..."],
+          "conversationalResponse": "...",
+          "requiresFollowUp": true
+        }}
+      ]
+    }}"""
+
 FOLLOWUP_PROMPT = """You are continuing a customer feedback conversation. Here is the full conversation history:
 
 **Initial Feedback:**
@@ -108,50 +350,47 @@ Instructions:
       "conversationComplete": true
     }}"""
 
+FINAL_TURN_NOTE = """
+
+**This is the last follow-up turn.** Thank the user for their time and close the conversation: do not ask
+another question, set `requiresFollowUp` to `false` and `conversationComplete` to `true`."""
+
+REPAIR_PROMPT = """The text between the <output> tags was supposed to be a single JSON object with these fields:
+{FIELDS}
+It is not valid ({ERROR}).
+
+<output>
+{OUTPUT}
+</output>
+
+Respond ONLY with the corrected JSON object. Keep the original values; fix only the syntax and the field
+types, and finish any value that was cut off."""
+
 # --- Helpers ---
 
-def extract_json_from_text(text: str) -> Dict[str, Any]:
+async def save_conversation_file(payload: dict) -> str:
     """
-    Extract and parse a JSON object from model text output.
-    Raises ValueError if parsing fails.
+    Persist a completed conversation (JSON file + store index) off the event loop.
+    Returns the unique filename once the write is committed.
     """
-    if not text:
-        raise ValueError("Empty model response")
-
-    # Try fenced json block first
-    m = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if m:
-        candidate = m.group(1)
-        try:
-            return json.loads(candidate)
-        except json.JSONDecodeError:
-            # fallthrough to other strategies
-            pass
-
-    # Try to find the first {...} block
-    m = re.search(r'\{.*\}', text, re.DOTALL)
-    if m:
-        candidate = m.group(0)
-        try:
-            return json.loads(candidate)
-        except json.JSONDecodeError:
-            # best-effort: replace single quotes -> double quotes
-            fixed = candidate.replace("'", '"')
-            try:
-                return json.loads(fixed)
-            except json.JSONDecodeError:
-                pass
-
-    raise ValueError("No valid JSON found in model output")
+    started = time.perf_counter()
+    try:
+        return await conversation_writer.save(payload)
+    finally:
+        elapsed = time.perf_counter() - started
+        persist_duration.observe(elapsed)
+        record_stage("persist", elapsed)
 
 
-def save_conversation_file(payload: dict) -> str:
-    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"conversation_{ts}.json"
-    path = os.path.join(CONVERSATIONS_DIR, filename)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
-    return filename
+def publish_saved_conversation(filename: str, payload: dict):
+    """
+    Push a just-saved conversation to live dashboards: its listing row and the aggregate delta it adds.
+    """
+    record = record_from_conversation(filename, payload)
+    analytics_hub.publish("conversation", {
+        "conversation": {field: record[field] for field in DEFAULT_LIST_FIELDS},
+        "delta": BucketStats.from_records([record]).to_dict(),
+    })
 
 
 def safe_delete_temp(path: Optional[str]):
@@ -161,175 +400,156 @@ def safe_delete_temp(path: Optional[str]):
         if os.path.exists(path):
             os.unlink(path)
     except Exception as e:
-        print("Warning deleting temp file:", e)
-
-
-async def safe_delete_genai_file(handle):
-    if not handle:
-        return
-    try:
-        if hasattr(handle, "name"):
-            genai.delete_file(handle.name)
-        elif isinstance(handle, str):
-            genai.delete_file(handle)
-        elif hasattr(handle, "delete"):
-            handle.delete()
-    except Exception as e:
-        print("Warning deleting genai file:", e)
+        logger.warning("failed deleting temp file", extra={"error": str(e)})
 
 
-def parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
+async def run_genai_io(func, *args, **kwargs):
     """
-    Parse ISO date/datetime strings, returning timezone-aware datetime.
-    Accepts formats like '2025-01-01' or '2025-01-01T12:00:00Z'.
+    Run a blocking provider SDK call on the bounded genai I/O pool.
     """
-    if not value:
-        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(genai_io_executor, functools.partial(func, *args, **kwargs))
 
-    try:
-        # Handle trailing Z
-        if value.endswith("Z"):
-            value = value[:-1] + "+00:00"
-        dt = datetime.fromisoformat(value)
-    except ValueError:
-        try:
-            dt = datetime.strptime(value, "%Y-%m-%d")
-        except ValueError:
-            raise ValueError("Invalid date format. Use ISO format YYYY-MM-DD or YYYY-MM-DDTHH:MM:SSZ")
 
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
+async def upload_audio_file(path: str, mime_type: str):
+    return await upstream.call(run_genai_io, llm_provider.upload_file, path, mime_type)
 
-    return dt
 
+def deadline_exceeded(e: DeadlineExceeded) -> HTTPException:
+    return HTTPException(status_code=504, detail=e.detail())
 
-def filter_records_by_date(records: List[Dict[str, Any]], start: Optional[str], end: Optional[str]) -> List[Dict[str, Any]]:
+
+def delete_when_uploaded(upload: asyncio.Future):
     """
-    Filter conversation records by saved_at timestamp using optional start/end strings.
+    An upload abandoned at its deadline keeps running in its thread; delete the file once it lands.
     """
-    start_dt = parse_iso_datetime(start) if start else None
-    end_dt = parse_iso_datetime(end) if end else None
+    def cleanup(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is None:
+            deletion = asyncio.ensure_future(safe_delete_genai_file(task.result()))
+            # The loop holds tasks weakly: keep this one until it is done
+            pending_deletions.add(deletion)
+            deletion.add_done_callback(pending_deletions.discard)
+    upload.add_done_callback(cleanup)
 
-    if end_dt:
-        # include entire day if only date provided (no time component)
-        if end_dt.hour == 0 and end_dt.minute == 0 and end_dt.second == 0 and end_dt.microsecond == 0:
-            end_dt = end_dt + timedelta(days=1) - timedelta(microseconds=1)
 
-    filtered = []
-    for record in records:
-        saved_at = record.get("saved_at")
-        saved_dt = parse_iso_datetime(saved_at) if saved_at else None
-        if saved_dt is None:
-            continue
+def write_temp_audio(path: str, audio_bytes: bytes):
+    with open(path, "wb") as f:
+        f.write(audio_bytes)
 
-        if start_dt and saved_dt < start_dt:
-            continue
-        if end_dt and saved_dt > end_dt:
-            continue
-        filtered.append(record)
 
-    return filtered
+def upstream_unavailable(e: UpstreamOverloaded) -> HTTPException:
+    logger.warning("upstream overloaded", extra={"reason": e.reason})
+    return HTTPException(status_code=503, detail=e.reason, headers={"Retry-After": str(math.ceil(e.retry_after))})
 
 
-def load_conversation_records(directory: str = CONVERSATIONS_DIR) -> List[Dict[str, Any]]:
+def choose_audio_path(size: int) -> str:
     """
-    Read all JSON files from conversations directory and return list of records.
+    Decide how audio of `size` bytes reaches the model: "inline" or "upload".
     """
-    if not os.path.isdir(directory):
-        return []
+    if AUDIO_SUBMIT_MODE == "auto":
+        return "inline" if size <= INLINE_AUDIO_MAX_BYTES else "upload"
+    return AUDIO_SUBMIT_MODE
 
-    records: List[Dict[str, Any]] = []
-    for filename in sorted(os.listdir(directory)):
-        if not filename.endswith(".json"):
-            continue
 
-        path = os.path.join(directory, filename)
+def delete_genai_file(handle):
+    try:
+        llm_provider.delete_file(handle)
+    except Exception as e:
+        logger.warning("failed deleting genai file", extra={"error": str(e)})
+
+
+async def safe_delete_genai_file(handle):
+    """
+    Schedule remote deletion of an uploaded file without waiting for it.
+    Falls back to deleting inline (still off the event loop) if no worker is running
+    or the cleanup queue is full.
+    """
+    if not handle:
+        return
+    if genai_cleanup_queue is not None:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception as exc:
-            print(f"Failed reading {filename}: {exc}")
-            continue
+            genai_cleanup_queue.put_nowait(handle)
+            return
+        except asyncio.QueueFull:
+            logger.warning("genai cleanup queue full, deleting inline")
+    try:
+        await asyncio.wait_for(run_genai_io(delete_genai_file, handle), GENAI_DELETE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("timed out deleting genai file")
 
-        final_analysis = data.get("final_analysis", {})
-        turns = data.get("turns", [])
-
-        record = {
-            "filename": filename,
-            "saved_at": data.get("saved_at"),
-            "score": data.get("score"),
-            "sentiment": data.get("sentiment") or final_analysis.get("sentiment"),
-            "requires_followup": final_analysis.get("requiresFollowUp"),
-            "conversation_complete": final_analysis.get("conversationComplete"),
-            "total_turns": len(turns),
-            "initial_transcription": data.get("initial_transcription"),
-            "final_transcription": final_analysis.get("transcription"),
-            "final_response": final_analysis.get("conversationalResponse"),
-            "initial_feedback_points": data.get("initial_feedback_points")
-            or data.get("initial_feedback")
-            or [],
-        }
-        records.append(record)
 
-    return records
+async def genai_cleanup_worker(queue: asyncio.Queue):
+    while True:
+        handle = await queue.get()
+        try:
+            await asyncio.wait_for(run_genai_io(delete_genai_file, handle), GENAI_DELETE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("timed out deleting genai file")
+        except Exception as e:
+            logger.warning("genai cleanup worker error", extra={"error": str(e)})
+        finally:
+            queue.task_done()
 
 
-def compute_analytics(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+def resolve_date_range(start: Optional[str], end: Optional[str],
+                       tz: tzinfo = timezone.utc) -> Tuple[Optional[datetime], Optional[datetime]]:
     """
-    Compute summary stats + top feedback themes.
+    Parse optional start/end strings into an inclusive datetime range.
+    A date-only end (midnight) is widened to cover the entire day.
+    Values without an offset are read in `tz`.
     """
-    if not records:
-        return {}
+    start_dt = parse_iso_datetime(start, tz) if start else None
+    end_dt = parse_iso_datetime(end, tz) if end else None
 
-    # Scores
-    numeric_scores = [r["score"] for r in records if isinstance(r["score"], (int, float))]
-    avg_score = round(sum(numeric_scores) / len(numeric_scores), 2) if numeric_scores else None
-    median_score = None
-    if numeric_scores:
-        sorted_scores = sorted(numeric_scores)
-        mid = len(sorted_scores) // 2
-        if len(sorted_scores) % 2 == 0:
-            median_score = round((sorted_scores[mid - 1] + sorted_scores[mid]) / 2, 2)
-        else:
-            median_score = round(sorted_scores[mid], 2)
-
-    # Sentiment breakdown
-    sentiment_counter = Counter(
-        (r.get("sentiment") or "Unknown") for r in records
-    )
-
-    # Follow-up stats
-    followup_flags = [bool(r.get("requires_followup")) for r in records if r.get("requires_followup") is not None]
-    followup_pct = round(100 * sum(followup_flags) / len(followup_flags), 2) if followup_flags else 0.0
+    if end_dt:
+        # include entire day if only date provided (no time component)
+        if end_dt.hour == 0 and end_dt.minute == 0 and end_dt.second == 0 and end_dt.microsecond == 0:
+            end_dt = end_dt + timedelta(days=1) - timedelta(microseconds=1)
 
-    completion_flags = [bool(r.get("conversation_complete")) for r in records if r.get("conversation_complete") is not None]
-    completed_pct = round(100 * sum(completion_flags) / len(completion_flags), 2) if completion_flags else 0.0
+    return start_dt, end_dt
 
-    # Turns
-    turns_list = [r.get("total_turns", 0) for r in records]
-    avg_turns = round(sum(turns_list) / len(turns_list), 2) if turns_list else 0.0
-    max_turns = max(turns_list) if turns_list else 0
 
-    # Feedback themes
-    feedback_counter = Counter()
-    for r in records:
-        points = r.get("initial_feedback_points") or []
-        if isinstance(points, list):
-            feedback_counter.update([p.strip() for p in points if p])
+@contextmanager
+def timed_stage(endpoint: str, stage: str):
+    """
+    Time a stage outside the deadline pipeline into the stage histogram and any active profile.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_duration.observe(elapsed, endpoint=endpoint, stage=stage)
+        record_stage(stage, elapsed)
 
-    top_feedback = [{"text": text, "count": count} for text, count in feedback_counter.most_common(5)]
 
-    return {
-        "total_conversations": len(records),
-        "avg_score": avg_score,
-        "median_score": median_score,
-        "sentiment_breakdown": sentiment_counter,
-        "followup_required_pct": followup_pct,
-        "completed_pct": completed_pct,
-        "avg_turns": avg_turns,
-        "max_turns": max_turns,
-        "top_feedback": top_feedback,
-    }
+async def analytics_response(request: Request, endpoint: str, params: Dict[str, Any],
+                             compute: Callable[[], Dict[str, Any]], changed_at: float = 0.0) -> Response:
+    """
+    Serve an analytics body with ETag/Last-Modified: 304 when the client's copy is still current,
+    otherwise the memoized body for (endpoint, params, data version), computed only on a miss.
+    `changed_at` is when the body last changed without a write (e.g. "now" moving into a new bucket).
+    Everything touching the store runs on the analytics pool: even the version lookup can wait
+    for the store lock while another thread computes.
+    """
+    def respond() -> Response:
+        generation, version, modified_at = conversation_store.data_version()
+        modified_at = max(modified_at, changed_at)
+        etag = make_etag(generation, version, endpoint, params)
+        headers = conditional_headers(etag, modified_at)
+        if not_modified(request.headers, etag, modified_at):
+            analytics_cache.record_not_modified()
+            return Response(status_code=304, headers=headers)
+
+        body = analytics_cache.get(etag)
+        if body is None:
+            body = encode_body(compute())
+            analytics_cache.put(etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # copy_context keeps the request's profile, so compute stages still land in its timeline
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(analytics_executor, contextvars.copy_context().run, respond)
 
 
 # --- Endpoints ---
@@ -339,319 +559,884 @@ async def health():
     return {"status": "ok", "time": datetime.utcnow().isoformat() + "Z"}
 
 
+@app.get("/stats")
+async def stats():
+    return {
+        "response_cache": response_cache.stats(),
+        "upstream": upstream.stats(),
+        "deadlines": {"budgets_seconds": DEADLINES, "timeouts": dict(deadline_timeouts)},
+        "model_output": {tier: repair_tiers[tier] for tier in ("clean", "coerced", "reasked", "failed")},
+        "analytics_cache": analytics_cache.stats(),
+        "analytics_stream": analytics_hub.stats(),
+        "sessions": len(session_store),
+        "followup_prompts": {
+            "max_turns": FOLLOWUP_MAX_TURNS,
+            "verbatim_turns": history_compactor.verbatim_turns,
+            "estimated_tokens_by_turn": followup_prompt_tokens.stats(),
+        },
+        "feedback_batching": {"enabled": True, **feedback_batcher.stats()} if feedback_batcher else {"enabled": False},
+        "conversation_writer": {
+            "batches_written": conversation_writer.batches_written,
+            "conversations_written": conversation_writer.conversations_written,
+        },
+    }
+
+
+@metrics.collector
+def component_metrics():
+    """
+    Counters the components already keep (same numbers as GET /stats), read at scrape time.
+    """
+    gateway = upstream.stats()
+    yield ("upstream_calls_total", "counter", "Model calls by outcome",
+           [({"outcome": outcome}, gateway[outcome]) for outcome in ("successes", "failures")])
+    yield ("upstream_retries_total", "counter", "Model call retries", [({}, gateway["retries"])])
+    yield ("upstream_errors_total", "counter", "Upstream errors by kind",
+           [({"kind": kind}, gateway[kind]) for kind in ("rate_limited", "transient_errors")])
+    yield ("upstream_rejected_total", "counter", "Calls rejected by the gateway before reaching the model",
+           [({"reason": key[len("rejected_"):]}, value) for key, value in gateway.items() if key.startswith("rejected_")])
+    yield ("upstream_in_flight", "gauge", "Model calls in flight", [({}, gateway["inflight"])])
+    yield ("upstream_queued", "gauge", "Model calls waiting for a slot", [({}, gateway["queued"])])
+    yield ("upstream_concurrency_limit", "gauge", "Current adaptive concurrency limit",
+           [({}, gateway["concurrency_limit"])])
+    yield ("upstream_circuit_state", "gauge", "1 for the circuit breaker's current state",
+           [({"state": state}, 1 if gateway["circuit"] == state else 0) for state in ("closed", "half_open", "open")])
+
+    cache = response_cache.stats()
+    yield ("response_cache_lookups_total", "counter", "Response cache lookups by result",
+           [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+    yield ("response_cache_disk_hits_total", "counter", "Response cache hits served from disk", [({}, cache["disk_hits"])])
+    yield ("response_cache_bypassed_total", "counter", "Requests that skipped the cache", [({}, cache["bypassed"])])
+    yield ("response_cache_hit_ratio", "gauge", "Hits / lookups since start", [({}, cache["hit_rate"])])
+    yield ("response_cache_entries", "gauge", "Entries in the in-memory cache", [({}, cache["entries"])])
+
+    analytics = analytics_cache.stats()
+    yield ("analytics_requests_total", "counter", "Analytics requests by how they were answered",
+           [({"result": "not_modified"}, analytics["not_modified"]), ({"result": "memoized"}, analytics["hits"]),
+            ({"result": "computed"}, analytics["misses"])])
+    hub = analytics_hub.stats()
+    yield ("analytics_stream_subscribers", "gauge", "Connected live dashboards", [({}, hub["subscribers"])])
+    yield ("analytics_stream_events_total", "counter", "Events published to live dashboards", [({}, hub["published"])])
+    yield ("analytics_stream_dropped_total", "counter", "Live dashboard connections evicted or refused",
+           [({"reason": "slow_consumer"}, hub["evicted"]), ({"reason": "full"}, hub["rejected"])])
+
+    yield ("request_deadline_timeouts_total", "counter", "Requests that ran out of time, by endpoint and stage",
+           [(dict(zip(("endpoint", "stage"), key.split(":", 1))), value) for key, value in deadline_timeouts.items()])
+    yield ("model_output_total", "counter", "Model replies by repair tier",
+           [({"tier": tier}, repair_tiers[tier]) for tier in ("clean", "coerced", "reasked", "failed")])
+    yield ("sessions", "gauge", "Follow-up sessions held in memory", [({}, len(session_store))])
+    yield ("conversations_written_total", "counter", "Conversations committed by the writer",
+           [({}, conversation_writer.conversations_written)])
+    if feedback_batcher:
+        batching = feedback_batcher.stats()
+        yield ("feedback_batch_items_total", "counter", "Requests handled by the micro-batcher", [({}, batching["items"])])
+        yield ("feedback_batch_model_calls_total", "counter", "Model calls made by the micro-batcher",
+               [({}, batching["model_calls"])])
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/analytics/summary")
 async def analytics_summary(
+    request: Request,
     start_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive)"),
     end_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive)"),
+    top_n: int = Query(5, ge=1, le=MAX_TOP_FEEDBACK, description="Number of top feedback themes"),
+    feedback_mode: str = Query("auto", description="auto, exact or approximate top feedback counts"),
 ):
     """
     Returns summarized analytics for all saved conversations.
+    Records themselves are listed by /analytics/conversations.
     """
-    records = load_conversation_records(CONVERSATIONS_DIR)
-    if not records:
-        raise HTTPException(status_code=404, detail="No saved conversations found")
+    if feedback_mode not in FEEDBACK_MODES:
+        raise HTTPException(status_code=400, detail=f"feedback_mode must be one of: {', '.join(FEEDBACK_MODES)}")
+    try:
+        start_dt, end_dt = resolve_date_range(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def compute():
+        total_available = conversation_store.count()
+        if not total_available:
+            raise HTTPException(status_code=404, detail="No saved conversations found")
+
+        # Merges pre-aggregated hourly buckets; no rows are read outside the edge hours
+        with timed_stage("analytics_summary", "compute"):
+            stats = conversation_store.summarize(start_dt, end_dt)
+        if not stats.count:
+            raise HTTPException(status_code=404, detail="No conversations found for the selected timeframe")
+
+        summary = stats.summary(top_n)
+        top_feedback = summary.pop("top_feedback", [])
+        sketch = stats.feedback
+        exact = sketch.exact
+        if not exact and (feedback_mode == "exact"
+                          or (feedback_mode == "auto" and stats.count <= FEEDBACK_EXACT_MAX_RECORDS)):
+            # Small range (or asked for): count every feedback point in the range instead of the sketch
+            with timed_stage("analytics_summary", "feedback_exact"):
+                counts = conversation_store.feedback_counts(start_dt, end_dt)
+            top_feedback = [
+                {"text": text, "count": count, "error": 0}
+                for text, count in heapq.nsmallest(top_n, counts.items(), key=lambda entry: (-entry[1], entry[0]))
+            ]
+            exact = True
+        sentiment_breakdown = summary.get("sentiment_breakdown", {})
+        return {
+            "summary": {
+                **summary,
+                "sentiment_breakdown": dict(sentiment_breakdown),
+            },
+            "top_feedback": top_feedback,
+            # Approximate counts overestimate by at most their `error`, itself at most max_error
+            "top_feedback_accuracy": {
+                "exact": exact,
+                "max_error": 0 if exact else sketch.floor,
+                "total_points": sketch.total,
+                "sketch_capacity": sketch.capacity,
+            },
+            "filters": {
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_available": total_available,
+            },
+        }
 
-    filtered_records = filter_records_by_date(records, start_date, end_date) if (start_date or end_date) else records
+    params = {"start_date": start_date, "end_date": end_date, "top_n": top_n, "feedback_mode": feedback_mode}
+    return await analytics_response(request, "summary", params, compute)
 
-    if not filtered_records:
-        raise HTTPException(status_code=404, detail="No conversations found for the selected timeframe")
 
-    summary = compute_analytics(filtered_records)
-    top_feedback = summary.pop("top_feedback", [])
-    sentiment_breakdown = summary.get("sentiment_breakdown", {})
-    return {
-        "summary": {
-            **summary,
-            "sentiment_breakdown": dict(sentiment_breakdown),
-        },
-        "top_feedback": top_feedback,
-        "conversations": filtered_records,
-        "filters": {
-            "start_date": start_date,
-            "end_date": end_date,
-            "total_available": len(records),
-        },
-    }
+def split_param(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
 
 
-@app.post("/submit_feedback")
-async def submit_feedback(
-    score: int = Form(..., description="NPS score from 0-10"),
-    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
-    audio_data: UploadFile = File(None, description="Audio file (fallback if no transcription)")
+@app.get("/analytics/conversations")
+async def analytics_conversations(
+    request: Request,
+    start_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive)"),
+    end_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns (default: all but transcript text)"),
+    sort: str = Query("saved_at", description="saved_at, score or total_turns"),
+    order: str = Query("desc", description="asc or desc"),
+    limit: int = Query(50, ge=1, le=MAX_LIST_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    min_score: Optional[float] = Query(None),
+    max_score: Optional[float] = Query(None),
+    sentiment: Optional[str] = Query(None, description="Comma-separated sentiments"),
+    requires_followup: Optional[bool] = Query(None),
 ):
-    audio_file_handle = None
-    temp_path = None
-    user_transcription = None
+    """
+    Cursor-paginated listing of saved conversations with field projection, sorting and filters.
+    """
     try:
-        if score < 0 or score > 10:
-            raise HTTPException(status_code=400, detail="Score must be 0-10")
+        start_dt, end_dt = resolve_date_range(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def compute():
+        try:
+            with timed_stage("analytics_conversations", "load"):
+                records, next_cursor = conversation_store.list_records(
+                    start_dt, end_dt,
+                    fields=split_param(fields) or DEFAULT_LIST_FIELDS,
+                    sort=sort, order=order, limit=limit, cursor=cursor,
+                    min_score=min_score, max_score=max_score,
+                    sentiments=split_param(sentiment), requires_followup=requires_followup,
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"conversations": records, "next_cursor": next_cursor}
+
+    return await analytics_response(request, "conversations", dict(request.query_params), compute)
 
-        # Check if transcription or audio provided
-        if transcription:
-            user_transcription = transcription.strip()
-            print("Using frontend transcription for initial feedback")
-        elif audio_data:
-            audio_bytes = await audio_data.read()
-            if not audio_bytes:
-                raise HTTPException(status_code=400, detail="Audio file is empty")
-
-            # write temp audio file
-            ext = os.path.splitext(audio_data.filename)[1] or ".webm"
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tf:
-                tf.write(audio_bytes)
-                temp_path = tf.name
 
+@app.get("/analytics/timeseries")
+async def analytics_timeseries(
+    request: Request,
+    start_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive); default: first record"),
+    end_date: Optional[str] = Query(None, description="ISO date or datetime (inclusive); default: now"),
+    interval: str = Query("day", description="hour, day, week or auto"),
+    tz: str = Query("UTC", description="IANA timezone for bucket boundaries and offset-less dates"),
+):
+    """
+    Per-bucket score average, NPS, sentiment mix and follow-up rate over a range.
+    """
+    try:
+        zone = resolve_timezone(tz)
+        start_dt, end_dt = resolve_date_range(start_date, end_date, zone)
+        if interval not in (*INTERVALS, "auto"):
+            raise ValueError(f"interval must be one of: {', '.join(INTERVALS)}, auto")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def compute():
+        saved_range = conversation_store.saved_range()
+        if saved_range is None:
+            raise HTTPException(status_code=404, detail="No saved conversations found")
+        start_ts = start_dt.timestamp() if start_dt else saved_range[0]
+        end_ts = end_dt.timestamp() if end_dt else max(saved_range[1], time.time())
+        chosen = choose_interval(start_ts, end_ts) if interval == "auto" else interval
+
+        with timed_stage("analytics_timeseries", "compute"):
             try:
-                audio_file_handle = genai.upload_file(path=temp_path, mime_type=audio_data.content_type or "audio/webm")
-            except Exception as e:
-                print("Upload error:", e)
-                raise HTTPException(status_code=500, detail=f"Failed to upload audio to Gemini: {e}")
-        else:
-            raise HTTPException(status_code=400, detail="Either transcription or audio_data must be provided")
+                starts = bucket_starts(start_ts, end_ts, chosen, zone, TIMESERIES_MAX_BUCKETS)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            stats = conversation_store.timeseries(start_ts, end_ts, lambda ts: bucket_floor(ts, chosen, zone))
+            buckets = build_series(stats, starts, chosen, zone)
+        return {
+            "interval": chosen,
+            "timezone": tz,
+            "buckets": buckets,
+            "filters": {"start_date": start_date, "end_date": end_date},
+        }
 
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash-preview-09-2025", generation_config=generation_config)
-        prompt = AI_PROMPT.format(NPS_SCORE=score)
+    params = dict(request.query_params)
+    changed_at = 0.0
+    if not end_date:
+        # Open-ended ranges run to "now", so the trailing buckets move even without new data:
+        # the hour is part of the ETag, and its start counts as a modification for If-Modified-Since
+        params["now_hour"] = int(time.time() // 3600)
+        changed_at = params["now_hour"] * 3600.0
+    return await analytics_response(request, "timeseries", params, compute, changed_at)
 
-        try:
-            if user_transcription:
-                # Use text transcription
-                prompt_with = f"{prompt}\n\nUser's feedback: \"{user_transcription}\""
-                response = await model.generate_content_async(prompt_with)
-            else:
-                # Use audio file
-                response = await model.generate_content_async([prompt, audio_file_handle])
-        except Exception as e:
-            print("Model error:", e)
-            raise HTTPException(status_code=500, detail=f"Error calling model: {e}")
 
-        text = getattr(response, "text", None) or getattr(response, "content", None) or str(response)
-        print("Raw model response (truncated):", text[:800])
-        try:
-            parsed = extract_json_from_text(text)
-        except ValueError as e:
-            print("JSON parse error:", e)
-            print("Full model response:", text[:4000])
-            raise HTTPException(status_code=500, detail=f"Failed to parse model response as JSON: {e}")
-
-        # Safety: do not assume False when key missing (safer default = True)
-        if "requiresFollowUp" not in parsed:
-            parsed["requiresFollowUp"] = True
-        if "conversationComplete" not in parsed:
-            parsed["conversationComplete"] = not parsed["requiresFollowUp"]
-
-        # Validate types
-        if not isinstance(parsed["requiresFollowUp"], bool):
-            raise HTTPException(status_code=500, detail="Model returned invalid requiresFollowUp type")
-        if not isinstance(parsed["conversationComplete"], bool):
-            raise HTTPException(status_code=500, detail="Model returned invalid conversationComplete type")
-
-        # fill missing supportive fields
-        # Use transcription from frontend if provided, otherwise use parsed transcription
-        parsed.setdefault("transcription", user_transcription or parsed.get("transcription", ""))
-        if user_transcription and not parsed.get("transcription"):
-            parsed["transcription"] = user_transcription
-        
-        parsed.setdefault("sentiment", "")
-        parsed.setdefault("feedback", [])
-        parsed.setdefault("conversationalResponse", "")
-
-        parsed["score"] = score
-
-        # Build history object to return
-        history = {
-            "initial_transcription": parsed["transcription"],
-            "score": score,
-            "sentiment": parsed["sentiment"],
-            "feedback": parsed["feedback"],
-            "turns": []
-        }
+@app.get("/analytics/stream")
+async def analytics_stream(request: Request):
+    """
+    Server-Sent Events for live dashboards: one `conversation` event per saved conversation
+    (its listing row + aggregate delta), `resync` / `evicted` when the client should refetch.
+    """
+    try:
+        subscriber = analytics_hub.subscribe(request.headers.get("last-event-id"))
+    except HubFull:
+        raise HTTPException(status_code=503, detail="Too many live dashboard connections",
+                            headers={"Retry-After": "30"})
+    # Unsubscribed when the response ends, also if the client left before the stream started
+    return ClosingStreamingResponse(
+        analytics_hub.stream(subscriber),
+        lambda: analytics_hub.unsubscribe(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        result = {
-            **parsed,
-            "history": history
-        }
 
-        return result
+# --- Request pipeline (shared by the plain and streaming endpoints) ---
 
-    except HTTPException:
+def new_user_input() -> Dict[str, Any]:
+    """
+    State for one user utterance; temp_path/file_handle are released by release_user_input.
+    """
+    return {"transcription": None, "audio_part": None, "audio_path": "text", "temp_path": None, "file_handle": None,
+            "prompt_tokens": None, "locked_conversation": None}
+
+
+async def read_user_input(user_input: Dict[str, Any], transcription: Optional[str], audio_data: Optional[UploadFile],
+                          empty_detail: str, upload_detail: str, deadline: Deadline):
+    """
+    Use the frontend transcription if given, otherwise attach the audio inline or as an upload.
+    Reading and uploading together may use DEADLINE_UPLOAD_SHARE of the request's budget.
+    """
+    if transcription:
+        # Collapse whitespace so repeated feedback renders the same prompt (and cache key)
+        user_input["transcription"] = " ".join(transcription.split())
+        logger.debug("using frontend transcription")
+        return
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="Either transcription or audio_data must be provided")
+
+    audio_bytes = await deadline.run("read_audio", audio_data.read(), share=DEADLINE_UPLOAD_SHARE)
+    if not audio_bytes:
+        raise HTTPException(status_code=400, detail=empty_detail)
+
+    mime_type = audio_data.content_type or "audio/webm"
+    user_input["audio_path"] = choose_audio_path(len(audio_bytes))
+    logger.debug("audio received", extra={"audio_path": user_input["audio_path"], "bytes": len(audio_bytes)})
+    if user_input["audio_path"] == "inline":
+        # Small clip: send bytes with the model request (no temp file, upload or remote delete)
+        user_input["audio_part"] = {"mime_type": mime_type, "data": audio_bytes}
+        return
+
+    # write temp audio file (off the event loop; the path is known first so cleanup always finds it)
+    ext = os.path.splitext(audio_data.filename or "")[1] or ".webm"
+    fd, user_input["temp_path"] = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    upload_share = DEADLINE_UPLOAD_SHARE - deadline.stages.get("read_audio", 0.0) / deadline.budget
+    await deadline.run("write_temp", run_genai_io(write_temp_audio, user_input["temp_path"], audio_bytes),
+                       share=upload_share)
+
+    upload = asyncio.ensure_future(upload_audio_file(user_input["temp_path"], mime_type))
+    upload_share -= deadline.stages["write_temp"] / deadline.budget
+    try:
+        user_input["file_handle"] = await deadline.run("upload", upload, share=upload_share, shield=True)
+    except DeadlineExceeded:
+        delete_when_uploaded(upload)
         raise
+    except UpstreamOverloaded as e:
+        raise upstream_unavailable(e)
     except Exception as e:
-        print("Unhandled submit_feedback error:", e)
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        safe_delete_temp(temp_path)
-        await safe_delete_genai_file(audio_file_handle)
+        logger.error("audio upload failed", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail=f"{upload_detail}: {e}")
+    user_input["audio_part"] = user_input["file_handle"]
 
 
-@app.post("/submit_followup")
-async def submit_followup(
-    score: int = Form(..., description="Original rating score from 0-10"),
-    conversation_history: str = Form(..., description="Full conversation history as JSON string"),
-    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
-    audio_data: UploadFile = File(None, description="Follow-up audio file (fallback if no transcription)")
-):
-    audio_file_handle = None
-    temp_path = None
-    try:
-        if score < 0 or score > 10:
-            raise HTTPException(status_code=400, detail="Score must be 0-10")
+async def release_user_input(user_input: Dict[str, Any], deadline: Deadline):
+    """
+    End of a request: release its session lock, clean up its audio and record how long each stage took.
+    """
+    if user_input["locked_conversation"]:
+        session_locks.release(user_input["locked_conversation"])
+        user_input["locked_conversation"] = None
+    safe_delete_temp(user_input["temp_path"])
+    await safe_delete_genai_file(user_input["file_handle"])
+    for stage, seconds in deadline.stages.items():
+        stage_duration.observe(seconds, endpoint=deadline.endpoint, stage=stage)
+        record_stage(stage, seconds)
+
+
+def build_feedback_contents(score: int, user_input: Dict[str, Any]):
+    prompt = AI_PROMPT.format(NPS_SCORE=score)
+    if user_input["transcription"]:
+        return f"{prompt}\n\nUser's feedback: \"{user_input['transcription']}\""
+    return [prompt, user_input["audio_part"]]
+
+
+def build_followup_contents(score: int, history: Dict[str, Any], user_input: Dict[str, Any]):
+    # Recent turns verbatim, older ones as the session's rolling summary
+    history_compactor.compact(history)
+    history_text = history_compactor.render(history)
+    turn_number = len(history.get("turns", [])) + 1
+
+    prompt = FOLLOWUP_PROMPT.format(
+        NPS_SCORE=score,
+        INITIAL_TRANSCRIPTION=history.get("initial_transcription", ""),
+        CONVERSATION_HISTORY=history_text if history_text else "No previous follow-ups yet."
+    )
+    if turn_number >= FOLLOWUP_MAX_TURNS:
+        prompt += FINAL_TURN_NOTE
+    if user_input["transcription"]:
+        prompt = f"{prompt}\n\nUser's current response: \"{user_input['transcription']}\""
+    user_input["prompt_tokens"] = estimate_tokens(prompt)
+    followup_prompt_tokens.record(turn_number, user_input["prompt_tokens"])
+    return prompt if user_input["transcription"] else [prompt, user_input["audio_part"]]
+
+
+async def lock_followup_session(user_input: Dict[str, Any], conversation_id: Optional[str], deadline: Deadline):
+    """
+    Wait for other follow-ups on the same conversation; the lock is released by release_user_input.
+    """
+    if not conversation_id:
+        return
+    with deadline.measure("session_lock"):
+        await session_locks.acquire(conversation_id)
+    user_input["locked_conversation"] = conversation_id
+
+
+async def call_session_store(method, *args):
+    """
+    Call a session_store method, off the event loop when sessions are written through to SQLite.
+    """
+    if session_store.disk:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def load_followup_session(conversation_id: Optional[str], score: Optional[int],
+                                conversation_history: Optional[str]) -> Tuple[Dict[str, Any], int]:
+    """
+    Return (history, score) from the session store, or from the legacy form fields.
+    """
+    if conversation_id:
+        # Session mode: history and score come from the server, not the client
+        history = await call_session_store(session_store.get, conversation_id)
+        if history is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired conversation_id")
+        score = history.get("score")
+    else:
+        if score is None or conversation_history is None:
+            raise HTTPException(status_code=400, detail="Provide conversation_id, or score and conversation_history")
         try:
             history = json.loads(conversation_history)
         except Exception:
             raise HTTPException(status_code=400, detail="conversation_history must be valid JSON string")
 
-        initial_transcription = history.get("initial_transcription", "")
-        turns = history.get("turns", [])
-        # Extract sentiment and feedback from initial response (key features)
-        initial_sentiment = history.get("sentiment", "")
-        initial_feedback = history.get("feedback", [])
+    if score is None or score < 0 or score > 10:
+        raise HTTPException(status_code=400, detail="Score must be 0-10")
+    return history, score
 
-        user_transcription = None
 
-        if transcription:
-            user_transcription = transcription
-            print("Using frontend transcription")
-        elif audio_data:
-            audio_bytes = await audio_data.read()
-            if not audio_bytes:
-                raise HTTPException(status_code=400, detail="Audio file empty")
+async def lookup_cached_response(contents, bypass_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (cache_key, cached_text). The key is None when the response must not be cached
+    (audio prompt, cache disabled or bypassed); cached_text is None on a miss.
+    """
+    if not response_cache.enabled or not isinstance(contents, str):
+        # Only text prompts are cacheable; audio parts are never byte-identical
+        return None, None
+    if bypass_cache:
+        response_cache.record_bypass()
+        return None, None
+    cache_key = ResponseCache.key(llm_provider.model_name, contents)
+    if response_cache.disk:
+        # Memory misses read SQLite
+        return cache_key, await asyncio.to_thread(response_cache.get, cache_key)
+    return cache_key, response_cache.get(cache_key)
+
+
+async def store_cached_response(cache_key: str, text: str):
+    if response_cache.disk:
+        # The write-through commits to SQLite
+        await asyncio.to_thread(response_cache.put, cache_key, text)
+    else:
+        response_cache.put(cache_key, text)
+
+
+async def generate_feedback_batch(items: List[Tuple[int, str]]) -> List[Optional[str]]:
+    """
+    One model call for several (score, transcription) items; returns each item's JSON text,
+    or None for items that must fall back to a single call.
+    """
+    listing = "\n".join(
+        json.dumps({"id": i, "score": score, "feedback": transcription}, ensure_ascii=False)
+        for i, (score, transcription) in enumerate(items)
+    )
+    text = await upstream.call(llm_provider.generate, BATCH_FEEDBACK_PROMPT.format(ITEMS=listing))
+    try:
+        results = extract_json_object(text).get("results")
+    except (ValueError, AttributeError) as e:
+        logger.warning("batch response parse error", extra={"error": str(e)})
+        return [None] * len(items)
+
+    by_id: Dict[int, str] = {}
+    for result in results if isinstance(results, list) else []:
+        if not isinstance(result, dict) or not isinstance(result.get("id"), int):
+            continue
+        item_id = result.pop("id")
+        try:
+            item, _ = coerce_analysis(result, FeedbackAnalysis)
+        except ValueError:
+            continue
+        if item.get("conversationalResponse"):
+            by_id[item_id] = json.dumps(item, ensure_ascii=False)
+    return [by_id.get(i) for i in range(len(items))]
 
-            ext = os.path.splitext(audio_data.filename)[1] or ".webm"
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tf:
-                tf.write(audio_bytes)
-                temp_path = tf.name
 
-            try:
-                audio_file_handle = genai.upload_file(path=temp_path, mime_type=audio_data.content_type or "audio/webm")
-            except Exception as e:
-                print("Upload error:", e)
-                raise HTTPException(status_code=500, detail=f"Failed to upload follow-up audio: {e}")
-        else:
-            raise HTTPException(status_code=400, detail="Either transcription or audio_data must be provided")
-
-        # build conversation history text for prompt
-        history_text = ""
-        for i, t in enumerate(turns, 1):
-            ai_text = t.get("ai", "")
-            user_text = t.get("user", "")
-            history_text += f"\nTurn {i}:\n AI: {ai_text}\n User: {user_text}\n"
-
-        model = genai.GenerativeModel(model_name="gemini-2.5-flash-preview-09-2025", generation_config=generation_config)
-
-        if user_transcription:
-            prompt = FOLLOWUP_PROMPT.format(
-                NPS_SCORE=score,
-                INITIAL_TRANSCRIPTION=initial_transcription,
-                CONVERSATION_HISTORY=history_text if history_text else "No previous follow-ups yet."
-            )
-            prompt_with = f"{prompt}\n\nUser's current response: \"{user_transcription}\""
-            try:
-                response = await model.generate_content_async(prompt_with)
-            except Exception as e:
-                print("Model call error (text followup):", e)
-                raise HTTPException(status_code=500, detail=f"Model error: {e}")
-        else:
-            prompt = FOLLOWUP_PROMPT.format(
-                NPS_SCORE=score,
-                INITIAL_TRANSCRIPTION=initial_transcription,
-                CONVERSATION_HISTORY=history_text if history_text else "No previous follow-ups yet."
-            )
-            try:
-                response = await model.generate_content_async([prompt, audio_file_handle])
-            except Exception as e:
-                print("Model call error (audio followup):", e)
-                raise HTTPException(status_code=500, detail=f"Model error: {e}")
+async def generate_feedback_single(item: Tuple[int, str]) -> str:
+    score, transcription = item
+    return await upstream.call(llm_provider.generate, build_feedback_contents(score, {"transcription": transcription}))
+
+
+feedback_batcher = MicroBatcher(
+    generate_feedback_batch,
+    generate_feedback_single,
+    max_batch=FEEDBACK_BATCH_MAX_SIZE,
+    max_wait_ms=FEEDBACK_BATCH_MAX_WAIT_MS,
+) if FEEDBACK_BATCHING else None
 
-        text = getattr(response, "text", None) or getattr(response, "content", None) or str(response)
-        print("Raw model response (followup, truncated):", text[:1000])
 
+async def parse_model_output(text: str, schema: Type[AnalysisBase],
+                             deadline: Deadline) -> Tuple[Dict[str, Any], str]:
+    """
+    Parse and validate a model reply, repairing near misses locally. Anything else gets one
+    short re-ask with just the broken output (no audio, no history) before giving up with a 500.
+    Returns the analysis and the text to cache: the reply itself, or the repaired JSON.
+    """
+    logger.debug("model response", extra={"text": text[:800]})
+    with deadline.measure("parse"):
         try:
-            parsed = extract_json_from_text(text)
+            parsed, repaired = parse_analysis(text, schema)
+            repair_tiers["coerced" if repaired else "clean"] += 1
+            return parsed, json.dumps(parsed, ensure_ascii=False) if repaired else text
         except ValueError as e:
-            print("JSON extraction error for followup:", e)
-            print("Full model response:", text[:4000])
-            raise HTTPException(status_code=500, detail=f"Failed to parse model response: {e}")
-
-        # Safety defaults
-        if "requiresFollowUp" not in parsed:
-            parsed["requiresFollowUp"] = True
-        if "conversationComplete" not in parsed:
-            parsed["conversationComplete"] = not parsed["requiresFollowUp"]
-
-        # Validate boolean types
-        if not isinstance(parsed["requiresFollowUp"], bool):
-            raise HTTPException(status_code=500, detail="Model returned invalid requiresFollowUp type")
-        if not isinstance(parsed["conversationComplete"], bool):
-            raise HTTPException(status_code=500, detail="Model returned invalid conversationComplete type")
-
-        parsed.setdefault("transcription", user_transcription or parsed.get("transcription", ""))
-        parsed.setdefault("conversationalResponse", parsed.get("conversationalResponse", ""))
-
-        parsed["score"] = score
-
-        # append the new turn to turns
-        turns.append({
-            "ai": parsed.get("conversationalResponse", ""),
-            "user": parsed.get("transcription", user_transcription or "")
-        })
-
-        # update history object
-        history["turns"] = turns
-        history["conversationComplete"] = parsed.get("conversationComplete", False)
-        history["last_updated"] = datetime.utcnow().isoformat() + "Z"
-        history.setdefault("initial_transcription", initial_transcription)
-        history.setdefault("score", score)
-
-        # If conversation done, save to disk
+            error = e
+    logger.warning("model response parse error", extra={"error": str(error), "text": text[:4000]})
+
+    if MODEL_REPAIR_REASK and text.strip():
+        prompt = REPAIR_PROMPT.format(FIELDS=field_summary(schema), ERROR=error,
+                                      OUTPUT=text[:MODEL_REPAIR_MAX_CHARS])
+        try:
+            fixed = await deadline.run("repair", upstream.call(llm_provider.generate, prompt),
+                                       reserve=DEADLINE_FINISH_RESERVE_SECONDS)
+            with deadline.measure("parse"):
+                parsed, _ = parse_analysis(fixed, schema)
+            repair_tiers["reasked"] += 1
+            return parsed, json.dumps(parsed, ensure_ascii=False)
+        except DeadlineExceeded:
+            repair_tiers["failed"] += 1
+            raise
+        except Exception as e:
+            logger.warning("repair re-ask failed", extra={"error": str(e)})
+
+    repair_tiers["failed"] += 1
+    if isinstance(error, InvalidAnalysis):
+        raise HTTPException(status_code=500, detail=f"Model returned {error}")
+    raise HTTPException(status_code=500, detail=f"Failed to parse model response as JSON: {error}")
+
+
+async def finish_feedback(parsed: Dict[str, Any], score: int, user_input: Dict[str, Any]) -> Dict[str, Any]:
+    user_transcription = user_input["transcription"]
+    # fill missing supportive fields
+    # Use transcription from frontend if provided, otherwise use parsed transcription
+    parsed.setdefault("transcription", user_transcription or parsed.get("transcription", ""))
+    if user_transcription and not parsed.get("transcription"):
+        parsed["transcription"] = user_transcription
+
+    parsed.setdefault("sentiment", "")
+    parsed.setdefault("feedback", [])
+    parsed.setdefault("conversationalResponse", "")
+
+    parsed["score"] = score
+
+    # Build history object to return
+    history = {
+        "initial_transcription": parsed["transcription"],
+        "score": score,
+        "sentiment": parsed["sentiment"],
+        "feedback": parsed["feedback"],
+        "turns": []
+    }
+    if parsed.get("requiresFollowUp", True):
+        conversation_id = await call_session_store(session_store.create, history)
+    else:
+        # Nothing to follow up on, so no session is kept for this id
+        conversation_id = new_conversation_id()
+
+    return {
+        **parsed,
+        "conversation_id": conversation_id,
+        "audioPath": user_input["audio_path"],
+        "history": history
+    }
+
+
+async def finish_followup(parsed: Dict[str, Any], score: int, history: Dict[str, Any],
+                          conversation_id: Optional[str], user_input: Dict[str, Any]) -> Dict[str, Any]:
+    user_transcription = user_input["transcription"]
+    initial_transcription = history.get("initial_transcription", "")
+    turns = history.get("turns", [])
+
+    parsed.setdefault("transcription", user_transcription or parsed.get("transcription", ""))
+    parsed.setdefault("conversationalResponse", parsed.get("conversationalResponse", ""))
+
+    parsed["score"] = score
+
+    # Server-side cap: the last allowed turn closes the conversation whatever the model said
+    if len(turns) + 1 >= FOLLOWUP_MAX_TURNS and parsed.get("requiresFollowUp", True):
+        logger.info("turn cap reached, closing conversation", extra={"max_turns": FOLLOWUP_MAX_TURNS})
+        parsed["requiresFollowUp"] = False
+        parsed["conversationComplete"] = True
+
+    # append the new turn to turns
+    turns.append({
+        "ai": parsed.get("conversationalResponse", ""),
+        "user": parsed.get("transcription", user_transcription or ""),
+        "prompt_tokens": user_input["prompt_tokens"],
+    })
+
+    # update history object
+    history["turns"] = turns
+    history["conversationComplete"] = parsed.get("conversationComplete", False)
+    history["last_updated"] = datetime.utcnow().isoformat() + "Z"
+    history.setdefault("initial_transcription", initial_transcription)
+    history.setdefault("score", score)
+
+    # If conversation done, save to disk
+    if not parsed.get("requiresFollowUp", True):
+        try:
+            # Build complete conversation data with sentiment
+            complete_conversation = {
+                "conversation_id": conversation_id or new_conversation_id(),
+                "score": score,
+                "sentiment": history.get("sentiment", ""),  # Key feature: user's sentiment
+                "initial_transcription": initial_transcription,
+                "initial_feedback_points": history.get("feedback", []),  # Key feedback points
+                "turns": turns,
+                "final_analysis": parsed,
+                "metadata": {
+                    "total_turns": len(turns),
+                    "completed_at": datetime.utcnow().isoformat() + "Z"
+                },
+                "saved_at": datetime.utcnow().isoformat() + "Z"
+            }
+
+            saved_filename = await save_conversation_file(complete_conversation)
+            parsed["saved_conversation_file"] = saved_filename
+            publish_saved_conversation(saved_filename, complete_conversation)
+            logger.info("conversation saved", extra={"file": saved_filename})
+        except Exception as e:
+            logger.error("failed saving conversation file", extra={"error": str(e)})
+
+    if conversation_id:
         if not parsed.get("requiresFollowUp", True):
-            try:
-                # Build complete conversation data with sentiment
-                complete_conversation = {
-                    "score": score,
-                    "sentiment": initial_sentiment,  # Key feature: user's sentiment
-                    "initial_transcription": initial_transcription,
-                    "initial_feedback_points": initial_feedback,  # Key feedback points
-                    "turns": turns,
-                    "final_analysis": parsed,
-                    "metadata": {
-                        "total_turns": len(turns),
-                        "completed_at": datetime.utcnow().isoformat() + "Z"
-                    },
-                    "saved_at": datetime.utcnow().isoformat() + "Z"
-                }
-                
-                saved_filename = save_conversation_file(complete_conversation)
-                parsed["saved_conversation_file"] = saved_filename
-                print("💾 Conversation saved with sentiment:", saved_filename)
-            except Exception as e:
-                print("Failed saving conversation file:", e)
+            await call_session_store(session_store.delete, conversation_id)
+        else:
+            await call_session_store(session_store.put, conversation_id, history)
 
-        # Build return object (merged updated history + analysis)
-        result = {
+        # Session mode returns only what changed this turn
+        return {
+            "conversation_id": conversation_id,
             "transcription": parsed.get("transcription", ""),
             "conversationalResponse": parsed.get("conversationalResponse", ""),
             "requiresFollowUp": parsed.get("requiresFollowUp", True),
             "conversationComplete": parsed.get("conversationComplete", False),
             "score": score,
-            "history": history
+            "audioPath": user_input["audio_path"],
+            "turn": turns[-1],
+            "turn_number": len(turns),
+            "prompt_tokens": user_input["prompt_tokens"],
         }
 
-        return result
+    # Build return object (merged updated history + analysis)
+    return {
+        "transcription": parsed.get("transcription", ""),
+        "conversationalResponse": parsed.get("conversationalResponse", ""),
+        "requiresFollowUp": parsed.get("requiresFollowUp", True),
+        "conversationComplete": parsed.get("conversationComplete", False),
+        "score": score,
+        "audioPath": user_input["audio_path"],
+        "prompt_tokens": user_input["prompt_tokens"],
+        "history": history
+    }
+
+
+async def stream_model_response(contents, finish: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                                schema: Type[AnalysisBase], user_input: Dict[str, Any], label: str,
+                                bypass_cache: bool, deadline: Deadline) -> StreamingResponse:
+    """
+    NDJSON stream: `delta` events with conversationalResponse text as the model writes it,
+    then one `result` event (same body as the non-streaming endpoint) or an `error` event.
+    Each wait for the next chunk is bounded by what is left of the request deadline.
+    """
+    cache_key, cached_text = await lookup_cached_response(contents, bypass_cache)
+    if cached_text is None:
+        # Reject up front while we can still answer with a real 503
+        try:
+            upstream.admit()
+        except UpstreamOverloaded as e:
+            await release_user_input(user_input, deadline)
+            raise upstream_unavailable(e)
+
+    async def events():
+        extractor = JsonStringFieldStreamer("conversationalResponse")
+        chunks = []
+        try:
+            if cached_text is not None:
+                chunks.append(cached_text)
+                yield ndjson_event("delta", text=extractor.feed(cached_text))
+            else:
+                model_stream = upstream.stream(llm_provider.generate_stream, contents)
+                try:
+                    while True:
+                        try:
+                            chunk = await deadline.run("generate", model_stream.__anext__(),
+                                                       reserve=DEADLINE_FINISH_RESERVE_SECONDS)
+                        except StopAsyncIteration:
+                            break
+                        chunks.append(chunk)
+                        delta = extractor.feed(chunk)
+                        if delta:
+                            yield ndjson_event("delta", text=delta)
+                except DeadlineExceeded:
+                    raise
+                except UpstreamOverloaded as e:
+                    logger.warning("upstream overloaded", extra={"reason": e.reason})
+                    yield ndjson_event("error", status=503, detail=e.reason, retry_after=math.ceil(e.retry_after))
+                    return
+                except Exception as e:
+                    logger.error("model error", extra={"error": str(e)})
+                    raise HTTPException(status_code=500, detail=f"Model error: {e}")
+                finally:
+                    await model_stream.aclose()
+
+            text = "".join(chunks)
+            parsed, text = await parse_model_output(text, schema, deadline)
+            if cache_key and cached_text is None:
+                await store_cached_response(cache_key, text)
+            with deadline.measure("finish"):
+                result = await finish(parsed)
+            yield ndjson_event("result", data=result)
+        except DeadlineExceeded as e:
+            yield ndjson_event("error", status=504, detail=e.detail())
+        except HTTPException as e:
+            yield ndjson_event("error", status=e.status_code, detail=e.detail)
+        except Exception as e:
+            logger.exception("unhandled error", extra={"endpoint": label})
+            yield ndjson_event("error", status=500, detail=str(e))
+
+    # Released when the response ends, also if the client left before the body started
+    # no-transform/X-Accel-Buffering keep proxies from holding back partial output
+    return ClosingStreamingResponse(events(), lambda: release_user_input(user_input, deadline),
+                                    media_type="application/x-ndjson",
+                                    headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
+
+
+@app.post("/submit_feedback")
+async def submit_feedback(
+    score: int = Form(..., description="NPS score from 0-10"),
+    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
+    audio_data: UploadFile = File(None, description="Audio file (fallback if no transcription)"),
+    bypass_cache: bool = Form(False, description="Skip the response cache for this request")
+):
+    user_input = new_user_input()
+    deadline = Deadline("submit_feedback", DEADLINES["submit_feedback"])
+    try:
+        if score < 0 or score > 10:
+            raise HTTPException(status_code=400, detail="Score must be 0-10")
+        await read_user_input(user_input, transcription, audio_data,
+                              "Audio file is empty", "Failed to upload audio to Gemini", deadline)
+
+        contents = build_feedback_contents(score, user_input)
+        cache_key, cached_text = await lookup_cached_response(contents, bypass_cache)
+        text = cached_text
+        if text is None:
+            try:
+                if feedback_batcher and user_input["transcription"]:
+                    call = feedback_batcher.submit((score, user_input["transcription"]))
+                else:
+                    call = upstream.call(llm_provider.generate, contents)
+                text = await deadline.run("generate", call, reserve=DEADLINE_FINISH_RESERVE_SECONDS)
+            except DeadlineExceeded:
+                raise
+            except UpstreamOverloaded as e:
+                raise upstream_unavailable(e)
+            except Exception as e:
+                logger.error("model error", extra={"error": str(e)})
+                raise HTTPException(status_code=500, detail=f"Error calling model: {e}")
+        parsed, text = await parse_model_output(text, FeedbackAnalysis, deadline)
+        if cache_key and cached_text is None:
+            await store_cached_response(cache_key, text)
+
+        with deadline.measure("finish"):
+            return await finish_feedback(parsed, score, user_input)
+
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        raise deadline_exceeded(e)
+    except Exception as e:
+        logger.exception("unhandled error", extra={"endpoint": "submit_feedback"})
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await release_user_input(user_input, deadline)
+
+
+@app.post("/submit_feedback/stream")
+async def submit_feedback_stream(
+    score: int = Form(..., description="NPS score from 0-10"),
+    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
+    audio_data: UploadFile = File(None, description="Audio file (fallback if no transcription)"),
+    bypass_cache: bool = Form(False, description="Skip the response cache for this request")
+):
+    # Input errors are still plain 4xx responses; only the model call is streamed
+    user_input = new_user_input()
+    deadline = Deadline("submit_feedback_stream", DEADLINES["submit_feedback_stream"])
+    try:
+        if score < 0 or score > 10:
+            raise HTTPException(status_code=400, detail="Score must be 0-10")
+        await read_user_input(user_input, transcription, audio_data,
+                              "Audio file is empty", "Failed to upload audio to Gemini", deadline)
+    except BaseException as e:
+        await release_user_input(user_input, deadline)
+        if isinstance(e, DeadlineExceeded):
+            raise deadline_exceeded(e)
+        raise
+
+    return await stream_model_response(
+        build_feedback_contents(score, user_input),
+        lambda parsed: finish_feedback(parsed, score, user_input),
+        FeedbackAnalysis,
+        user_input,
+        "submit_feedback/stream",
+        bypass_cache,
+        deadline,
+    )
+
+
+@app.post("/submit_followup")
+async def submit_followup(
+    conversation_id: str = Form(None, description="Session id returned by /submit_feedback (preferred)"),
+    score: int = Form(None, description="Original rating score from 0-10 (legacy, without conversation_id)"),
+    conversation_history: str = Form(None, description="Full conversation history as JSON string (legacy, without conversation_id)"),
+    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
+    audio_data: UploadFile = File(None, description="Follow-up audio file (fallback if no transcription)"),
+    bypass_cache: bool = Form(False, description="Skip the response cache for this request")
+):
+    user_input = new_user_input()
+    deadline = Deadline("submit_followup", DEADLINES["submit_followup"])
+    try:
+        await lock_followup_session(user_input, conversation_id, deadline)
+        history, score = await load_followup_session(conversation_id, score, conversation_history)
+        await read_user_input(user_input, transcription, audio_data,
+                              "Audio file empty", "Failed to upload follow-up audio", deadline)
+
+        contents = build_followup_contents(score, history, user_input)
+        cache_key, cached_text = await lookup_cached_response(contents, bypass_cache)
+        text = cached_text
+        if text is None:
+            try:
+                text = await deadline.run("generate", upstream.call(llm_provider.generate, contents),
+                                          reserve=DEADLINE_FINISH_RESERVE_SECONDS)
+            except DeadlineExceeded:
+                raise
+            except UpstreamOverloaded as e:
+                raise upstream_unavailable(e)
+            except Exception as e:
+                logger.error("model error", extra={"error": str(e), "endpoint": "submit_followup"})
+                raise HTTPException(status_code=500, detail=f"Model error: {e}")
+        parsed, text = await parse_model_output(text, FollowupAnalysis, deadline)
+        if cache_key and cached_text is None:
+            await store_cached_response(cache_key, text)
+
+        with deadline.measure("finish"):
+            return await finish_followup(parsed, score, history, conversation_id, user_input)
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        raise deadline_exceeded(e)
     except Exception as e:
-        print("Unhandled submit_followup error:", e)
-        traceback.print_exc()
+        logger.exception("unhandled error", extra={"endpoint": "submit_followup"})
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        safe_delete_temp(temp_path)
-        await safe_delete_genai_file(audio_file_handle)
+        await release_user_input(user_input, deadline)
+
+
+@app.post("/submit_followup/stream")
+async def submit_followup_stream(
+    conversation_id: str = Form(None, description="Session id returned by /submit_feedback (preferred)"),
+    score: int = Form(None, description="Original rating score from 0-10 (legacy, without conversation_id)"),
+    conversation_history: str = Form(None, description="Full conversation history as JSON string (legacy, without conversation_id)"),
+    transcription: str = Form(None, description="Pre-transcribed text (faster, optional)"),
+    audio_data: UploadFile = File(None, description="Follow-up audio file (fallback if no transcription)"),
+    bypass_cache: bool = Form(False, description="Skip the response cache for this request")
+):
+    user_input = new_user_input()
+    deadline = Deadline("submit_followup_stream", DEADLINES["submit_followup_stream"])
+    try:
+        await lock_followup_session(user_input, conversation_id, deadline)
+        history, score = await load_followup_session(conversation_id, score, conversation_history)
+        await read_user_input(user_input, transcription, audio_data,
+                              "Audio file empty", "Failed to upload follow-up audio", deadline)
+    except BaseException as e:
+        await release_user_input(user_input, deadline)
+        if isinstance(e, DeadlineExceeded):
+            raise deadline_exceeded(e)
+        raise
+
+    return await stream_model_response(
+        build_followup_contents(score, history, user_input),
+        lambda parsed: finish_followup(parsed, score, history, conversation_id, user_input),
+        FollowupAnalysis,
+        user_input,
+        "submit_followup/stream",
+        bypass_cache,
+        deadline,
+    )
 
 
 if __name__ == "__main__":
     import uvicorn
-    print("Starting server on http://127.0.0.1:8000")
+    logger.info("starting server on http://127.0.0.1:8000")
     uvicorn.run("server:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,175 @@
+"""
+Server-side conversation sessions for /submit_followup.
+
+`/submit_feedback` creates a session holding the conversation history and
+returns its `conversation_id`; follow-ups then send only that id plus the new
+utterance, and the server appends turns to its own copy instead of trusting a
+client-supplied history.
+
+Sessions live in memory (LRU, at most SESSION_MAX_ENTRIES) and expire
+SESSION_TTL_SECONDS after their last use. Set SESSION_DB to a SQLite path to
+also write sessions through to disk so they survive restarts and can be
+shared by workers on the same host.
+
+`SessionLocks` serializes follow-ups on the same conversation: the server
+holds a conversation's lock from reading its session to writing the new turn
+back, so two concurrent follow-ups cannot interleave and lose a turn or slip
+past the turn cap. The locks are per process, like the in-memory sessions.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+# Expired rows in SESSION_DB are purged at most this often
+DB_SWEEP_INTERVAL_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    conversation_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    history TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
+"""
+
+
+class SessionStore:
+    def __init__(self, ttl_seconds: float = 1800, max_entries: int = 100000, db_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._conn = None
+        self._last_db_sweep = 0.0
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def disk(self) -> bool:
+        return self._conn is not None
+
+    def create(self, history: Dict[str, Any]) -> str:
+        conversation_id = uuid.uuid4().hex
+        self.put(conversation_id, history)
+        return conversation_id
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the session's history (refreshing its TTL), or None if unknown/expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(conversation_id)
+            if entry and entry[0] > now:
+                history = entry[1]
+            elif entry:
+                del self._sessions[conversation_id]
+                return None
+            else:
+                history = self._load(conversation_id, now)
+                if history is None:
+                    return None
+            expires_at = now + self.ttl_seconds
+            self._sessions[conversation_id] = (expires_at, history)
+            self._sessions.move_to_end(conversation_id)
+            self._evict(now)
+            if self._conn:
+                # Keep the stored copy alive too, or it expires on restart/eviction while still in use
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE sessions SET expires_at = ? WHERE conversation_id = ?", (expires_at, conversation_id)
+                    )
+        return history
+
+    def put(self, conversation_id: str, history: Dict[str, Any]):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._sessions[conversation_id] = (expires_at, history)
+            self._sessions.move_to_end(conversation_id)
+            self._evict(time.time())
+            if self._conn:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sessions (conversation_id, expires_at, history) VALUES (?, ?, ?)",
+                        (conversation_id, expires_at, json.dumps(history, ensure_ascii=False)),
+                    )
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+            if self._conn:
+                with self._conn:
+                    self._conn.execute("DELETE FROM sessions WHERE conversation_id = ?", (conversation_id,))
+
+    def _load(self, conversation_id: str, now: float) -> Optional[Dict[str, Any]]:
+        if not self._conn:
+            return None
+        row = self._conn.execute(
+            "SELECT history FROM sessions WHERE conversation_id = ? AND expires_at > ?", (conversation_id, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _evict(self, now: float):
+        # Oldest-used first: drop expired sessions, then anything over the size cap
+        while self._sessions:
+            conversation_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now and len(self._sessions) <= self.max_entries:
+                break
+            del self._sessions[conversation_id]
+        if self._conn and now - self._last_db_sweep >= DB_SWEEP_INTERVAL_SECONDS:
+            self._last_db_sweep = now
+            with self._conn:
+                self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+
+class SessionLocks:
+    """
+    One asyncio.Lock per conversation id, dropped again once nobody holds or waits for it.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, conversation_id: str):
+        lock, users = self._locks.get(conversation_id, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[conversation_id] = (lock, users + 1)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._unref(conversation_id)
+            raise
+
+    def release(self, conversation_id: str):
+        self._locks[conversation_id][0].release()
+        self._unref(conversation_id)
+
+    def _unref(self, conversation_id: str):
+        lock, users = self._locks[conversation_id]
+        if users <= 1:
+            del self._locks[conversation_id]
+        else:
+            self._locks[conversation_id] = (lock, users - 1)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other as top-level modules (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def server_module(tmp_path_factory):
+    """
+    server.py imported with the offline stub provider, an in-memory store and a scratch working directory.
+    """
+    os.environ.update({
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": "20",
+        "LLM_STUB_LATENCY_DIST": "fixed",
+        "LLM_WARMUP": "0",
+        "CONVERSATIONS_DB": ":memory:",
+    })
+    os.chdir(tmp_path_factory.mktemp("server"))
+    import server
+    return server
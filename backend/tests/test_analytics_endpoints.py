@@ -0,0 +1,89 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+COMPUTE_SECONDS = 0.5
+
+
+def conversation(saved_at="2026-03-01T10:15:00Z"):
+    return {"saved_at": saved_at, "score": 8, "sentiment": "Neutral", "initial_feedback_points": ["fast shipping"],
+            "final_analysis": {"requiresFollowUp": False, "conversationComplete": True}, "turns": []}
+
+
+def test_analytics_compute_runs_off_the_event_loop(server_module, monkeypatch):
+    store = server_module.conversation_store
+    store.add("analytics_offload.json", conversation())
+    summarize = store.summarize
+
+    def slow_summarize(*args, **kwargs):
+        time.sleep(COMPUTE_SECONDS)
+        return summarize(*args, **kwargs)
+
+    monkeypatch.setattr(store, "summarize", slow_summarize)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = time.perf_counter()
+            summary = asyncio.create_task(client.get("/analytics/summary", params={"top_n": 7}))
+            await asyncio.sleep(0.05)
+            health = await client.get("/health")
+            # Measured from before the summary started: a blocked loop also delays the sleep
+            latency = time.perf_counter() - started
+            return (await summary), health, latency
+
+    summary, health, latency = asyncio.run(run())
+    assert summary.status_code == 200
+    assert health.status_code == 200
+    assert latency < 0.2
+
+
+def test_open_ended_timeseries_is_modified_when_the_hour_moves(server_module, monkeypatch):
+    server_module.conversation_store.add("timeseries_validator.json", conversation())
+    clock = [time.time()]
+    monkeypatch.setattr(server_module.time, "time", lambda: clock[0])
+    start = datetime.fromtimestamp(clock[0] - 3 * 3600, timezone.utc).isoformat()
+
+    async def get(headers=None):
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await client.get("/analytics/timeseries", params={"start_date": start, "interval": "hour"},
+                                    headers=headers)
+
+    first = asyncio.run(get())
+    assert first.status_code == 200
+    since = {"If-Modified-Since": first.headers["last-modified"]}
+    assert asyncio.run(get(since)).status_code == 304
+
+    # No new data, but the range now ends in a later hour with a new (empty) bucket
+    clock[0] += 3600
+    later = asyncio.run(get(since))
+    assert later.status_code == 200
+    assert len(later.json()["buckets"]) == len(first.json()["buckets"]) + 1
+
+
+def test_hourly_timeseries_stays_on_the_hour_across_a_half_hour_dst_shift(server_module):
+    # Lord Howe Island falls back from +11:00 to +10:30 at 02:00 local on 2026-04-05 (15:00 UTC)
+    store = server_module.conversation_store
+    for i, saved_at in enumerate(["2026-04-04T14:10:00Z", "2026-04-04T15:10:00Z",
+                                  "2026-04-04T15:40:00Z", "2026-04-04T16:40:00Z"]):
+        store.add(f"lord_howe_{i}.json", conversation(saved_at))
+    params = {"start_date": "2026-04-04T13:00:00Z", "end_date": "2026-04-04T17:59:00Z",
+              "interval": "hour", "tz": "Australia/Lord_Howe"}
+
+    async def get(headers=None):
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await client.get("/analytics/timeseries", params=params, headers=headers)
+
+    response = asyncio.run(get())
+    assert response.status_code == 200
+    buckets = response.json()["buckets"]
+    assert [b["start"][11:] for b in buckets] == [
+        "00:00:00+11:00", "01:00:00+11:00", "02:00:00+10:30", "03:00:00+10:30", "04:00:00+10:30"]
+    # The 01:00 hour lasts 90 minutes and holds both of its records
+    assert [b["count"] for b in buckets] == [0, 2, 1, 1, 0]
+    assert all(b["end"] == following["start"] for b, following in zip(buckets, buckets[1:]))
+    assert asyncio.run(get({"If-None-Match": response.headers["etag"]})).status_code == 304
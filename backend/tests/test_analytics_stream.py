@@ -0,0 +1,22 @@
+import asyncio
+
+
+def test_stream_subscriber_is_dropped_when_client_leaves_before_the_body(server_module):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/analytics/stream", "raw_path": b"/analytics/stream", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"test")], "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # A real socket write yields; the disconnect is noticed before the body is entered
+        await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.wait_for(server_module.app(scope, receive, send), timeout=5)
+
+    asyncio.run(run())
+    assert len(server_module.analytics_hub) == 0
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import httpx
+
+from conversation_history import SUMMARY_OMITTED, HistoryCompactor, estimate_tokens
+
+
+def long_turn(number):
+    return {"ai": f"Question {number}: " + "could you tell me more about that? " * 10,
+            "user": f"Answer {number}: " + "it was slow and confusing " * 10}
+
+
+def test_compacted_history_keeps_first_and_last_turns_within_budget():
+    compactor = HistoryCompactor(verbatim_turns=2, summary_turn_chars=160, summary_max_chars=1000)
+    history = {"initial_transcription": "Checkout kept failing", "turns": []}
+    sizes = []
+    for number in range(1, 31):
+        # Compacted before every follow-up, as the server does
+        compactor.compact(history)
+        sizes.append(estimate_tokens(compactor.render(history)))
+        history["turns"].append(long_turn(number))
+    compactor.compact(history)
+    text = compactor.render(history)
+
+    assert history["summarized_turns"] == 28
+    assert len(history["turns"]) == 30
+    assert history["summary"][0].startswith("Turn 1:")
+    assert history["summary"][1] == SUMMARY_OMITTED
+    assert history["summary"][-1].startswith("Turn 28:")
+    assert sum(len(point) for point in history["summary"]) <= 1000
+    # The last turns are verbatim, the middle ones are gone
+    assert long_turn(29)["user"] in text and long_turn(30)["ai"] in text
+    assert "Answer 15:" not in text and long_turn(28)["user"] not in text
+    # Prompt size stops growing once the summary is full
+    budget = (1000 + 2 * (len(long_turn(30)["ai"]) + len(long_turn(30)["user"]) + 40)) // 4
+    assert max(sizes) <= budget
+    assert estimate_tokens(text) <= budget
+    assert sizes[-1] < 2 * sizes[5]
+
+
+def test_short_summaries_are_kept_whole():
+    compactor = HistoryCompactor(verbatim_turns=1)
+    history = {"turns": [{"ai": "Why?", "user": "Slow"}, {"ai": "What else?", "user": "Rude"},
+                         {"ai": "Anything else?", "user": "No"}]}
+    compactor.compact(history)
+    assert [point[:7] for point in history["summary"]] == ["Turn 1:", "Turn 2:"]
+    assert "User: No" in compactor.render(history)
+
+
+def test_turn_after_the_cap_ends_the_conversation(server_module, monkeypatch):
+    prompts = []
+
+    async def generate(contents):
+        prompts.append(contents)
+        # A model that would keep asking forever
+        return json.dumps({"sentiment": "Negative", "feedback": ["slow"],
+                           "conversationalResponse": f"Question {len(prompts)}?",
+                           "requiresFollowUp": True, "conversationComplete": False})
+
+    monkeypatch.setattr(server_module.llm_provider, "generate", generate)
+    max_turns = server_module.FOLLOWUP_MAX_TURNS
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = await client.post("/submit_feedback", data={
+                "score": "3", "transcription": "Checkout kept failing", "bypass_cache": "true"})
+            conversation_id = started.json()["conversation_id"]
+            responses = []
+            for i in range(max_turns + 1):
+                responses.append(await client.post("/submit_followup", data={
+                    "conversation_id": conversation_id, "transcription": f"Answer {i + 1}", "bypass_cache": "true"}))
+            return responses
+
+    responses = asyncio.run(run())
+    answered = [r.json() for r in responses[:max_turns]]
+    assert [r["requiresFollowUp"] for r in answered] == [True] * (max_turns - 1) + [False]
+    assert answered[-1]["conversationComplete"] is True
+    assert answered[-1]["turn_number"] == max_turns
+    # The session is gone once the cap closed the conversation
+    assert responses[-1].status_code == 404
+
+    last_prompt = prompts[max_turns]
+    assert server_module.FINAL_TURN_NOTE in last_prompt
+    assert all(server_module.FINAL_TURN_NOTE not in prompt for prompt in prompts[:max_turns])
+    assert "Checkout kept failing" in last_prompt
+    assert f"User: Answer {max_turns - 1}" in last_prompt
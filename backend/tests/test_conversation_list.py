@@ -0,0 +1,113 @@
+import itertools
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from conversation_store import MAX_LIST_LIMIT, SORT_COLUMNS, ConversationStore, saved_at_timestamp
+
+SCORES = [3, 3, 3, 7, 7, 10, None]
+SENTIMENTS = ["Negative", "Positive", "Neutral", None]
+SAVED_AT = [
+    "2026-03-01T10:00:00+00:00",
+    "2026-03-01T10:00:00+00:00",
+    "2026-03-01T12:30:00+00:00",
+    "2026-03-02T08:00:00+00:00",
+    "2026-03-03T23:59:59+00:00",
+    None,
+]
+
+FILTERS = {
+    "none": {},
+    "score_range": {"min_score": 3, "max_score": 7},
+    "sentiments": {"sentiments": ["Negative", "Unknown"]},
+    "followup": {"requires_followup": True},
+    "no_followup": {"requires_followup": False},
+    "dates": {"start_dt": datetime(2026, 3, 1, 11, tzinfo=timezone.utc),
+              "end_dt": datetime(2026, 3, 3, tzinfo=timezone.utc)},
+    "combined": {"min_score": 3, "sentiments": ["Positive", "Negative"], "requires_followup": False,
+                 "start_dt": datetime(2026, 3, 1, tzinfo=timezone.utc)},
+}
+
+
+@pytest.fixture(scope="module")
+def store():
+    rng = random.Random(7)
+    store = ConversationStore(":memory:")
+    for i in range(80):
+        payload = {
+            "saved_at": rng.choice(SAVED_AT),
+            "score": rng.choice(SCORES),
+            "sentiment": rng.choice(SENTIMENTS),
+            "turns": [{}] * rng.choice([0, 1, 1, 3]),
+        }
+        followup = rng.choice([True, False, None])
+        if followup is not None:
+            payload["final_analysis"] = {"requiresFollowUp": followup}
+        # Filenames out of insertion order, so ties are broken by filename, not rowid
+        store.add(f"conversation_{rng.randrange(10 ** 6):06d}_{i}.json", payload)
+    return store
+
+
+def matches(record, min_score=None, max_score=None, sentiments=None, requires_followup=None,
+            start_dt=None, end_dt=None):
+    score, ts = record["score"], saved_at_timestamp(record["saved_at"])
+    if min_score is not None and (score is None or score < min_score):
+        return False
+    if max_score is not None and (score is None or score > max_score):
+        return False
+    if sentiments and (record["sentiment"] or "Unknown") not in sentiments:
+        return False
+    if requires_followup is not None and record["requires_followup"] is not requires_followup:
+        return False
+    if (start_dt or end_dt) and ts is None:
+        return False
+    if start_dt and ts < start_dt.timestamp():
+        return False
+    if end_dt and ts > end_dt.timestamp():
+        return False
+    return True
+
+
+def expected_order(store, sort, order, filters):
+    records = [record for record in store.query() if matches(record, **filters)]
+
+    def key(record):
+        value = saved_at_timestamp(record["saved_at"]) if sort == "saved_at" else record[sort]
+        # NULL sort values come first ascending (and so last descending)
+        return (value is not None, value or 0, record["filename"])
+
+    ordered = sorted(records, key=key)
+    return [record["filename"] for record in (ordered if order == "asc" else reversed(ordered))]
+
+
+def walk(store, page_size, **options):
+    filenames, cursor = [], None
+    while True:
+        page, cursor = store.list_records(limit=page_size, cursor=cursor, fields=["score"], **options)
+        assert len(page) <= page_size
+        filenames.extend(record["filename"] for record in page)
+        if cursor is None:
+            return filenames
+        assert len(page) == page_size
+
+
+@pytest.mark.parametrize("sort,order,filter_name",
+                         list(itertools.product(SORT_COLUMNS, ("asc", "desc"), FILTERS)))
+def test_paging_matches_one_unpaged_query(store, sort, order, filter_name):
+    filters = FILTERS[filter_name]
+    unpaged, cursor = store.list_records(limit=MAX_LIST_LIMIT, sort=sort, order=order, **filters)
+    assert cursor is None
+    unpaged = [record["filename"] for record in unpaged]
+    assert unpaged == expected_order(store, sort, order, filters)
+
+    for page_size in (1, 3, 7):
+        assert walk(store, page_size, sort=sort, order=order, **filters) == unpaged
+
+
+def test_fixture_has_ties_and_nulls(store):
+    records = store.query()
+    scores = [record["score"] for record in records]
+    assert None in scores and scores.count(3) > 5
+    assert len({record["saved_at"] for record in records}) < len(records) / 5
+    assert any(record["sentiment"] is None for record in records)
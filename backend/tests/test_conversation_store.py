@@ -0,0 +1,33 @@
+from conversation_store import ConversationStore
+
+
+def payload(points, saved_at="2026-03-01T10:15:00+00:00"):
+    return {"saved_at": saved_at, "score": 6, "initial_feedback_points": points,
+            "final_analysis": {"requiresFollowUp": False, "conversationComplete": True}}
+
+
+def test_resaving_a_conversation_replaces_its_feedback_counts():
+    store = ConversationStore(":memory:")
+    for _ in range(3):
+        store.add("conversation_a.json", payload(["slow"]))
+    store.add("conversation_b.json", payload(["slow", "rude"]))
+    store.add("conversation_c.json", payload(["fast"]))
+    store.add("conversation_c.json", payload(["friendly"], saved_at="2026-03-01T11:30:00+00:00"))
+
+    stats = store.summarize()
+    assert stats.count == 3
+    assert stats.feedback.counts == {"slow": 2, "rude": 1, "friendly": 1}
+    assert stats.feedback.exact
+    assert store.feedback_counts() == {"slow": 2, "rude": 1, "friendly": 1}
+
+
+def test_removal_of_an_evicted_point_keeps_counts_upper_bounds():
+    store = ConversationStore(":memory:", feedback_capacity=2)
+    store.add("a.json", payload(["x", "x2"]))
+    store.add("b.json", payload(["y", "y2", "z"]))
+    store.add("a.json", payload([]))
+
+    feedback = store.summarize().feedback
+    exact = store.feedback_counts()
+    for item, count in feedback.counts.items():
+        assert count - feedback.errors.get(item, 0) <= exact[item] <= count
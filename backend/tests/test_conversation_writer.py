@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from conversation_store import ConversationStore
+from conversation_writer import ConversationWriter
+
+
+def conversation(i):
+    return {"saved_at": "2026-03-01T10:15:00+00:00", "score": i % 11, "initial_feedback_points": [f"point {i}"]}
+
+
+def test_concurrent_saves_are_all_written_and_indexed(tmp_path):
+    store = ConversationStore(":memory:")
+    writer = ConversationWriter(str(tmp_path), store, max_batch=16)
+
+    async def save_all():
+        return await asyncio.gather(*(writer.save(conversation(i)) for i in range(100)))
+
+    try:
+        filenames = asyncio.run(save_all())
+    finally:
+        writer.close(5)
+
+    assert len(set(filenames)) == 100
+    ids = set()
+    for filename in filenames:
+        with open(tmp_path / filename, encoding="utf-8") as f:
+            json.load(f)
+        ids.add(filename.rsplit("_", 1)[1])
+    assert len(ids) == 100
+    assert not list(tmp_path.glob(".*.tmp"))
+    assert store.count() == 100
+    assert writer.conversations_written == 100
+
+
+def test_failed_write_resolves_its_future_with_the_error(tmp_path):
+    store = ConversationStore(":memory:")
+    writer = ConversationWriter(str(tmp_path / "missing"), store)
+    try:
+        with pytest.raises(FileNotFoundError):
+            writer.submit(conversation(1)).result(5)
+    finally:
+        writer.close(5)
+    assert store.count() == 0
+
+
+def test_writer_survives_an_unexpected_batch_error(tmp_path, monkeypatch):
+    store = ConversationStore(":memory:")
+    writer = ConversationWriter(str(tmp_path), store)
+    write_batch = writer._write_batch
+    calls = []
+
+    def fail_once(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        write_batch(batch)
+
+    monkeypatch.setattr(writer, "_write_batch", fail_once)
+    try:
+        with pytest.raises(RuntimeError):
+            writer.submit(conversation(1)).result(5)
+        # The thread is still running and takes the next save
+        filename = writer.submit(conversation(2)).result(5)
+    finally:
+        writer.close(5)
+    assert (tmp_path / filename).exists()
+    assert store.count() == 1
+
+
+def test_cancelled_future_does_not_stop_the_writer(tmp_path):
+    store = ConversationStore(":memory:")
+    writer = ConversationWriter(str(tmp_path), store)
+    try:
+        cancelled = writer.submit(conversation(1))
+        cancelled.cancel()
+        filename = writer.submit(conversation(2)).result(5)
+    finally:
+        writer.close(5)
+    assert (tmp_path / filename).exists()
+    assert store.count() == 2
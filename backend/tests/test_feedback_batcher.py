@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from feedback_batcher import MicroBatcher
+
+
+class FakeModel:
+    def __init__(self, fail_batch=False, unanswered=(), failing=()):
+        self.fail_batch = fail_batch
+        self.unanswered = set(unanswered)
+        self.failing = set(failing)
+        self.batches = []
+        self.singles = []
+
+    async def batch(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(0.01)
+        if self.fail_batch:
+            raise RuntimeError("batch call failed")
+        return [None if item in self.unanswered else f"batch:{item}" for item in items]
+
+    async def single(self, item):
+        self.singles.append(item)
+        await asyncio.sleep(0.01)
+        if item in self.failing:
+            raise ValueError(f"single call failed for {item}")
+        return f"single:{item}"
+
+
+def submit_all(batcher, items, return_exceptions=False):
+    async def run():
+        return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=return_exceptions)
+    return asyncio.run(run())
+
+
+def test_full_batch_is_flushed_without_waiting():
+    model = FakeModel()
+    batcher = MicroBatcher(model.batch, model.single, max_batch=4, max_wait_ms=5000)
+    started = time.monotonic()
+    results = submit_all(batcher, range(8))
+    assert time.monotonic() - started < 1
+    assert results == [f"batch:{i}" for i in range(8)]
+    assert model.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert model.singles == []
+    assert not batcher._tasks
+
+
+def test_partial_batch_is_flushed_after_the_delay():
+    model = FakeModel()
+    batcher = MicroBatcher(model.batch, model.single, max_batch=8, max_wait_ms=50)
+    started = time.monotonic()
+    results = submit_all(batcher, ["a", "b", "c"])
+    assert time.monotonic() - started >= 0.05
+    assert results == ["batch:a", "batch:b", "batch:c"]
+    assert model.batches == [["a", "b", "c"]]
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["items"] == 3
+    assert stats["added_latency_ms"]["max"] >= 45
+
+
+def test_lone_item_goes_out_as_a_single_call():
+    model = FakeModel()
+    batcher = MicroBatcher(model.batch, model.single, max_batch=8, max_wait_ms=10)
+    assert submit_all(batcher, ["only"]) == ["single:only"]
+    assert model.batches == []
+    assert batcher.single_calls == 1
+
+
+def test_unanswered_items_fall_back_alone():
+    model = FakeModel(unanswered={"b"})
+    batcher = MicroBatcher(model.batch, model.single, max_batch=3, max_wait_ms=1000)
+    assert submit_all(batcher, ["a", "b", "c"]) == ["batch:a", "single:b", "batch:c"]
+    assert model.singles == ["b"]
+    assert batcher.fallbacks == 1
+
+
+def test_failed_batch_call_falls_back_for_every_item():
+    model = FakeModel(fail_batch=True)
+    batcher = MicroBatcher(model.batch, model.single, max_batch=3, max_wait_ms=1000)
+    assert submit_all(batcher, ["a", "b", "c"]) == ["single:a", "single:b", "single:c"]
+    assert batcher.batch_failures == 1
+    assert batcher.fallbacks == 3
+
+
+def test_one_failing_item_does_not_fail_the_others():
+    model = FakeModel(fail_batch=True, failing={"b"})
+    batcher = MicroBatcher(model.batch, model.single, max_batch=3, max_wait_ms=1000)
+    results = submit_all(batcher, ["a", "b", "c"], return_exceptions=True)
+    assert results[0] == "single:a" and results[2] == "single:c"
+    assert isinstance(results[1], ValueError)
+    assert str(results[1]) == "single call failed for b"
+    assert not batcher._tasks
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import httpx
+
+from session_store import SessionStore
+
+
+def test_concurrent_followups_on_one_conversation_run_in_turn(server_module):
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = await client.post("/submit_feedback", data={
+                "score": "3", "transcription": "Delivery was late and support never replied", "bypass_cache": "true"})
+            conversation_id = started.json()["conversation_id"]
+
+            async def followup(i):
+                return await client.post("/submit_followup", data={
+                    "conversation_id": conversation_id, "transcription": f"Answer {i}", "bypass_cache": "true"})
+
+            return await asyncio.gather(*(followup(i) for i in range(6)))
+
+    responses = asyncio.run(run())
+    answered = [r.json() for r in responses if r.status_code == 200]
+    # The stub closes a low-score conversation on its third turn; later follow-ups find no session
+    assert len(answered) == 3
+    assert sorted(r.status_code for r in responses) == [200] * 3 + [404] * 3
+    assert [r["requiresFollowUp"] for r in answered] == [True, True, False]
+    assert len({r["turn"]["user"] for r in answered}) == 3
+    assert len(server_module.session_locks) == 0
+
+
+def test_streamed_followup_releases_its_session_lock(server_module):
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = await client.post("/submit_feedback", data={
+                "score": "4", "transcription": "The app keeps crashing on checkout", "bypass_cache": "true"})
+            conversation_id = started.json()["conversation_id"]
+            first, second = await asyncio.gather(*(
+                client.post("/submit_followup/stream", data={
+                    "conversation_id": conversation_id, "transcription": f"Answer {i}", "bypass_cache": "true"})
+                for i in range(2)
+            ))
+            return first.text + second.text
+
+    body = asyncio.run(run())
+    assert body.count('"type": "result"') == 2
+    assert len(server_module.session_locks) == 0
+
+
+def test_feedback_without_followup_stores_no_session(server_module):
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await client.post("/submit_feedback", data={
+                "score": "10", "transcription": "Everything was perfect", "bypass_cache": "true"})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["requiresFollowUp"] is False
+    assert body["conversation_id"]
+    assert server_module.session_store.get(body["conversation_id"]) is None
+
+
+def test_disk_backed_sessions_are_read_and_written_off_the_event_loop(server_module, tmp_path, monkeypatch):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"))
+    threads = []
+    for name in ("create", "get", "put", "delete"):
+        method = getattr(store, name)
+
+        def record(*args, _method=method):
+            threads.append(threading.get_ident())
+            return _method(*args)
+
+        monkeypatch.setattr(store, name, record)
+    monkeypatch.setattr(server_module, "session_store", store)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = await client.post("/submit_feedback", data={
+                "score": "5", "transcription": "Checkout was confusing", "bypass_cache": "true"})
+            conversation_id = started.json()["conversation_id"]
+            for i in range(3):
+                response = await client.post("/submit_followup", data={
+                    "conversation_id": conversation_id, "transcription": f"Answer {i}", "bypass_cache": "true"})
+                assert response.status_code == 200
+            return threading.get_ident()
+
+    try:
+        loop_thread = asyncio.run(run())
+    finally:
+        store.close()
+    # create (which puts), then get + put twice and get + delete on the closing turn
+    assert len(threads) == 8
+    assert loop_thread not in threads
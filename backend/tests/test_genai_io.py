@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import httpx
+
+UPLOAD_SECONDS = 0.5
+
+
+def test_event_loop_stays_responsive_during_uploads_and_deletes(server_module, monkeypatch):
+    provider = server_module.llm_provider
+
+    def blocking_upload(path, mime_type):
+        time.sleep(UPLOAD_SECONDS)
+        return "files/blocking"
+
+    def blocking_delete(handle):
+        time.sleep(UPLOAD_SECONDS)
+
+    monkeypatch.setattr(provider, "upload_file", blocking_upload)
+    monkeypatch.setattr(provider, "delete_file", blocking_delete)
+    monkeypatch.setattr(server_module, "AUDIO_SUBMIT_MODE", "upload")
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            async def submit(i):
+                return await client.post(
+                    "/submit_feedback",
+                    data={"score": "5", "bypass_cache": "true"},
+                    files={"audio_data": (f"clip{i}.webm", b"\x1a\x45\xdf\xa3" * 64, "audio/webm")},
+                )
+
+            submissions = [asyncio.create_task(submit(i)) for i in range(4)]
+            await asyncio.sleep(0.05)
+            latencies = []
+            while not all(task.done() for task in submissions):
+                started = time.perf_counter()
+                response = await client.get("/stats")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(0.02)
+            return [task.result() for task in submissions], latencies
+
+    responses, latencies = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 4
+    # Four uploads each blocking for 0.5s ran meanwhile; a blocked loop would stall /stats for that long
+    assert len(latencies) >= 5
+    assert max(latencies) < 0.2
+
+
+def test_upload_abandoned_at_its_deadline_is_deleted_once_it_lands(server_module, monkeypatch):
+    deleted = []
+    monkeypatch.setattr(server_module.llm_provider, "delete_file", deleted.append)
+
+    async def run():
+        upload = asyncio.get_running_loop().create_future()
+        server_module.delete_when_uploaded(upload)
+        upload.set_result("files/late")
+        await asyncio.sleep(0)
+        # The deletion task is held until it finishes
+        assert len(server_module.pending_deletions) == 1
+        while server_module.pending_deletions:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert deleted == ["files/late"]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+VALID = {
+    "transcription": "Checkout kept failing",
+    "sentiment": "Negative",
+    "feedback": ["checkout errors"],
+    "conversationalResponse": "Sorry about that. What happened at checkout?",
+    "requiresFollowUp": True,
+    "conversationComplete": False,
+}
+VALID_JSON = json.dumps(VALID)
+TRUNCATED = VALID_JSON[:-20]
+
+# (case, model replies in order, expected status, expected repair tier, model calls)
+CASES = [
+    ("clean", [VALID_JSON], 200, "clean", 1),
+    ("fenced", ["```json\n" + VALID_JSON + "\n```"], 200, "clean", 1),
+    ("prose_wrapped", ["Sure! Here is the analysis: " + VALID_JSON + " Let me know {if} you need more."],
+     200, "clean", 1),
+    ("single_quotes", [repr({**VALID, "requiresFollowUp": True})], 200, "coerced", 1),
+    ("string_booleans", [json.dumps({**VALID, "requiresFollowUp": "true", "conversationComplete": "no"})],
+     200, "coerced", 1),
+    ("truncated_then_reasked", [TRUNCATED, VALID_JSON], 200, "reasked", 2),
+    ("truncated_twice", [TRUNCATED, TRUNCATED], 500, "failed", 2),
+    ("wrong_type_then_reasked", [json.dumps({**VALID, "feedback": {"a": 1}}), VALID_JSON], 200, "reasked", 2),
+    # Nothing to repair: no re-ask
+    ("empty", [""], 500, "failed", 1),
+    ("whitespace", ["  \n"], 500, "failed", 1),
+]
+
+
+@pytest.mark.parametrize("replies,status,tier,calls", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_model_reply_handling(server_module, monkeypatch, replies, status, tier, calls):
+    prompts = []
+
+    async def generate(contents):
+        prompts.append(contents)
+        return replies[len(prompts) - 1]
+
+    monkeypatch.setattr(server_module.llm_provider, "generate", generate)
+    tiers_before = dict(server_module.repair_tiers)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await client.post("/submit_feedback", data={
+                "score": "4", "transcription": "Checkout kept failing", "bypass_cache": "true"})
+
+    response = asyncio.run(run())
+    assert response.status_code == status, response.text
+    assert len(prompts) == calls
+    tiers = {name: server_module.repair_tiers[name] - tiers_before.get(name, 0)
+             for name in ("clean", "coerced", "reasked", "failed")}
+    assert tiers == {name: int(name == tier) for name in tiers}
+    if status == 200:
+        body = response.json()
+        assert body["feedback"] == ["checkout errors"]
+        assert body["requiresFollowUp"] is True
+    else:
+        assert response.json()["detail"].startswith(("Failed to parse model response", "Model returned"))
+    if calls == 2:
+        # The re-ask carries only the broken reply, not the original prompt
+        assert replies[0][:50] in prompts[1]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import request_deadline
+from request_deadline import Deadline, DeadlineExceeded
+
+
+def test_reserve_never_takes_the_whole_budget():
+    deadline = Deadline("submit_feedback", 1.0)
+    timeout = deadline.stage_timeout(reserve=1.0)
+    assert 0.7 < timeout <= 0.75
+    # A reserve well inside the budget is kept as is
+    assert Deadline("submit_feedback", 30.0).stage_timeout(reserve=1.0) == pytest.approx(29.0, abs=0.01)
+
+
+def test_share_caps_the_stage():
+    deadline = Deadline("submit_feedback", 10.0)
+    assert deadline.stage_timeout(share=0.5) == pytest.approx(5.0)
+
+
+def test_stage_past_its_time_is_cancelled_and_recorded():
+    deadline = Deadline("submit_followup", 0.05)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    before = request_deadline.timeouts["submit_followup:generate"]
+    with pytest.raises(DeadlineExceeded) as exceeded:
+        asyncio.run(deadline.run("generate", slow()))
+    assert cancelled == [True]
+    assert exceeded.value.stage == "generate"
+    assert request_deadline.timeouts["submit_followup:generate"] == before + 1
+    detail = exceeded.value.detail()
+    assert detail["error"] == "deadline_exceeded"
+    assert detail["budget_ms"] == 50
+    assert "generate" in detail["stages_ms"]
+
+
+def test_slow_model_call_is_cut_at_the_deadline_with_a_504(server_module, monkeypatch):
+    # Below DEADLINE_FINISH_RESERVE_SECONDS: generation still gets most of the budget
+    monkeypatch.setitem(server_module.DEADLINES, "submit_feedback", 0.3)
+    calls = []
+
+    async def generate(contents):
+        calls.append("started")
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            calls.append("cancelled")
+            raise
+
+    monkeypatch.setattr(server_module.llm_provider, "generate", generate)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = time.monotonic()
+            response = await client.post("/submit_feedback", data={
+                "score": "4", "transcription": "It was slow", "bypass_cache": "true"})
+            return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(run())
+    assert response.status_code == 504
+    detail = response.json()["detail"]
+    assert detail["error"] == "deadline_exceeded"
+    assert detail["endpoint"] == "submit_feedback"
+    assert detail["stage"] == "generate"
+    assert detail["budget_ms"] == 300
+    assert detail["stages_ms"]["generate"] >= 150
+    # The model call saw the deadline: it was started, then cancelled when the budget ran out
+    assert calls == ["started", "cancelled"]
+    assert elapsed < 1
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from response_cache import ResponseCache
+
+SLOW_SECONDS = 0.5
+
+
+def slow_sweep(now):
+    time.sleep(SLOW_SECONDS)
+
+
+def test_memory_hits_do_not_wait_for_disk_writes(tmp_path, monkeypatch):
+    cache = ResponseCache(db_path=str(tmp_path / "responses.db"))
+    cache.put("hit", "cached")
+    monkeypatch.setattr(cache, "_sweep_db", slow_sweep)
+
+    writer = threading.Thread(target=cache.put, args=("other", "text"))
+    writer.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    assert cache.get("hit") == "cached"
+    assert time.perf_counter() - started < 0.1
+    writer.join()
+    cache.close()
+
+
+def test_disk_cache_writes_run_off_the_event_loop(server_module, monkeypatch, tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "server_responses.db"))
+    monkeypatch.setattr(cache, "_sweep_db", slow_sweep)
+    monkeypatch.setattr(server_module, "response_cache", cache)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            started = time.perf_counter()
+            feedback = asyncio.create_task(client.post("/submit_feedback", data={
+                "score": "9", "transcription": "Quick delivery and friendly staff"}))
+            # Past the stub's 20 ms model call, while the response is being written to the cache
+            await asyncio.sleep(0.1)
+            health = await client.get("/health")
+            latency = time.perf_counter() - started
+            return (await feedback), health, latency
+
+    feedback, health, latency = asyncio.run(run())
+    cache.close()
+    assert feedback.status_code == 200 and health.status_code == 200
+    assert cache.stores == 1
+    assert latency < 0.3
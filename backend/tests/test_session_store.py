@@ -0,0 +1,21 @@
+import session_store
+from session_store import SessionStore
+
+
+def test_reading_a_session_keeps_its_stored_copy_alive(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: clock[0])
+    db_path = str(tmp_path / "sessions.db")
+
+    store = SessionStore(ttl_seconds=10, db_path=db_path)
+    conversation_id = store.create({"score": 4, "turns": []})
+    clock[0] += 8
+    assert store.get(conversation_id) == {"score": 4, "turns": []}
+    store.close()
+
+    # Past the original expiry, but within the TTL refreshed by the read
+    clock[0] += 8
+    restarted = SessionStore(ttl_seconds=10, db_path=db_path)
+    assert restarted.get(conversation_id) == {"score": 4, "turns": []}
+    clock[0] += 11
+    assert SessionStore(ttl_seconds=10, db_path=db_path).get(conversation_id) is None
@@ -0,0 +1,211 @@
+import asyncio
+
+import httpx
+import pytest
+
+import upstream_gateway
+from upstream_gateway import UpstreamGateway, UpstreamOverloaded
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"upstream returned {code}")
+        self.code = code
+
+
+class FakeUpstream:
+    """
+    Replays scripted outcomes: None succeeds, an int raises an error with that status code.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.gate = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if outcome is not None:
+            raise UpstreamError(outcome)
+        return "ok"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upstream_gateway, "time", clock)
+    return clock
+
+
+def gateway(**options):
+    options = {"max_retries": 0, "retry_base_ms": 0, "breaker_failures": 100, **options}
+    return UpstreamGateway(**options)
+
+
+def test_window_grows_on_success_and_halves_on_429(clock):
+    gw = gateway(min_concurrency=1, max_concurrency=8, initial_concurrency=4)
+    upstream = FakeUpstream()
+
+    async def run():
+        upstream.gate = asyncio.Event()
+        calls = [asyncio.ensure_future(gw.call(upstream)) for _ in range(4)]
+        await asyncio.sleep(0)
+        assert gw.inflight == 4
+        upstream.gate.set()
+        await asyncio.gather(*calls)
+
+    asyncio.run(run())
+    # A success with the whole window in use adds ~1/limit
+    assert gw.limit == pytest.approx(4.25)
+    assert gw.counters["successes"] == 4
+
+    upstream.outcomes = [429]
+    upstream.gate = None
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(gw.call(upstream))
+    assert gw.limit == pytest.approx(4.25 / 2)
+    assert gw.counters["rate_limited"] == 1
+    assert gw.counters["limit_decreases"] == 1
+
+
+def test_window_never_shrinks_below_the_minimum(clock):
+    gw = gateway(min_concurrency=2, initial_concurrency=2)
+    upstream = FakeUpstream(429, 429)
+    for _ in range(2):
+        clock.now += 5
+        with pytest.raises(UpstreamOverloaded):
+            asyncio.run(gw.call(upstream))
+    assert gw.limit == 2
+
+
+def test_transient_errors_are_retried(clock):
+    gw = gateway(max_retries=2)
+    upstream = FakeUpstream(503, 500)
+    assert asyncio.run(gw.call(upstream)) == "ok"
+    assert upstream.calls == 3
+    assert gw.counters["retries"] == 2
+    assert gw.counters["transient_errors"] == 2
+    assert gw.counters["successes"] == 1
+
+
+def test_permanent_errors_are_not_retried(clock):
+    gw = gateway(max_retries=2)
+    upstream = FakeUpstream(400)
+    with pytest.raises(UpstreamError):
+        asyncio.run(gw.call(upstream))
+    assert upstream.calls == 1
+    assert gw.counters["retries"] == 0
+
+
+def test_breaker_opens_then_half_opens_then_closes(clock):
+    gw = gateway(breaker_failures=2, breaker_reset_seconds=30)
+    upstream = FakeUpstream(503, 503)
+    for _ in range(2):
+        with pytest.raises(UpstreamOverloaded):
+            asyncio.run(gw.call(upstream))
+    assert gw.stats()["circuit"] == "open"
+    assert gw.counters["circuit_opened"] == 1
+
+    # Open: rejected without reaching the upstream, Retry-After is the time left
+    clock.now += 10
+    with pytest.raises(UpstreamOverloaded) as rejected:
+        asyncio.run(gw.call(upstream))
+    assert rejected.value.retry_after == pytest.approx(20)
+    assert upstream.calls == 2
+    with pytest.raises(UpstreamOverloaded):
+        gw.admit()
+
+    # Once the advertised Retry-After has passed, one probe goes through
+    clock.now += 20
+    assert gw.stats()["circuit"] == "half_open"
+
+    async def probe():
+        upstream.gate = asyncio.Event()
+        probe_call = asyncio.ensure_future(gw.call(upstream))
+        await asyncio.sleep(0)
+        # A second call while the probe is in flight is still rejected
+        with pytest.raises(UpstreamOverloaded):
+            await gw.call(upstream)
+        upstream.gate.set()
+        return await probe_call
+
+    assert asyncio.run(probe()) == "ok"
+    assert upstream.calls == 3
+    assert gw.stats()["circuit"] == "closed"
+    assert gw.counters["rejected_circuit_open"] == 3
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    gw = gateway(breaker_failures=1, breaker_reset_seconds=30)
+    upstream = FakeUpstream(503, 503)
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(gw.call(upstream))
+    clock.now += 30
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(gw.call(upstream))
+    assert upstream.calls == 2
+    assert gw.stats()["circuit"] == "open"
+    assert gw.counters["circuit_opened"] == 2
+    with pytest.raises(UpstreamOverloaded) as rejected:
+        asyncio.run(gw.call(upstream))
+    assert rejected.value.retry_after == pytest.approx(30)
+
+
+def test_full_queue_is_rejected_at_once(clock):
+    gw = gateway(initial_concurrency=1, max_concurrency=1, max_queue=0)
+    upstream = FakeUpstream()
+
+    async def run():
+        upstream.gate = asyncio.Event()
+        first = asyncio.ensure_future(gw.call(upstream))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded) as rejected:
+            await gw.call(upstream)
+        upstream.gate.set()
+        await first
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "Upstream queue full"
+    assert rejected.retry_after >= 1
+    assert gw.counters["rejected_queue_full"] == 1
+
+
+def test_overloaded_upstream_is_a_503_with_retry_after(server_module, monkeypatch):
+    gw = UpstreamGateway(max_retries=0, breaker_failures=1, breaker_reset_seconds=30)
+    monkeypatch.setattr(server_module, "upstream", gw)
+    upstream = FakeUpstream(503)
+
+    async def generate(contents):
+        return await upstream()
+
+    monkeypatch.setattr(server_module.llm_provider, "generate", generate)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return [
+                await client.post("/submit_feedback", data={
+                    "score": "4", "transcription": "It was slow", "bypass_cache": "true"})
+                for _ in range(2)
+            ]
+
+    failed, rejected = asyncio.run(run())
+    assert failed.status_code == 503
+    assert int(failed.headers["Retry-After"]) >= 1
+    # The breaker is now open: the second request never reaches the model
+    assert rejected.status_code == 503
+    assert rejected.json()["detail"] == "Upstream circuit open"
+    assert 29 <= int(rejected.headers["Retry-After"]) <= 30
+    assert upstream.calls == 1
@@ -0,0 +1,374 @@
+"""
+Shared gateway for upstream model calls.
+
+Every model call from server.py goes through one `UpstreamGateway`, which
+applies, in order:
+
+ 1. circuit breaker: after UPSTREAM_BREAKER_FAILURES consecutive transient
+    failures the upstream is treated as down for UPSTREAM_BREAKER_RESET_SECONDS,
+    then a single probe call decides whether to close it again
+ 2. token bucket: at most UPSTREAM_RATE_PER_SECOND calls per second (bursts up
+    to UPSTREAM_BURST); 0 disables rate limiting
+ 3. adaptive concurrency limit: a semaphore whose size moves between
+    UPSTREAM_MIN_CONCURRENCY and UPSTREAM_MAX_CONCURRENCY with AIMD, growing by
+    ~1 per round trip while calls succeed under UPSTREAM_LATENCY_TARGET_MS and
+    halving on 429s or slow calls
+ 4. retry: transient errors (429, 5xx, timeouts, connection errors) are
+    retried up to UPSTREAM_MAX_RETRIES times with full-jitter exponential backoff
+
+When a call cannot be admitted quickly (queue of UPSTREAM_MAX_QUEUE waiters
+full, UPSTREAM_QUEUE_TIMEOUT_SECONDS exceeded, circuit open, rate limit wait
+too long) or transient errors outlast the retries, `UpstreamOverloaded` is
+raised with a suggested Retry-After; the server turns it into a 503.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses (google.api_core exceptions carry them as `.code`) worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RATE_LIMIT_NAMES = ("ResourceExhausted", "TooManyRequests")
+TRANSIENT_NAMES = ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                   "BadGateway", "Aborted")
+
+# Exponentially weighted moving average factor for observed upstream latency
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class UpstreamOverloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    "rate_limited", "transient" or "permanent".
+    """
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    name = type(error).__name__
+    if code == 429 or name in RATE_LIMIT_NAMES:
+        return "rate_limited"
+    if code in TRANSIENT_STATUS_CODES or name in TRANSIENT_NAMES:
+        return "transient"
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return "transient"
+    return "permanent"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Take one token; return how long the caller must wait before using it.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def cancel(self):
+        self.tokens += 1
+
+
+class UpstreamGateway:
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 32, initial_concurrency: int = 8,
+                 latency_target_ms: float = 10000, max_queue: int = 256, queue_timeout: float = 10,
+                 rate_per_second: float = 0, burst: float = 20, max_retries: int = 2,
+                 retry_base_ms: float = 200, retry_max_ms: float = 2000,
+                 breaker_failures: int = 5, breaker_reset_seconds: float = 30):
+        self.min_limit = max(1, min_concurrency)
+        self.max_limit = max(self.min_limit, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_limit), self.max_limit))
+        self.latency_target = latency_target_ms / 1000
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second > 0 else None
+        self.max_retries = max_retries
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset_seconds
+
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._latency_ewma: Optional[float] = None
+        self._last_decrease = 0.0
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_inflight = False
+        self._rng = random.Random()
+
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "transient_errors": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_rate_limit": 0,
+            "rejected_circuit_open": 0,
+            "circuit_opened": 0,
+            "limit_increases": 0,
+            "limit_decreases": 0,
+        }
+
+    # --- admission ---
+
+    def _check_circuit(self) -> bool:
+        """
+        Raise if the breaker is open; return True if this call is the half-open probe.
+        """
+        if self._opened_at is None:
+            return False
+        remaining = self._opened_at + self.breaker_reset - time.monotonic()
+        if remaining > 0 or self._probe_inflight:
+            self.counters["rejected_circuit_open"] += 1
+            raise UpstreamOverloaded("Upstream circuit open", max(remaining, 1.0))
+        self._probe_inflight = True
+        return True
+
+    def admit(self):
+        """
+        Fast admission check without taking a slot: raise `UpstreamOverloaded` if a call
+        made now would be rejected (circuit open, queue full, rate limit wait too long).
+        Used before committing to a streaming response so overload is still a plain 503.
+        """
+        if self._opened_at is not None:
+            remaining = self._opened_at + self.breaker_reset - time.monotonic()
+            if remaining > 0 or self._probe_inflight:
+                self.counters["rejected_circuit_open"] += 1
+                raise UpstreamOverloaded("Upstream circuit open", max(remaining, 1.0))
+        if self.bucket:
+            tokens = min(self.bucket.burst,
+                         self.bucket.tokens + (time.monotonic() - self.bucket._updated) * self.bucket.rate)
+            wait = max(0.0, (1 - tokens) / self.bucket.rate)
+            if wait > self.queue_timeout:
+                self.counters["rejected_rate_limit"] += 1
+                raise UpstreamOverloaded("Upstream rate limit reached", wait)
+        if self.inflight >= int(self.limit) and len(self._waiters) >= self.max_queue:
+            self.counters["rejected_queue_full"] += 1
+            raise UpstreamOverloaded("Upstream queue full", self._retry_after())
+
+    async def acquire(self) -> bool:
+        """
+        Wait for a call slot. Returns whether the call is a circuit-breaker probe;
+        pass that back to `release`.
+        """
+        probe = self._check_circuit()
+        try:
+            if self.bucket:
+                wait = self.bucket.reserve()
+                if wait > self.queue_timeout:
+                    self.bucket.cancel()
+                    self.counters["rejected_rate_limit"] += 1
+                    raise UpstreamOverloaded("Upstream rate limit reached", wait)
+                if wait:
+                    await asyncio.sleep(wait)
+            await self._enter()
+        except BaseException:
+            if probe:
+                self._probe_inflight = False
+            raise
+        return probe
+
+    async def _enter(self):
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected_queue_full"] += 1
+            raise UpstreamOverloaded("Upstream queue full", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected_queue_timeout"] += 1
+            raise UpstreamOverloaded("Timed out waiting for an upstream slot", self._retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just as the caller was cancelled: give it back
+                self.inflight -= 1
+                self._wake()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+
+    def _wake(self):
+        while self._waiters and self.inflight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                # The slot is handed over directly to the waiter
+                self.inflight += 1
+                future.set_result(None)
+
+    def _retry_after(self) -> float:
+        return max(1.0, math.ceil(self._latency_ewma or 1.0))
+
+    # --- outcome ---
+
+    def release(self, probe: bool, outcome: str, latency: Optional[float] = None):
+        """
+        Free the slot and adapt: outcome is "success", "rate_limited", "transient" or "permanent".
+        """
+        self.inflight -= 1
+        now = time.monotonic()
+        if latency is not None and outcome == "success":
+            self._latency_ewma = latency if self._latency_ewma is None else (
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self._latency_ewma)
+
+        if outcome == "rate_limited" or (outcome == "success" and latency is not None and latency > self.latency_target):
+            # Multiplicative decrease, at most once per round trip so one burst of 429s halves once
+            if now - self._last_decrease >= (self._latency_ewma or 1.0):
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self._last_decrease = now
+                self.counters["limit_decreases"] += 1
+        elif outcome == "success" and self.inflight + 1 >= int(self.limit):
+            # Additive increase (~+1 per limit's worth of calls), only while the limit is actually in use
+            new_limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            if int(new_limit) > int(self.limit):
+                self.counters["limit_increases"] += 1
+            self.limit = new_limit
+
+        if outcome in ("rate_limited", "transient"):
+            self._consecutive_failures += 1
+            if probe or (self._opened_at is None and self._consecutive_failures >= self.breaker_failures):
+                self._opened_at = now
+                self.counters["circuit_opened"] += 1
+                logger.warning("upstream circuit opened", extra={
+                    "reset_seconds": self.breaker_reset, "consecutive_failures": self._consecutive_failures})
+        elif outcome == "success":
+            self._consecutive_failures = 0
+            if probe:
+                logger.info("upstream circuit closed")
+            self._opened_at = None
+        if probe:
+            self._probe_inflight = False
+        self._wake()
+
+    def _record_error(self, kind: str):
+        if kind == "rate_limited":
+            self.counters["rate_limited"] += 1
+        elif kind == "transient":
+            self.counters["transient_errors"] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return self._rng.uniform(0, min(self.retry_max, self.retry_base * (2 ** attempt)))
+
+    # --- calls ---
+
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `await fn(*args, **kwargs)` under the gateway's limits, retrying transient errors.
+        """
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            probe = await self.acquire()
+            started = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                self.release(probe, kind)
+                self._record_error(kind)
+                if kind == "permanent":
+                    self.counters["failures"] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise UpstreamOverloaded(f"Upstream unavailable after {attempt + 1} attempt(s): {e}",
+                                             self._retry_after()) from e
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(probe, "permanent")
+                raise
+            self.release(probe, "success", time.monotonic() - started)
+            self.counters["successes"] += 1
+            return result
+
+    async def stream(self, fn: Callable[..., AsyncIterator[str]], *args, **kwargs) -> AsyncIterator[str]:
+        """
+        Iterate `fn(*args, **kwargs)` under the gateway's limits. Attempts that fail before
+        the first chunk are retried; once output has been forwarded, errors propagate.
+        """
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            probe = await self.acquire()
+            started = time.monotonic()
+            forwarded = False
+            try:
+                async for chunk in fn(*args, **kwargs):
+                    forwarded = True
+                    yield chunk
+            except Exception as e:
+                kind = classify_error(e)
+                self.release(probe, kind)
+                self._record_error(kind)
+                if kind == "permanent" or forwarded:
+                    self.counters["failures"] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise UpstreamOverloaded(f"Upstream unavailable after {attempt + 1} attempt(s): {e}",
+                                             self._retry_after()) from e
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Client went away (generator closed/cancelled): just free the slot
+                self.release(probe, "permanent")
+                raise
+            self.release(probe, "success", time.monotonic() - started)
+            self.counters["successes"] += 1
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        if self._opened_at is None:
+            circuit = "closed"
+        elif self._probe_inflight or time.monotonic() >= self._opened_at + self.breaker_reset:
+            circuit = "half_open"
+        else:
+            circuit = "open"
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "min_concurrency": self.min_limit,
+            "max_concurrency": self.max_limit,
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "rate_per_second": self.bucket.rate if self.bucket else None,
+            "tokens": round(self.bucket.tokens, 2) if self.bucket else None,
+            "latency_ewma_ms": round(self._latency_ewma * 1000, 1) if self._latency_ewma is not None else None,
+            "circuit": circuit,
+            **self.counters,
+        }
@@ -34,6 +34,11 @@ const RATING_COLORS = {
   Medium: "#6366F1", // Blue
   Low: "#EF4444", // Red
 };
+// Trend buckets follow the viewer's calendar days
+const BROWSER_TZ = Intl.DateTimeFormat().resolvedOptions().timeZone || "UTC";
+// Date-only bounds mean UTC days to the summary; spell that out for the timeseries call
+const utcInstant = (date) => (date.length === 10 ? `${date}T00:00:00Z` : date);
+
 const SENTIMENT_COLORS = [
   "#10B981", // Green
   "#EF4444", // Red
@@ -45,6 +50,68 @@ const SENTIMENT_COLORS = [
   "#3B82F6", // Blue
 ];
 
+const addCounts = (counts = {}, delta = {}) => {
+  const merged = { ...counts };
+  Object.entries(delta).forEach(([key, n]) => {
+    merged[key] = (merged[key] || 0) + n;
+  });
+  return merged;
+};
+
+const weightedAverage = (distribution) => {
+  const entries = Object.entries(distribution);
+  const n = entries.reduce((sum, [, count]) => sum + count, 0);
+  return n ? Number((entries.reduce((sum, [value, count]) => sum + Number(value) * count, 0) / n).toFixed(2)) : null;
+};
+
+// Fold one live `conversation` event (GET /analytics/stream) into the loaded summary
+const applyLiveConversation = (data, { conversation, delta }) => {
+  const s = data.summary;
+  const total = s.total_conversations + delta.count;
+  // Saved conversations always carry the follow-up/completion flags, so the total is the denominator
+  const pct = (prevPct, added) =>
+    Number((((prevPct / 100) * s.total_conversations + added) / total * 100).toFixed(2));
+  const scoreDistribution = addCounts(s.score_distribution, delta.scores);
+  const turnsDistribution = addCounts(s.turns_distribution, delta.turns);
+  const feedback = addCounts(
+    Object.fromEntries((data.top_feedback || []).map((f) => [f.text, f.count])),
+    delta.feedback.counts
+  );
+  const feedbackErrors = Object.fromEntries((data.top_feedback || []).map((f) => [f.text, f.error || 0]));
+
+  return {
+    ...data,
+    summary: {
+      ...s,
+      total_conversations: total,
+      avg_score: weightedAverage(scoreDistribution),
+      sentiment_breakdown: addCounts(s.sentiment_breakdown, delta.sentiments),
+      followup_required_pct: pct(s.followup_required_pct, delta.followup_true),
+      completed_pct: pct(s.completed_pct, delta.complete_true),
+      avg_turns: Number(
+        (Object.entries(turnsDistribution).reduce((sum, [t, n]) => sum + Number(t) * n, 0) / total).toFixed(2)
+      ),
+      max_turns: Math.max(s.max_turns || 0, ...Object.keys(delta.turns).map(Number)),
+      score_distribution: scoreDistribution,
+      turns_distribution: turnsDistribution,
+    },
+    top_feedback: Object.entries(feedback)
+      .map(([text, count]) => ({ text, count, error: feedbackErrors[text] || 0 }))
+      .sort((a, b) => b.count - a.count)
+      .slice(0, Math.max((data.top_feedback || []).length, 5)),
+    trend: data.trend && {
+      ...data.trend,
+      buckets: data.trend.buckets.map((b) => {
+        const savedAt = new Date(conversation.saved_at);
+        if (conversation.score == null || savedAt < new Date(b.start) || savedAt >= new Date(b.end)) return b;
+        const scored = b.scored + 1;
+        const avg = ((b.avg_score || 0) * b.scored + conversation.score) / scored;
+        return { ...b, count: b.count + 1, scored, avg_score: Number(avg.toFixed(2)) };
+      }),
+    },
+  };
+};
+
 // String with Sound Waves - Like RateUs
 function SoundString({ position, segments = 50, waveSpeed = 1, waveAmplitude = 0.5, delay = 0 }) {
   const lineRef = useRef();
@@ -144,6 +211,8 @@ function Dashboard() {
   const [customEnd, setCustomEnd] = useState("");
   const [errorMsg, setErrorMsg] = useState("");
   const [loading, setLoading] = useState(true);
+  // Range of the data on screen; live=false in demo mode or when the last fetch failed
+  const queryRef = useRef({ live: false });
 
   useEffect(() => {
     const checkBackend = async () => {
@@ -159,6 +228,29 @@ function Dashboard() {
 
   useEffect(() => handlePreset(timeframe), [timeframe]);
 
+  // Live updates: the server pushes every saved conversation instead of the dashboard polling
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return;
+    const source = new EventSource(`${BACKEND_URL}/analytics/stream`);
+    const refetch = () => queryRef.current.label && fetchData({ ...queryRef.current, quiet: true });
+
+    source.addEventListener("conversation", (event) => {
+      const update = JSON.parse(event.data);
+      const { start_date, end_date, live } = queryRef.current;
+      if (!live) return refetch();
+      const savedAt = new Date(update.conversation.saved_at);
+      if (end_date || (start_date && savedAt < new Date(start_date))) return;
+      // Past the last trend bucket (e.g. a new day started): reload to get the new bucket
+      if (queryRef.current.trendEnd && savedAt >= queryRef.current.trendEnd) return refetch();
+      setData((prev) => (prev?.summary ? applyLiveConversation(prev, update) : prev));
+    });
+    // Missed events (reconnect after a gap) or dropped for reading too slowly: reload the range
+    source.addEventListener("resync", refetch);
+    source.addEventListener("evicted", refetch);
+
+    return () => source.close();
+  }, []);
+
   const toISODate = (d) => d.toISOString().split("T")[0];
 
   const handlePreset = (range) => {
@@ -202,8 +294,12 @@ function Dashboard() {
     const avgTurns = (conversations.reduce((sum, c) => sum + c.total_turns, 0) / conversations.length).toFixed(1);
 
     const sentimentBreakdown = {};
+    const scoreDistribution = {};
+    const turnsDistribution = {};
     conversations.forEach(c => {
       sentimentBreakdown[c.sentiment] = (sentimentBreakdown[c.sentiment] || 0) + 1;
+      scoreDistribution[c.score] = (scoreDistribution[c.score] || 0) + 1;
+      turnsDistribution[c.total_turns] = (turnsDistribution[c.total_turns] || 0) + 1;
     });
 
     return {
@@ -215,7 +311,9 @@ function Dashboard() {
         followup_required_pct: parseFloat(followupPct),
         completed_pct: 85.0,
         avg_turns: parseFloat(avgTurns),
-        max_turns: 5
+        max_turns: 5,
+        score_distribution: scoreDistribution,
+        turns_distribution: turnsDistribution
       },
       top_feedback: [
         { text: "Great service and fast response", count: 8 },
@@ -224,22 +322,44 @@ function Dashboard() {
         { text: "Quick delivery time", count: 4 },
         { text: "Easy to use interface", count: 3 }
       ],
-      conversations: conversations
+      trend: {
+        interval: "day",
+        buckets: conversations.map((c) => ({
+          start: c.saved_at,
+          end: new Date(new Date(c.saved_at).getTime() + 86400000).toISOString(),
+          count: 1,
+          scored: 1,
+          avg_score: c.score,
+        })),
+      }
     };
   };
 
-  const fetchData = async ({ start_date = null, end_date = null, label = "All Time" }) => {
+  const fetchData = async ({ start_date = null, end_date = null, label = "All Time", quiet = false }) => {
+    queryRef.current = { start_date, end_date, label, live: false };
     try {
-      setLoading(true);
+      if (!quiet) setLoading(true);
       setErrorMsg("");
 
-      const response = await axios.get(`${BACKEND_URL}/analytics/summary`, {
-        params: { ...(start_date && { start_date }), ...(end_date && { end_date }) },
-        timeout: 5000,
-      });
-
-      setData(response.data);
+      const range = { ...(start_date && { start_date }), ...(end_date && { end_date }) };
+      const [summaryRes, trendRes] = await Promise.all([
+        axios.get(`${BACKEND_URL}/analytics/summary`, { params: { ...range, top_n: 8 }, timeout: 5000 }),
+        axios.get(`${BACKEND_URL}/analytics/timeseries`, {
+          // Same UTC range as the summary; only the bucket boundaries are local
+          params: {
+            ...(start_date && { start_date: utcInstant(start_date) }),
+            ...(end_date && { end_date: utcInstant(end_date) }),
+            interval: "auto",
+            tz: BROWSER_TZ,
+          },
+          timeout: 5000,
+        }),
+      ]);
+
+      setData({ ...summaryRes.data, trend: trendRes.data });
       setAppliedRangeLabel(label);
+      const lastBucket = trendRes.data.buckets[trendRes.data.buckets.length - 1];
+      queryRef.current = { start_date, end_date, label, live: true, trendEnd: lastBucket && new Date(lastBucket.end) };
     } catch (error) {
       if (error.code === 'ECONNREFUSED' || error.message?.includes('Network Error') || error.message?.includes('Failed to fetch') || error.code === 'ECONNABORTED') {
         const demoData = getDemoData();
@@ -275,10 +395,12 @@ function Dashboard() {
 
   const ratingCategory = (score) => (score >= 9 ? "High" : score >= 7 ? "Medium" : "Low");
 
-  const ratingData = data?.conversations
+  const ratingData = data?.summary?.score_distribution
     ? ["High", "Medium", "Low"].map((cat) => ({
         name: cat,
-        value: data.conversations.filter((c) => ratingCategory(c.score) === cat).length,
+        value: Object.entries(data.summary.score_distribution)
+          .filter(([score]) => ratingCategory(Number(score)) === cat)
+          .reduce((sum, [, count]) => sum + count, 0),
       }))
     : [];
 
@@ -286,13 +408,16 @@ function Dashboard() {
     ? Object.entries(data.summary.sentiment_breakdown).map(([name, value]) => ({ name, value }))
     : [];
 
-  const trendData = data?.conversations
-    ? data.conversations
-      .filter((c) => c.saved_at)
-      .sort((a, b) => new Date(a.saved_at) - new Date(b.saved_at))
-        .map((c) => ({
-          date: new Date(c.saved_at).toLocaleDateString("en-US", { month: "short", day: "numeric" }),
-          score: c.score || 0,
+  const trendData = data?.trend
+    ? data.trend.buckets
+      .filter((b) => b.count && b.avg_score != null)
+        .map((b) => ({
+          date: new Date(b.start).toLocaleString("en-US", {
+            month: "short",
+            day: "numeric",
+            ...(data.trend.interval === "hour" && { hour: "2-digit", minute: "2-digit" }),
+          }),
+          score: b.avg_score,
         }))
     : [];
 
@@ -304,14 +429,8 @@ function Dashboard() {
       }))
     : [];
 
-  const turnsData = data?.conversations
-    ? Object.entries(
-        data.conversations.reduce((acc, c) => {
-          const t = c.total_turns || 0;
-          acc[t] = (acc[t] || 0) + 1;
-          return acc;
-        }, {})
-      )
+  const turnsData = data?.summary?.turns_distribution
+    ? Object.entries(data.summary.turns_distribution)
       .map(([turns, count]) => ({
         turns: Number(turns),
           label: `${turns} turn${turns > 1 ? "s" : ""}`,
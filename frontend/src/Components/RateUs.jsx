@@ -191,6 +191,7 @@ function VoiceNPSChat() {
   const [score, setScore] = useState(null);
   const [transcription, setTranscription] = useState("");
   const [conversationHistory, setConversationHistory] = useState([]);
+  const [conversationId, setConversationId] = useState(null);
   const [loading, setLoading] = useState(false);
   const [isRecording, setIsRecording] = useState(false);
   const [error, setError] = useState("");
@@ -521,6 +522,7 @@ function VoiceNPSChat() {
         }
       ]);
 
+      setConversationId(data.conversation_id ?? null);
       setCurrentResponse(data);
       setTranscription("");
       setTextInput("");
@@ -582,8 +584,13 @@ function VoiceNPSChat() {
       };
 
       const formData = new FormData();
-      formData.append("score", currentScore.toString());
-      formData.append("conversation_history", JSON.stringify(historyData));
+      if (conversationId) {
+        // Server keeps the history; only send the session id and the new utterance
+        formData.append("conversation_id", conversationId);
+      } else {
+        formData.append("score", currentScore.toString());
+        formData.append("conversation_history", JSON.stringify(historyData));
+      }
 
       const transcriptionText = transcription.trim() || textInput.trim();
 
@@ -703,6 +710,7 @@ function VoiceNPSChat() {
     
     // Reset all states
     setConversationHistory([]);
+    setConversationId(null);
     setCurrentResponse(null);
     setTranscription("");
     setTextInput("");